@@ -0,0 +1,23 @@
+# gunicorn.conf.py — 운영용 설정
+#   gunicorn -c gunicorn.conf.py run:app
+# preload_app=True: 마스터가 앱과 모델 가중치를 한 번만 올리고 워커를 fork → 가중치 페이지를 copy-on-write로 공유
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "127.0.0.1:5000")
+workers = int(os.environ.get("GUNICORN_WORKERS", 3))
+threads = int(os.environ.get("GUNICORN_THREADS", 8))   # 스레드가 있어야 마이크로배칭이 묶을 요청이 생김
+timeout = 120
+preload_app = True
+
+
+def when_ready(server):
+    # 앱 import(run:app)는 이미 끝난 상태. 워커 fork 전에 모델을 마스터에서 적재
+    from myapp import ai, near_dup
+    ai.preload()
+    near_dup.preload()
+
+
+def post_fork(server, worker):
+    # fork 이후 torch 스레드 수를 워커 몫으로 재설정
+    from myapp import ai
+    ai.after_fork(num_workers=workers)
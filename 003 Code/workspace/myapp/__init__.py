@@ -9,7 +9,7 @@ from flask_cors import CORS
 
 from .auth import auth_bp
 from .app_auth import app_auth_bp
-from .models import db, User, Image  # noqa: F401 (Image가 다른 곳에서 쓰이면 유지)
+from .models import db, User, Image, Job, ImageHash  # noqa: F401 (Image가 다른 곳에서 쓰이면 유지)
 
 # ===== 로깅 디렉토리 준비 =====
 log_dir = "/home/ubuntu/deepfake-detector/logs"
@@ -74,6 +74,17 @@ def create_app():
         # 서버 표준은 UTC. KST가 필요하면 zoneinfo로 변환 가능.
         return {"current_year": datetime.utcnow().year}
 
+    # ---- 대량 판별 작업 디스패처 (첫 요청 시 기동) ----
+    from . import jobs
+    jobs.init_app(app)
+
+    # ---- 모델 레지스트리 (registry.json의 활성 모델 적용 + 워커별 교체 감시/섀도 평가) ----
+    from . import ai, near_dup, model_registry
+    model_registry.init_app(app)
+
+    # ---- 근사 중복 인덱스 (gunicorn 마스터 preload 또는 첫 요청 시 DB에서 재구성) ----
+    near_dup.init_app(app, ai.model_fingerprint)
+
     # ---- 블루프린트 등록 ----
     app.register_blueprint(main_bp)
     app.register_blueprint(auth_bp)
@@ -1,16 +1,33 @@
 # ai.py — 통합판 (학습=추론 아님, 판별용)  ✅ NoFace 보장 버전
 import os
+import time
+import threading
 import cv2
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 import torch
 import torch.nn.functional as F
-from torchvision import transforms, models
-from PIL import Image, ImageOps
+from torchvision import models
 import numpy as np
 
+from .batching import MicroBatcher, Histogram
+from .cache import ResultCache, LRUCache, file_sha256, sha256_hex
+from .model_server import ModelClient
+from .quantize import autocast_context, load_artifact as load_int8_artifact
+from .artifact import load_artifact
+from .face_detectors import create_detector
+from . import optimize, preprocess, near_dup
+
 # =========================
 # ✅ 고정 설정/옵션
 # =========================
-MODEL_PATH = "/home/ubuntu/deepfake-detector/myapp/models/dm2.pth"
+# 기본 모델 (model_registry.py의 registry.json이 있으면 거기서 고른 활성 모델이 우선)
+MODEL_PATH = os.environ.get("DEEPFAKE_MODEL_PATH", "/home/ubuntu/deepfake-detector/myapp/models/dm2.pth")
+# scripts/convert_ckpt.py 로 만든 추론 아티팩트 (있으면 우선 사용, 없으면 MODEL_PATH)
+ARTIFACT_PATH = os.environ.get("DEEPFAKE_ARTIFACT_PATH", "/home/ubuntu/deepfake-detector/myapp/models/dm2.ts.pt")
+MODEL_ARCH = "efficientnet_b3"
+PREFER_ARTIFACT = True
+INPUT_SIZE = 300
 
 # 학습자가 확정해준 매핑
 FAKE_IDX, REAL_IDX = 0, 1
@@ -24,11 +41,105 @@ THRESH = None                  # 예: 0.6 넣으면 확신 낮으면 'Uncertain'
 # (중요) 얼굴 없으면 NoFace를 '반드시' 반환할지
 ENFORCE_NOFACE = True          # True 추천
 
+# 얼굴 모드: "single"(기존: 가장 큰 얼굴 또는 전체 프레임) | "multi"(검출된 모든 얼굴을 각각 분류 후 집계)
+#           | "tiles"(큰 이미지를 겹치는 타일로 나눠 각각 분류 후 집계, 아래 TILE_* 설정)
+FACE_MODE = "single"
+FACE_MARGIN = 0.2              # multi 모드 크롭 여백 (얼굴 박스 크기 대비 비율)
+MULTI_FACE_AGG = "max"         # "max"(가장 가짜 같은 얼굴) | "mean"(평균 fake 확률) | "vote"(다수결)
+MULTI_FACE_MAX = 16            # 한 이미지에서 분류할 최대 얼굴 수 (큰 얼굴 우선)
+
+# 타일 분류: 전체 프레임을 INPUT_SIZE로 줄이면 국소 합성 흔적이 뭉개지므로, 원본 해상도의 INPUT_SIZE 타일을 각각 분류
+#   타일 수가 TILE_MAX_TILES를 넘으면 그만큼 이미지를 줄여서(축소 디코딩 포함) 타일링 → 50MP 이미지도 메모리 상한 유지
+TILE_REGIONS = "grid"          # "grid"(겹치는 격자) | "faces"(검출된 얼굴 중심 영역, 얼굴 크기에 맞춰 정사각형)
+TILE_MIN_SIDE = 900            # 업로드 원본의 짧은 변이 이보다 작으면 타일 없이 전체 프레임 하나로 분류 (grid)
+TILE_OVERLAP = 0.25            # 이웃 타일 겹침 비율
+TILE_MAX_TILES = 64            # 한 이미지 최대 타일 수
+TILE_BATCH_SIZE = 16           # 한 번의 forward에 넣을 최대 타일 수 (배치 텐서 = 16 x 3 x 300 x 300 float32 ≈ 17MB)
+TILE_AGG = "topk"              # "max" | "mean" | "topk"(fake 확률 상위 TILE_TOPK개 평균, 타일 하나의 오탐에 덜 민감)
+TILE_TOPK = 3
+
+# 테스트 시 증강(TTA): 1차 fake 확률이 TTA_BAND 안(애매한 경우)일 때만 추가 뷰를 한 배치로 돌려 softmax 평균
+#   대부분의 요청은 1회 forward 그대로, 경계 사례만 (1 + 뷰 수)배 비용
+TTA_ENABLED = False
+TTA_BAND = (0.35, 0.65)        # 1차 fake 확률이 이 구간(양끝 포함)이면 추가 뷰 실행
+TTA_VIEWS = ("hflip", "crop", "hflip_crop")  # crop = 가운데 TTA_CROP_RATIO 영역을 입력 크기로 다시 확대
+TTA_CROP_RATIO = 0.9
+
+# 2단계 캐스케이드: 작은 1단계 모델을 낮은 해상도로 먼저 돌려, fake 확률이 CASCADE_BAND 안(애매한 경우)인 것만 B3로
+#   1단계 체크포인트는 MODEL_PATH와 같은 형식(state_dict, STAGE1_ARCH 구조)으로 학습/저장한 것
+#   로드 실패 시 캐스케이드 없이 B3만 사용. 단계별 통과율/지연은 get_stats()["cascade"]
+CASCADE_ENABLED = False
+STAGE1_ARCH = "efficientnet_b0"  # "efficientnet_b0" | "mobilenet_v3_small" | "mobilenet_v3_large"
+STAGE1_MODEL_PATH = "/home/ubuntu/deepfake-detector/myapp/models/dm2_stage1.pth"
+STAGE1_INPUT_SIZE = 224        # 전처리된 INPUT_SIZE 텐서를 이 크기로 줄여 입력 (디코딩/전처리는 한 번만)
+CASCADE_BAND = (0.1, 0.9)      # 1단계 fake 확률이 이 구간(양끝 포함)이면 B3로 넘김
+
+# 동적 마이크로배칭 (동시 요청 스레드들의 텐서를 모아 한 번에 forward)
+USE_MICRO_BATCH = True
+BATCH_MAX_SIZE = 16            # 한 배치 최대 이미지 수
+BATCH_MAX_WAIT_MS = 5.0        # 첫 요청 이후 다른 요청을 기다리는 최대 시간(ms)
+
+# 다중 이미지 배치 추론 (classify_batch)
+DECODE_WORKERS = 4             # 디코딩/얼굴검출 스레드 수 (cv2는 GIL을 풀어줌)
+BATCH_CHUNK_SIZE = 32          # 한 번의 forward에 넣을 최대 이미지 수
+
+# 추론 백엔드: "local"(워커마다 모델 적재) | "server"(전용 추론 프로세스에 Unix 소켓으로 위임)
+#   server 모드: python -m myapp.model_server --socket /tmp/deepfake-model-0.sock 를 먼저 띄울 것
+INFERENCE_BACKEND = "local"
+MODEL_SERVER_SOCKETS = ["/tmp/deepfake-model-0.sock"]  # 여러 개면 워커 pid 기준으로 분산
+MODEL_SERVER_WIRE_DTYPE = "float16"                      # 입력 전송 dtype (float32도 가능)
+
+# 추론 정밀도: "fp32" | "bf16"(CPU autocast, 지원 CPU만) | "int8"(정적 양자화 아티팩트 필요)
+#   int8 아티팩트 생성: python scripts/quantize_model.py calibrate --images <샘플 폴더>
+INFERENCE_PRECISION = "fp32"
+INT8_ARTIFACT_PATH = "/home/ubuntu/deepfake-detector/myapp/models/dm2.int8.pt"
+
+# 최적화 실행 모드 (channels_last + inference_mode + 선택적 torch.compile + 시작 시 워밍업)
+OPTIMIZED_MODE = False
+USE_CHANNELS_LAST = True
+TORCH_COMPILE_MODE = None      # 예: "default", "max-autotune" (eager 모델일 때만 적용)
+VERIFY_OPTIMIZED = True        # 적용 전에 eager와 수치 비교, 오차가 OPTIMIZED_ATOL을 넘으면 eager 사용
+OPTIMIZED_ATOL = 1e-3
+WARMUP_BATCH_SIZES = (1, 4, 16)
+
+# 결과 캐시 (같은 이미지 바이트 + 같은 모델/설정이면 추론 생략)
+RESULT_CACHE_ENABLED = True
+RESULT_CACHE_SIZE = 4096       # 워커별 메모리 LRU 항목 수
+RESULT_CACHE_TTL = 24 * 3600   # 초. None이면 만료 없음
+RESULT_CACHE_DB = None         # 예: "/home/ubuntu/deepfake-detector/cache/results.db" (워커 간 공유)
+RESULT_CACHE_DB_MAX_ROWS = 200_000
+# 설명(Grad-CAM, explain.py)용: 판정 때 만든 전처리 텐서를 float16으로 잠깐 보관 (항목당 약 0.5MB, 0이면 끔)
+TENSOR_CACHE_SIZE = 64
+
+# 근사 중복 (재인코딩/리사이즈/살짝 잘린 사본) → 지각 해시 해밍 거리로 이전 판정 재사용 (near_dup.py)
+#   전체 프레임 해시는 얼굴만 바꾸거나 일부만 고친 사본에도 거리 0~2로 거의 그대로 → 그것만으로는 재사용하지 않고
+#   Real/Uncertain 판정은 얼굴 영역 해시도 가까울 때만 재사용 (near_dup.reusable). 기본은 꺼 둠
+NEAR_DUP_ENABLED = False
+NEAR_DUP_HASH = "phash"        # "phash" | "dhash"
+NEAR_DUP_MAX_DISTANCE = 4      # 64비트 중 허용 해밍 거리 (전체 프레임)
+NEAR_DUP_FACE_MAX_DISTANCE = 4 # 얼굴 영역 해시 허용 거리 (얼굴이 정확히 하나일 때만 비교)
+
 # 얼굴검출 기본 파라미터
-FACE_MIN_SIZE = (60, 60)
+FACE_MIN_SIZE = (60, 60)       # 원본 해상도 기준 (축소 검출 시 같은 비율로 줄여 적용)
 FACE_SCALE = 1.2
 FACE_NEIGHBORS = 4
 
+# 얼굴 검출기 백엔드: "haar" | "yunet" | "ssd" | "retinaface" (face_detectors.py)
+#   생성 실패(모델 파일/패키지 없음) 시 haar로 대체
+#   비교: python scripts/bench_face_detectors.py --images <샘플 폴더>
+FACE_DETECTOR = "haar"
+FACE_DETECT_MAX_SIDE = 640     # 긴 변을 이 크기로 줄인 사본에서 검출 후 박스를 원본 좌표로 복원. None이면 원본
+FACE_SCORE_THRESH = 0.6        # yunet/ssd 신뢰도 하한 (retinaface는 자체 기본값 0.9)
+YUNET_MODEL_PATH = "/home/ubuntu/deepfake-detector/myapp/models/face_detection_yunet_2023mar.onnx"
+SSD_PROTOTXT_PATH = "/home/ubuntu/deepfake-detector/myapp/models/deploy.prototxt"
+SSD_MODEL_PATH = "/home/ubuntu/deepfake-detector/myapp/models/res10_300x300_ssd_iter_140000.caffemodel"
+
+# 큰 JPEG 업로드는 1/2·1/4·1/8 크기로 바로 디코딩 (헤더의 크기를 보고 배율 선택)
+#   전체 프레임: 짧은 변 >= INPUT_SIZE, 긴 변 >= FACE_DETECT_MAX_SIDE 를 지키는 가장 작은 크기
+#   크롭 모드(USE_FACE_CROP / FACE_MODE="multi"): 짧은 변 >= REDUCED_DECODE_CROP_MIN_SIDE (얼굴 크롭 해상도 확보)
+REDUCED_DECODE = True
+REDUCED_DECODE_CROP_MIN_SIDE = 1200
+
 # (선택) 완전 동일 결과를 원하면 결정론 모드
 torch.backends.cudnn.deterministic = True
 torch.backends.cudnn.benchmark = False
@@ -37,19 +148,37 @@ torch.backends.cudnn.benchmark = False
 # ✅ 모델 정의/로드
 # =========================
 class DeepFakeDetector(torch.nn.Module):
-    def __init__(self, pretrained=False):
+    # efficientnet_*: classifier를 Linear 하나로 교체 (기존 dm2.pth 구조)
+    # mobilenet_v3_*: classifier 마지막 Linear만 2클래스로 교체
+    ARCHS = ("efficientnet_b0", "efficientnet_b3", "mobilenet_v3_small", "mobilenet_v3_large")
+
+    def __init__(self, pretrained=False, arch="efficientnet_b3"):
         super(DeepFakeDetector, self).__init__()
-        self.backbone = models.efficientnet_b3(pretrained=pretrained)
-        in_features = self.backbone.classifier[1].in_features
-        self.backbone.classifier = torch.nn.Linear(in_features, 2)
+        if arch not in self.ARCHS:
+            raise ValueError(f"지원하지 않는 모델 구조: {arch} (가능: {', '.join(self.ARCHS)})")
+        self.arch = arch
+        self.backbone = getattr(models, arch)(pretrained=pretrained)
+        if arch.startswith("efficientnet"):
+            in_features = self.backbone.classifier[1].in_features
+            self.backbone.classifier = torch.nn.Linear(in_features, 2)
+        else:
+            in_features = self.backbone.classifier[-1].in_features
+            self.backbone.classifier[-1] = torch.nn.Linear(in_features, 2)
 
     def forward(self, x):
+        # 분기 없이 유지 (torch.fx 추적: quantize.py의 prepare_fx, convert_ckpt.py의 fuse)
         return self.backbone(x)
 
+    def forward_with_embedding(self, x):
+        """→ (logits, 풀링 임베딩). 풀링 특징을 classifier에 그대로 넣어 한 번의 backbone 실행으로 둘 다 얻음"""
+        b = self.backbone
+        emb = torch.flatten(b.avgpool(b.features(x)), 1)
+        return b.classifier(emb), emb
+
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
-def _build_model_from_state_dict(state_dict: dict) -> torch.nn.Module:
-    model = DeepFakeDetector(pretrained=False)
+def _build_model_from_state_dict(state_dict: dict, arch: str = "efficientnet_b3") -> torch.nn.Module:
+    model = DeepFakeDetector(pretrained=False, arch=arch)
     # DDP 저장 시 'module.' 접두어 제거
     if any(k.startswith("module.") for k in state_dict.keys()):
         state_dict = {k.replace("module.", ""): v for k, v in state_dict.items()}
@@ -60,68 +189,244 @@ def _build_model_from_state_dict(state_dict: dict) -> torch.nn.Module:
         print(f"[ai] ⚠ missing keys: {missing}")
     return model
 
-def _load_model():
-    ckpt = None
+# 현재 활성 모델 명세 {"name", "path", "arch", "artifact"} (model_registry가 교체)
+_active_spec = {"name": "default", "path": MODEL_PATH, "arch": MODEL_ARCH, "artifact": ARTIFACT_PATH}
+
+def active_spec() -> dict:
+    return dict(_active_spec)
+
+def _load_checkpoint_model(spec: dict = None) -> torch.nn.Module:
+    """
+    원본 체크포인트(state_dict / {"state_dict": ...} / DDP 'module.' 접두어) → eager 모델
+    weights_only=True로만 읽는다. 통째로 pickle된 nn.Module 등 안전 로드가 안 되는 파일은
+    scripts/convert_ckpt.py --trust-pickle 로 아티팩트로 변환해서 사용할 것.
+    """
+    spec = spec or _active_spec
     try:
-        ckpt = torch.load(MODEL_PATH, map_location=device, weights_only=True)
-    except TypeError:
-        ckpt = torch.load(MODEL_PATH, map_location=device)
+        ckpt = torch.load(spec["path"], map_location=device, weights_only=True)
     except Exception as e:
-        print(f"[ai] safe load 실패: {e}\n[ai] weights_only=False 로 재시도합니다(신뢰 가능한 파일만 사용).")
-        ckpt = torch.load(MODEL_PATH, map_location=device, weights_only=False)
+        raise RuntimeError(
+            f"[ai] 체크포인트 안전 로드 실패: {e}\n"
+            f"[ai] 신뢰할 수 있는 파일이면 scripts/convert_ckpt.py 로 추론 아티팩트를 만들어 주세요."
+        )
 
-    if isinstance(ckpt, torch.nn.Module):
-        model = ckpt
-    elif isinstance(ckpt, dict):
+    if isinstance(ckpt, dict):
         state = ckpt.get("state_dict", ckpt)
-        model = _build_model_from_state_dict(state)
+        model = _build_model_from_state_dict(state, arch=spec.get("arch") or MODEL_ARCH)
     else:
         raise RuntimeError(f"[ai] 지원하지 않는 체크포인트 타입: {type(ckpt)}")
+    return model.eval().to(device)
+
+_printed_mapping = False
+
+def _load_model(spec: dict):
+    """
+    추론용 fp32 모델. spec의 artifact(convert_ckpt.py 결과: BN folding된 frozen 그래프)가 있고
+    manifest 해시가 맞으면 그것을, 아니면 원본 체크포인트를 읽는다.
+    """
+    global _printed_mapping
+    model, manifest = (None, None)
+    artifact = spec.get("artifact")
+    if PREFER_ARTIFACT and artifact:
+        model, manifest = load_artifact(artifact, spec["path"], map_location=device)
+    if model is not None:
+        print(f"[ai] 추론 아티팩트 사용: {artifact} ({manifest.get('format')})")
+        mapping = manifest.get("class_mapping")
+        if mapping and (mapping.get(str(FAKE_IDX)) != "Fake" or mapping.get(str(REAL_IDX)) != "Real"):
+            raise RuntimeError(f"[ai] 아티팩트 클래스 매핑 불일치: {mapping}")
+    else:
+        model = _load_checkpoint_model(spec)
 
-    model.eval().to(device)
-    if not getattr(model, "_printed_mapping", False):
+    if not _printed_mapping:
         print(f"[ai] CLASS_MAPPING: {FAKE_IDX}=Fake, {REAL_IDX}=Real")
-        model._printed_mapping = True
+        _printed_mapping = True
     return model
 
-model = _load_model()
+# 모델은 처음 필요할 때 적재 (import만 하는 CLI/마이그레이션/스크립트는 체크포인트를 읽지 않음)
+# server 모드의 웹 워커는 forward를 위임하므로 아예 적재하지 않음
+_model = None
+_model_lock = threading.Lock()
+
+def get_model() -> torch.nn.Module:
+    """스레드 안전한 지연 로딩 접근자"""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                _model = _load_inference_model(_active_spec)
+    return _model
+
+# forward에 실제로 쓰는 모델 (OPTIMIZED_MODE면 최적화/검증을 거친 버전)
+# 메모리 포맷 변환과 verify용 사본은 preload()가 마스터에서 만들어 두고(_preconverted, 워커끼리 공유),
+# forward가 필요한 검증은 워커에서 처음 필요할 때 수행
+_run_model = None
+_run_model_lock = threading.Lock()
+_preconverted = None           # (변환된 모델, verify용 eager 사본|None) — preload()가 설정
+
+def _runtime_model():
+    global _run_model, _preconverted
+    if _run_model is None:
+        base = get_model()
+        with _run_model_lock:
+            if _run_model is None:
+                if not OPTIMIZED_MODE:
+                    _run_model = base
+                elif _preconverted is not None and _preconverted[0] is base:
+                    converted, reference = _preconverted
+                    _preconverted = None  # 검증이 끝나면 이 워커는 사본 참조를 버림
+                    _run_model = _finish_optimizations(converted, reference)
+                else:
+                    _run_model = _apply_optimizations(base)
+    return _run_model
+
+def _convert_model(base) -> tuple:
+    """forward 없는 최적화 단계: verify용 eager 사본(변환 전에 떠 둠) + channels_last 변환 → (모델, 사본|None)"""
+    reference = optimize.reference_copy(base) if VERIFY_OPTIMIZED else None
+    return optimize.convert_model(base, channels_last=USE_CHANNELS_LAST), reference
+
+def _apply_optimizations(base):
+    return _finish_optimizations(*_convert_model(base))
+
+def _finish_optimizations(converted, reference):
+    """compile(설정 시) + eager 사본과 수치 비교. 사본은 실패해서 대신 쓸 때만 남음"""
+    optimized = optimize.compile_model(converted, compile_mode=TORCH_COMPILE_MODE)
+    if reference is None:
+        return optimized
+
+    ok, diff = optimize.verify(reference, optimized, INPUT_SIZE,
+                               channels_last=USE_CHANNELS_LAST, atol=OPTIMIZED_ATOL)
+    if not ok:
+        print(f"[ai] ⚠ 최적화 모델 오차 {diff:.2e} > {OPTIMIZED_ATOL} → eager 모델 사용")
+        return reference
+    print(f"[ai] 최적화 모드 적용 (channels_last={USE_CHANNELS_LAST}, compile={TORCH_COMPILE_MODE}, "
+          f"eager 대비 최대 오차 {diff:.2e})")
+    return optimized
+
+def _load_inference_model(spec: dict):
+    """INFERENCE_PRECISION에 맞는 모델. int8 아티팩트가 없거나 낡았으면(다른 체크포인트용이면) fp32로 대체"""
+    if INFERENCE_PRECISION == "int8":
+        if device.type != "cpu":
+            print("[ai] ⚠ int8 양자화 모델은 CPU 전용입니다 → fp32 사용")
+        else:
+            qmodel, _ = load_int8_artifact(INT8_ARTIFACT_PATH, spec["path"])
+            if qmodel is not None:
+                print(f"[ai] int8 아티팩트 사용: {INT8_ARTIFACT_PATH}")
+                return qmodel
+            print(f"[ai] ⚠ int8 아티팩트 없음/불일치: {INT8_ARTIFACT_PATH} → fp32 사용")
+    return _load_model(spec)
+
+def load_model_spec(spec: dict) -> tuple:
+    """
+    모델 명세 → (추론 모델, forward용 모델). 교체/섀도 평가용으로 현재 모델과 별개로 적재
+    최적화 모드면 워밍업까지 끝낸 뒤 반환 (교체 직후 요청이 콜드 스타트를 떠안지 않게)
+    """
+    base = _load_inference_model(spec)
+    if not OPTIMIZED_MODE:
+        return base, base
+    run = _apply_optimizations(base)
+    optimize.warmup(lambda x: _local_forward_probs(x, model=run), WARMUP_BATCH_SIZES, INPUT_SIZE)
+    return base, run
+
+def swap_model(spec: dict, loaded: tuple = None):
+    """
+    활성 모델을 spec으로 원자적으로 교체. loaded=(모델, forward용 모델)을 주면 적재를 건너뜀.
+    loaded=False면 적재 없이 명세/지문만 교체 (server 모드 웹 워커: forward는 추론 서버가 담당)
+    이미 forward 중인 요청은 이전 모델 참조를 쥐고 끝까지 돌고, 다음 forward부터 새 모델을 쓴다.
+    """
+    global _active_spec, _model, _run_model, _embed_model, _fingerprint
+    if loaded is None:
+        loaded = load_model_spec(spec)
+    with _model_lock, _run_model_lock, _embed_model_lock:
+        _active_spec = dict(spec)
+        if loaded:
+            _model, _run_model = loaded
+        else:
+            _model = _run_model = None
+        _embed_model = None
+        _fingerprint = None
+    print(f"[ai] 활성 모델 교체: {spec.get('name')} ({spec['path']})")
+
+# 임베딩용 eager 모델: 추론 모델이 eager DeepFakeDetector면 공유, 아티팩트/int8이면 체크포인트를 따로 적재
+#   (EMBED_STORE_UPLOADS/EXPLAIN_ENABLED면 preload()가 마스터에서 미리 적재 → 워커끼리 copy-on-write 공유)
+_embed_model = None
+_embed_model_lock = threading.Lock()
+
+def get_embed_model() -> torch.nn.Module:
+    global _embed_model
+    if _embed_model is None:
+        base = get_model() if INFERENCE_BACKEND == "local" else None
+        with _embed_model_lock:
+            if _embed_model is None:
+                _embed_model = base if isinstance(base, DeepFakeDetector) else _load_checkpoint_model(_active_spec)
+    return _embed_model
+
+# 캐스케이드 1단계 모델 (워커마다 적재: server 모드여도 1단계는 로컬에서 돌리고 B3만 위임)
+_stage1_model = None
+_stage1_failed = False
+_stage1_lock = threading.Lock()
+
+def _load_stage1_model():
+    ckpt = torch.load(STAGE1_MODEL_PATH, map_location=device, weights_only=True)
+    if not isinstance(ckpt, dict):
+        raise RuntimeError(f"지원하지 않는 체크포인트 타입: {type(ckpt)}")
+    model = _build_model_from_state_dict(ckpt.get("state_dict", ckpt), arch=STAGE1_ARCH)
+    return model.eval().to(device)
+
+def get_stage1_model():
+    """1단계 모델 (로드 실패 시 None → 캐스케이드 비활성, 다시 시도하지 않음)"""
+    global _stage1_model, _stage1_failed
+    if _stage1_model is None and not _stage1_failed:
+        with _stage1_lock:
+            if _stage1_model is None and not _stage1_failed:
+                try:
+                    _stage1_model = _load_stage1_model()
+                    print(f"[ai] 캐스케이드 1단계 모델: {STAGE1_ARCH} @ {STAGE1_INPUT_SIZE} ({STAGE1_MODEL_PATH})")
+                except Exception as e:
+                    _stage1_failed = True
+                    print(f"[ai] ⚠ 1단계 모델 로드 실패 → 캐스케이드 없이 B3만 사용: {e}")
+    return _stage1_model
+
+model_client = ModelClient(MODEL_SERVER_SOCKETS, wire_dtype=MODEL_SERVER_WIRE_DTYPE) \
+    if INFERENCE_BACKEND == "server" else None
 
 # =========================
 # ✅ 전처리/얼굴 검출
 # =========================
-transform = transforms.Compose([
-    transforms.Resize((300, 300), antialias=True),
-    transforms.ToTensor(),
-    transforms.Normalize(mean=[0.485, 0.456, 0.406],
-                         std=[0.229, 0.224, 0.225])
-])
-
-# Haar 경로 준비 (없으면 None)
-HAAR_PATH = os.path.join(cv2.data.haarcascades, "haarcascade_frontalface_default.xml") \
-    if hasattr(cv2, "data") and hasattr(cv2.data, "haarcascades") else None
-face_cascade = cv2.CascadeClassifier(HAAR_PATH) if (HAAR_PATH and os.path.exists(HAAR_PATH)) else None
-
-def _prep_pil(img_bgr: np.ndarray) -> Image.Image:
-    # OpenCV BGR -> RGB, EXIF 회전 보정
-    pil = Image.fromarray(cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB))
-    pil = ImageOps.exif_transpose(pil)
-    return pil
-
-def _detect_faces(img_bgr: np.ndarray):
-    """성공 시 얼굴 리스트, 실패(검출기 없음/예외) 시 None."""
+# 얼굴 검출기 (백엔드 객체는 프로세스당 하나, 내부 OpenCV 객체는 스레드별로 생성)
+_detector = None
+_detector_lock = threading.Lock()
+
+def _detector_kwargs(name: str) -> dict:
+    kw = {"max_side": FACE_DETECT_MAX_SIDE, "min_size": FACE_MIN_SIZE}
+    if name == "haar":
+        kw.update(scale_factor=FACE_SCALE, min_neighbors=FACE_NEIGHBORS)
+    elif name == "yunet":
+        kw.update(model_path=YUNET_MODEL_PATH, score_threshold=FACE_SCORE_THRESH)
+    elif name == "ssd":
+        kw.update(prototxt=SSD_PROTOTXT_PATH, model_path=SSD_MODEL_PATH, score_threshold=FACE_SCORE_THRESH)
+    return kw
+
+def get_face_detector():
+    """설정된 얼굴 검출기 (FACE_DETECTOR 생성 실패 시 haar)"""
+    global _detector
+    if _detector is None:
+        with _detector_lock:
+            if _detector is None:
+                try:
+                    _detector = create_detector(FACE_DETECTOR, **_detector_kwargs(FACE_DETECTOR))
+                except Exception as e:
+                    print(f"[face] '{FACE_DETECTOR}' 검출기 생성 실패 → haar 사용: {e}")
+                    _detector = create_detector("haar", **_detector_kwargs("haar"))
+    return _detector
+
+def _detect_faces(img_bgr: np.ndarray, src_scale: float = 1.0):
+    """
+    성공 시 얼굴 리스트 [(x,y,w,h)] (img_bgr 좌표), 실패(검출기 없음/예외) 시 None.
+    src_scale: 축소 디코딩 배율 (FACE_MIN_SIZE는 업로드 원본 기준이라 같이 줄여 적용)
+    """
     if img_bgr is None:
         return None
-    if face_cascade is None:
-        # 검출기 자체가 없으면 None
-        return None
-    try:
-        gray = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2GRAY)
-        faces = face_cascade.detectMultiScale(
-            gray, scaleFactor=FACE_SCALE, minNeighbors=FACE_NEIGHBORS, minSize=FACE_MIN_SIZE
-        )
-        return faces  # list-like
-    except Exception as _:
-        return None
+    return get_face_detector().detect(img_bgr, src_scale=src_scale)
 
 def _pick_face(faces):
     if faces is None or len(faces) == 0:
@@ -130,12 +435,689 @@ def _pick_face(faces):
         return max(faces, key=lambda b: b[2] * b[3])
     return faces[0]
 
+# =========================
+# ✅ 배치 추론
+# =========================
+def _label_from_probs(prob) -> tuple:
+    """softmax 확률 한 줄(길이 2) → (label, score)"""
+    fake_prob = float(prob[FAKE_IDX].item())
+    real_prob = float(prob[REAL_IDX].item())
+    score = max(fake_prob, real_prob)
+
+    # 임계값(선택): 확신 낮으면 Uncertain
+    if THRESH is not None and score < THRESH:
+        return "Uncertain", score
+
+    label = "Fake" if fake_prob >= real_prob else "Real"
+    return label, score
+
+def _local_forward_probs(batch: torch.Tensor, model=None) -> torch.Tensor:
+    """[N,3,H,W] → 이 프로세스의 모델(model을 주면 그 모델)로 forward → softmax 확률 [N,2] (CPU)"""
+    model = model or _runtime_model()
+    if OPTIMIZED_MODE:
+        batch = optimize.prepare_input(batch, channels_last=USE_CHANNELS_LAST)
+    with optimize.grad_context(OPTIMIZED_MODE), autocast_context(INFERENCE_PRECISION):
+        logits = model(batch.to(device))
+    return F.softmax(logits.float(), dim=1).cpu()
+
+def _forward_probs(batch: torch.Tensor) -> torch.Tensor:
+    if INFERENCE_BACKEND == "server":
+        return torch.from_numpy(model_client.predict(batch.numpy()))
+    return _served_forward_probs(batch)
+
+# 섀도 평가 훅 (model_registry가 설정): hook(batch, probs, ms_per_image) — 샘플링 후 큐에 넣기만 해야 함
+shadow_hook = None
+
+def _served_forward_probs(batch: torch.Tensor) -> torch.Tensor:
+    """
+    요청 경로의 활성 모델 forward (로컬 모드 / 추론 서버). 섀도 훅에는 같은 입력과
+    캐스케이드/TTA 전의 원시 확률, 여기서 잰 이미지당 지연을 넘김 → 후보 모델과 원시 대 원시로 비교
+    """
+    t0 = time.perf_counter()
+    probs = _local_forward_probs(batch)
+    hook = shadow_hook
+    if hook is not None:
+        hook(batch, probs, 1000.0 * (time.perf_counter() - t0) / len(batch))
+    return probs
+
+# 캐스케이드 통계: 단계별 이미지 수 + 이미지당 지연(ms, 배치 시간 / 배치 크기)
+_cascade_stats = {"images": 0, "stage1_accepted": 0, "escalated": 0, "stage1_ms": 0.0, "stage2_ms": 0.0}
+_cascade_stats_lock = threading.Lock()
+_stage1_ms_hist = Histogram([0.5, 1, 2, 5, 10, 20, 50, 100])
+_stage2_ms_hist = Histogram([1, 2, 5, 10, 20, 50, 100, 200, 500])
+
+def _stage1_probs(model, batch: torch.Tensor) -> torch.Tensor:
+    """INPUT_SIZE 텐서를 STAGE1_INPUT_SIZE로 줄여 1단계 forward → softmax 확률 [N,2] (CPU)"""
+    if batch.shape[-1] != STAGE1_INPUT_SIZE:
+        batch = F.interpolate(batch, size=(STAGE1_INPUT_SIZE, STAGE1_INPUT_SIZE),
+                              mode="bilinear", align_corners=False, antialias=True)
+    with torch.inference_mode():
+        logits = model(batch.to(device))
+    return F.softmax(logits.float(), dim=1).cpu()
+
+def _cascade_probs(batch: torch.Tensor) -> torch.Tensor:
+    """CASCADE_ENABLED면 1단계로 거르고 CASCADE_BAND 안의 행만 B3 forward. 아니면 B3 그대로"""
+    stage1 = get_stage1_model() if CASCADE_ENABLED else None
+    if stage1 is None:
+        return _forward_probs(batch)
+
+    t0 = time.perf_counter()
+    probs = _stage1_probs(stage1, batch)
+    t1 = time.perf_counter()
+    fake = probs[:, FAKE_IDX]
+    hard = ((fake >= CASCADE_BAND[0]) & (fake <= CASCADE_BAND[1])).nonzero().flatten()
+    if len(hard):
+        probs[hard] = _forward_probs(batch[hard])
+    t2 = time.perf_counter()
+
+    n, m = len(probs), len(hard)
+    _stage1_ms_hist.observe(1000.0 * (t1 - t0) / n)
+    if m:
+        _stage2_ms_hist.observe(1000.0 * (t2 - t1) / m)
+    with _cascade_stats_lock:
+        _cascade_stats["images"] += n
+        _cascade_stats["stage1_accepted"] += n - m
+        _cascade_stats["escalated"] += m
+        _cascade_stats["stage1_ms"] += 1000.0 * (t1 - t0)
+        _cascade_stats["stage2_ms"] += 1000.0 * (t2 - t1)
+    return probs
+
+def _cascade_report() -> dict:
+    with _cascade_stats_lock:
+        s = dict(_cascade_stats)
+    n = s["images"]
+    return {
+        "enabled": CASCADE_ENABLED,
+        "active": _stage1_model is not None,
+        "stage1": {"arch": STAGE1_ARCH, "input_size": STAGE1_INPUT_SIZE},
+        "band": list(CASCADE_BAND),
+        "images": n,
+        "stage1_accepted": s["stage1_accepted"],
+        "escalated": s["escalated"],
+        "escalation_rate": round(s["escalated"] / n, 4) if n else None,
+        # 캐스케이드 적용 후 이미지당 평균 비용 vs B3만 돌렸을 때(= 2단계 이미지당 지연)
+        "avg_ms_per_image": round((s["stage1_ms"] + s["stage2_ms"]) / n, 3) if n else None,
+        "stage1_ms_per_image": _stage1_ms_hist.snapshot(),
+        "stage2_ms_per_image": _stage2_ms_hist.snapshot(),
+    }
+
+_tta_stats = {"checked": 0, "expanded": 0}
+_tta_stats_lock = threading.Lock()
+
+def _tta_views(batch: torch.Tensor) -> torch.Tensor:
+    """[N,3,H,W] → TTA_VIEWS 순서의 뷰들 [N*V,3,H,W] (이미지별로 연속)"""
+    size = batch.shape[-1]
+    c = int(round(size * TTA_CROP_RATIO))
+    o = (size - c) // 2
+    views = []
+    for name in TTA_VIEWS:
+        x = batch
+        if "crop" in name:
+            x = F.interpolate(x[..., o:o + c, o:o + c], size=(size, size), mode="bilinear", align_corners=False)
+        if "hflip" in name:
+            x = torch.flip(x, dims=[3])
+        views.append(x)
+    return torch.stack(views, dim=1).reshape(-1, *batch.shape[1:])
+
+def _tta_refine(batch: torch.Tensor, probs: torch.Tensor) -> torch.Tensor:
+    """1차 확률이 TTA_BAND 안인 행만 뷰를 만들어 한 번에 (B3) forward → 원본 포함 평균으로 교체"""
+    if not TTA_ENABLED or not TTA_VIEWS:
+        return probs
+    fake = probs[:, FAKE_IDX]
+    hard = ((fake >= TTA_BAND[0]) & (fake <= TTA_BAND[1])).nonzero().flatten()
+    with _tta_stats_lock:
+        _tta_stats["checked"] += len(probs)
+        _tta_stats["expanded"] += len(hard)
+    if len(hard) == 0:
+        return probs
+
+    vprobs = _forward_probs(_tta_views(batch[hard])).reshape(len(hard), len(TTA_VIEWS), -1)
+    probs = probs.clone()
+    probs[hard] = (probs[hard] + vprobs.sum(dim=1)) / (1 + len(TTA_VIEWS))
+    return probs
+
+def _predict_probs(batch: torch.Tensor) -> torch.Tensor:
+    """[N,3,H,W] → 캐스케이드(설정 시) → 애매한 것만 TTA → softmax 확률 [N,2]"""
+    return _tta_refine(batch, _cascade_probs(batch))
+
+def _classify_tensors(tensors: list) -> list:
+    """전처리된 [3,H,W] 텐서 리스트 → 한 번의 forward (+ 캐스케이드/TTA) → [(label, score), ...]"""
+    probs = _predict_probs(torch.stack(tensors))
+    return [_label_from_probs(p) for p in probs]
+
+batcher = MicroBatcher(_classify_tensors, max_batch_size=BATCH_MAX_SIZE,
+                       max_wait_ms=BATCH_MAX_WAIT_MS, name="ai")
+
+def _classify_tensor(tensor: torch.Tensor) -> tuple:
+    if USE_MICRO_BATCH:
+        return batcher.infer(tensor)
+    return _classify_tensors([tensor])[0]
+
+# =========================
+# ✅ gunicorn --preload 연동
+# =========================
+TORCH_THREADS = None           # 워커별 intra-op 스레드 수. None이면 코어 수 / 워커 수
+TORCH_INTEROP_THREADS = 1      # inter-op 스레드 수 (요청 단위 병렬은 gunicorn 스레드가 담당)
+
+def preload():
+    """
+    마스터 프로세스에서 가중치를 미리 올림 → fork된 워커들이 copy-on-write로 페이지 공유.
+    최적화 모드면 channels_last 변환(+verify용 사본)도 여기서 한 번 → 워커마다 가중치를 다시 쓰지 않음
+    (OpenMP 스레드풀이 fork를 넘지 못하므로 여기서는 forward를 돌리지 않는다)
+    """
+    global _preconverted
+    if INFERENCE_BACKEND == "local":
+        base = get_model()
+        if OPTIMIZED_MODE and _run_model is None:
+            with _run_model_lock:
+                _preconverted = _convert_model(base)
+        print("[ai] preload 완료 (마스터에서 모델 적재)")
+    # 임베딩 저장/Grad-CAM용 eager 모델도 여기서 (int8/아티팩트/server 모드면 별도 fp32 체크포인트 → 워커마다 적재하지 않게)
+    from . import embeddings, explain  # explain이 ai를 import하므로 지연 import
+    if embeddings.EMBED_STORE_UPLOADS and INFERENCE_PRECISION != "fp32":
+        print(f"[ai] ⚠ EMBED_STORE_UPLOADS는 fp32 eager 모델로 판정합니다 "
+              f"(INFERENCE_PRECISION={INFERENCE_PRECISION}인 다른 경로와 점수가 다를 수 있음)")
+    if embeddings.EMBED_STORE_UPLOADS or explain.EXPLAIN_ENABLED:
+        get_embed_model()
+        print("[ai] preload 완료 (임베딩/설명용 eager 모델)")
+
+def after_fork(num_workers: int = 1):
+    """fork 직후 워커에서 호출: torch 스레드 수를 워커 몫으로 재설정 (+ 최적화 모드면 워밍업)"""
+    threads = TORCH_THREADS or max(1, (os.cpu_count() or 1) // max(1, num_workers))
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(TORCH_INTEROP_THREADS)
+    except RuntimeError:
+        # 이미 병렬 작업이 시작된 프로세스에서는 바꿀 수 없음
+        pass
+    if OPTIMIZED_MODE and INFERENCE_BACKEND == "local":
+        warmup()
+
+def warmup():
+    """WARMUP_BATCH_SIZES로 미리 forward → 첫 실제 요청이 lazy 초기화/커널 선택 비용을 떠안지 않게"""
+    timings = optimize.warmup(_local_forward_probs, WARMUP_BATCH_SIZES, INPUT_SIZE)
+    print(f"[ai] 워밍업 완료 (배치크기별 ms): {timings}")
+    return timings
+
+def get_stats() -> dict:
+    """튜닝용 추론 통계 (배치 크기/큐 대기 히스토그램 등)"""
+    return {
+        "backend": INFERENCE_BACKEND,
+        "precision": INFERENCE_PRECISION,
+        "face_detector": {"name": get_face_detector().name, "max_side": FACE_DETECT_MAX_SIDE},
+        "batching": {"enabled": USE_MICRO_BATCH, **batcher.stats()},
+        "result_cache": {"enabled": RESULT_CACHE_ENABLED, **result_cache.stats()},
+        "cascade": _cascade_report(),
+        "tta": {"enabled": TTA_ENABLED, "band": list(TTA_BAND), "views": list(TTA_VIEWS), **_tta_stats},
+        "near_dup": {"enabled": NEAR_DUP_ENABLED, "ready": near_dup.ready(), "size": len(near_dup.index)},
+    }
+
+# =========================
+# ✅ 입력 로딩/전처리
+# =========================
+_DETECT = object()  # faces 인자 기본값: 아직 검출 안 함 (None은 검출 실패)
+
+def _prepare(original: np.ndarray, src_scale: float = 1.0, faces=_DETECT) -> tuple:
+    """
+    디코딩된 BGR 이미지 → (조기 라벨, 전처리 텐서)
+    분류가 필요 없으면(NoFace) 텐서는 None, 분류가 필요하면 라벨은 None
+    faces: 이미 검출한 결과가 있으면 재사용
+    """
+    # --- 얼굴 유무 선검사 ---
+    if faces is _DETECT:
+        faces = _detect_faces(original, src_scale)
+
+    if ENFORCE_NOFACE:
+        # 검출기 실패(None) 또는 탐지 0개 → 일관되게 NoFace
+        if faces is None or len(faces) == 0:
+            return "NoFace", None
+
+    # --- 얼굴 크롭 정책 ---
+    if USE_FACE_CROP:
+        if faces is None or len(faces) == 0:
+            # 크롭 모드인데 얼굴이 없으면 NoFace
+            return "NoFace", None
+        x, y, w, h = _pick_face(faces)
+        target = original[y:y + h, x:x + w]
+    else:
+        # 전체 프레임 사용
+        target = original
+
+    return None, preprocess.to_tensor(target, INPUT_SIZE)
+
+def _load_image(image):
+    """
+    입력 → BGR ndarray (실패 시 None). EXIF 회전은 OpenCV 디코더가 적용 (IMREAD_COLOR 기본 동작)
+      - str / PathLike: 파일 경로 (cv2.imread)
+      - bytes / bytearray / memoryview: 인코딩된 이미지 버퍼 (cv2.imdecode)
+      - file-like(read 지원): 버퍼를 읽어서 imdecode (읽은 뒤 가능하면 위치 복원)
+      - np.ndarray: 이미 디코딩된 BGR 이미지
+    """
+    if isinstance(image, np.ndarray):
+        return image
+    if isinstance(image, (str, os.PathLike)):
+        return cv2.imread(os.fspath(image), cv2.IMREAD_COLOR)
+    if hasattr(image, "read"):
+        pos = image.tell() if hasattr(image, "tell") else None
+        data = image.read()
+        if pos is not None and hasattr(image, "seek"):
+            image.seek(pos)
+        image = data
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        buf = np.frombuffer(image, dtype=np.uint8)
+        if buf.size == 0:
+            return None
+        return cv2.imdecode(buf, cv2.IMREAD_COLOR)
+    raise TypeError(f"지원하지 않는 이미지 입력 타입: {type(image)}")
+
+def _decode_limits(crops: bool = False) -> tuple:
+    """축소 디코딩 후에도 지켜야 할 (짧은 변, 긴 변) 최소 크기. crops=True면 얼굴 크롭용 해상도"""
+    if crops or USE_FACE_CROP or FACE_MODE == "multi":
+        return max(INPUT_SIZE, REDUCED_DECODE_CROP_MIN_SIDE), 0
+    # 원본 해상도 검출(FACE_DETECT_MAX_SIDE=None)이면 축소하지 않음
+    return INPUT_SIZE, FACE_DETECT_MAX_SIDE or float("inf")
+
+def _decode(buf, crops: bool = False) -> tuple:
+    """_read_input 결과 → (BGR 이미지|None, 업로드 원본 대비 배율)"""
+    if REDUCED_DECODE and isinstance(buf, (bytes, bytearray, memoryview)):
+        return preprocess.decode_reduced(buf, *_decode_limits(crops))
+    return _load_image(buf), 1.0
+
+def _read_input(image):
+    """경로/file-like 입력은 바이트로 읽어 둔다(캐시 키 계산과 디코딩에 같이 사용). 나머지는 그대로"""
+    if isinstance(image, (str, os.PathLike)):
+        with open(image, "rb") as f:
+            return f.read()
+    if hasattr(image, "read"):
+        pos = image.tell() if hasattr(image, "tell") else None
+        data = image.read()
+        if pos is not None and hasattr(image, "seek"):
+            image.seek(pos)
+        return data
+    return image
+
+def _describe(image):
+    """로그/반환용: 경로 입력이면 경로, 아니면 None"""
+    return os.fspath(image) if isinstance(image, (str, os.PathLike)) else None
+
+# =========================
+# ✅ 결과 캐시 (이미지 바이트 SHA-256 + 모델 지문)
+# =========================
+result_cache = ResultCache(max_entries=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL,
+                           db_path=RESULT_CACHE_DB, db_max_rows=RESULT_CACHE_DB_MAX_ROWS)
+tensor_cache = LRUCache(max_entries=max(1, TENSOR_CACHE_SIZE), ttl=RESULT_CACHE_TTL)
+_fingerprint = None
+
+def model_fingerprint() -> str:
+    """체크포인트 해시 + 결과에 영향을 주는 설정값. 둘 중 하나라도 바뀌면 캐시 키가 달라진다"""
+    global _fingerprint
+    if _fingerprint is None:
+        try:
+            ckpt_hash = file_sha256(_active_spec["path"])
+        except OSError:
+            ckpt_hash = "unknown"
+        settings = (f"crop={USE_FACE_CROP}|thresh={THRESH}|noface={ENFORCE_NOFACE}|prec={INFERENCE_PRECISION}"
+                    f"|faces={FACE_MODE}:{FACE_MARGIN}:{MULTI_FACE_AGG}:{MULTI_FACE_MAX}"
+                    f"|tiles={TILE_REGIONS}:{TILE_MIN_SIDE}:{TILE_OVERLAP}:{TILE_MAX_TILES}:{TILE_AGG}:{TILE_TOPK}"
+                    f"|det={get_face_detector().name}:{FACE_DETECT_MAX_SIDE}|pre=cv2"
+                    f"|rd={REDUCED_DECODE}:{REDUCED_DECODE_CROP_MIN_SIDE}"
+                    f"|tta={TTA_ENABLED}:{TTA_BAND}:{','.join(TTA_VIEWS)}:{TTA_CROP_RATIO}")
+        if CASCADE_ENABLED and get_stage1_model() is not None:
+            try:
+                stage1_hash = file_sha256(STAGE1_MODEL_PATH)
+            except OSError:
+                stage1_hash = "unknown"
+            settings += f"|cascade={STAGE1_ARCH}:{STAGE1_INPUT_SIZE}:{CASCADE_BAND}:{stage1_hash}"
+        _fingerprint = sha256_hex(f"{ckpt_hash}|{settings}".encode())[:16]
+    return _fingerprint
+
+def _cache_key(buf) -> str:
+    if isinstance(buf, np.ndarray):
+        digest = sha256_hex(str(buf.shape).encode() + np.ascontiguousarray(buf).tobytes())
+    else:
+        digest = sha256_hex(buf)
+    return f"{model_fingerprint()}:{digest}"
+
+# 판정 저장 위치: cache=결과 캐시 키, phash/face_hash=근사 중복 인덱스에 기록할 지각 해시 (모두 없을 수 있음)
+_ResultKey = namedtuple("_ResultKey", ["cache", "phash", "face_hash"])
+
+def _cache_put(key, label, score):
+    # Error는 일시적일 수 있으니 캐시하지 않음
+    if key is None or label == "Error":
+        return
+    if key.cache is not None:
+        result_cache.put(key.cache, (label, score))
+    if key.phash is not None:
+        near_dup.record(key.phash, label, score, key.face_hash)
+
+def _face_hash(original: np.ndarray, faces):
+    """얼굴이 정확히 하나면 그 영역의 지각 해시, 아니면 None (여러 얼굴 중 하나만 바꾼 사본을 놓치지 않게)"""
+    if faces is None or len(faces) != 1:
+        return None
+    x, y, w, h = faces[0]
+    region = original[y:y + h, x:x + w]
+    return near_dup.HASHES[NEAR_DUP_HASH](region) if region.size else None
+
+def _load_and_prepare(image) -> tuple:
+    """
+    입력 → (확정 결과, 텐서, 저장키)
+      - 캐시 적중/근사 중복/NoFace/Error처럼 추론 없이 결정되면 확정 결과=(label, score[, info]), 텐서=None
+        (근사 중복이면 info={"near_duplicate": {"id", "distance"}})
+      - 추론이 필요하면 확정 결과=None (추론 후 저장키로 캐시/해시 기록)
+    """
+    try:
+        buf = _read_input(image)
+        digest_key = _cache_key(buf) if (RESULT_CACHE_ENABLED or TENSOR_CACHE_SIZE) else None
+        cache_key = None
+        if RESULT_CACHE_ENABLED:
+            cache_key = digest_key
+            hit = result_cache.get(cache_key)
+            if hit is not None:
+                return hit, None, None
+
+        original, src_scale = _decode_for_tiles(buf) if FACE_MODE == "tiles" else _decode(buf)
+        if original is None:
+            print(f"❌ 이미지 로딩 실패: {_describe(image)}")
+            return ("Error", 0.0), None, None
+
+        key = _ResultKey(cache_key, None, None)
+        faces = _DETECT
+        if NEAR_DUP_ENABLED and near_dup.ready():
+            # 얼굴 검출은 어차피 필요하므로 여기서 한 번 하고 아래 전처리/분석에 넘김
+            faces = _detect_faces(original, src_scale)
+            h, face_h = near_dup.HASHES[NEAR_DUP_HASH](original), _face_hash(original, faces)
+            has_face = faces is not None and len(faces) > 0
+            match = near_dup.index.query(h, NEAR_DUP_MAX_DISTANCE)
+            if match is not None and near_dup.reusable(match, face_h, has_face, NEAR_DUP_FACE_MAX_DISTANCE):
+                # 이미 저장된 판정 재사용 (해시는 다시 기록하지 않고, 바이트 캐시에만 넣음)
+                _cache_put(key, match["label"], match["score"])
+                info = {"near_duplicate": {"id": match["id"], "distance": match["distance"]}}
+                return (match["label"], match["score"], info), None, None
+            key = key._replace(phash=h, face_hash=face_h)
+
+        if FACE_MODE in ("multi", "tiles"):
+            # 얼굴별/타일별 배치 추론까지 여기서 끝냄
+            analyze = _analyze_tiles_decoded if FACE_MODE == "tiles" else _analyze_decoded
+            analysis = analyze(original, src_scale, faces)
+            result = (analysis["label"], analysis["score"])
+            _cache_put(key, *result)
+            return result, None, None
+
+        early, tensor = _prepare(original, src_scale, faces)
+        if early is not None:
+            _cache_put(key, early, 0.0)
+            return (early, 0.0), None, None
+        if TENSOR_CACHE_SIZE:
+            tensor_cache.put(digest_key, tensor.half())
+        return None, tensor, key
+    except Exception as e:
+        print(f"[ai] 전처리 예외: {e}")
+        return ("Error", 0.0), None, None
+
+def prepared_tensor(image) -> tuple:
+    """
+    설명(Grad-CAM)용 입력 → (조기 라벨, [3,H,W] 텐서, 캐시 재사용 여부). 판정 때 캐시해 둔 전처리 텐서가 있으면 재사용,
+    없으면(캐시 적중/근사 중복으로 판정했거나 밀려남) 디코딩+전처리. NoFace/Error면 텐서=None
+    """
+    buf = _read_input(image)
+    if TENSOR_CACHE_SIZE:
+        cached = tensor_cache.get(_cache_key(buf))
+        if cached is not None:
+            return None, cached.float(), True
+    original, src_scale = _decode(buf)
+    if original is None:
+        return "Error", None, False
+    return (*_prepare(original, src_scale), False)
+
+# =========================
+# ✅ 다중 얼굴 분석
+# =========================
+def _crop_with_margin(img: np.ndarray, box, margin: float) -> np.ndarray:
+    x, y, w, h = [int(v) for v in box]
+    dx, dy = int(w * margin), int(h * margin)
+    H, W = img.shape[:2]
+    x0, y0 = max(0, x - dx), max(0, y - dy)
+    x1, y1 = min(W, x + w + dx), min(H, y + h + dy)
+    return img[y0:y1, x0:x1]
+
+def _aggregate_faces(fake_probs: list) -> float:
+    """얼굴별 fake 확률 → 이미지 fake 확률 (MULTI_FACE_AGG)"""
+    if MULTI_FACE_AGG == "mean":
+        return float(sum(fake_probs) / len(fake_probs))
+    if MULTI_FACE_AGG == "vote":
+        # Fake로 판정된 얼굴 비율 (동수면 Fake 쪽으로)
+        return float(sum(1 for p in fake_probs if p >= 0.5) / len(fake_probs))
+    return float(max(fake_probs))
+
+def _analyze_decoded(original: np.ndarray, src_scale: float = 1.0, faces=_DETECT) -> dict:
+    """src_scale: 축소 디코딩 배율. 반환하는 box는 업로드 원본 좌표로 되돌린다"""
+    if faces is _DETECT:
+        faces = _detect_faces(original, src_scale)
+    if faces is None or len(faces) == 0:
+        return {"label": "NoFace", "score": 0.0, "faces": [], "aggregate": None}
+
+    boxes = sorted(faces, key=lambda b: b[2] * b[3], reverse=True)[:MULTI_FACE_MAX]
+    batch = preprocess.to_batch([_crop_with_margin(original, b, FACE_MARGIN) for b in boxes], INPUT_SIZE)
+    probs = torch.cat([_predict_probs(batch[i:i + BATCH_CHUNK_SIZE]) for i in range(0, len(batch), BATCH_CHUNK_SIZE)])
+
+    face_items = []
+    for box, prob in zip(boxes, probs):
+        label, score = _label_from_probs(prob)
+        face_items.append({
+            "box": [int(round(v / src_scale)) for v in box],
+            "fake_prob": round(float(prob[FAKE_IDX]), 4),
+            "real_prob": round(float(prob[REAL_IDX]), 4),
+            "label": label,
+            "score": round(score, 4),
+        })
+
+    fake_prob = _aggregate_faces([f["fake_prob"] for f in face_items])
+    agg = torch.zeros(2)
+    agg[FAKE_IDX], agg[REAL_IDX] = fake_prob, 1.0 - fake_prob
+    label, score = _label_from_probs(agg)
+    return {
+        "label": label,
+        "score": score,
+        "faces": face_items,
+        "aggregate": {"method": MULTI_FACE_AGG, "fake_prob": round(fake_prob, 4)},
+    }
+
+def analyze_faces(image) -> dict:
+    """
+    검출된 모든 얼굴을 (여백 포함) 크롭해 한 번의 배치 forward로 분류.
+    반환: {"label", "score", "faces": [{"box":[x,y,w,h], "fake_prob", "real_prob", "label", "score"}],
+           "aggregate": {"method", "fake_prob"}}
+    label ∈ {"Fake","Real","Uncertain","NoFace","Error"}. FACE_MODE와 상관없이 호출 가능.
+    """
+    try:
+        original, src_scale = _decode(_read_input(image), crops=True)
+        if original is None:
+            print(f"❌ 이미지 로딩 실패: {_describe(image)}")
+            return {"label": "Error", "score": 0.0, "faces": [], "aggregate": None}
+        return _analyze_decoded(original, src_scale)
+    except Exception as e:
+        print(f"[ai] 다중 얼굴 분석 예외: {e}")
+        return {"label": "Error", "score": 0.0, "faces": [], "aggregate": None}
+
+# =========================
+# ✅ 타일 분석 (큰 이미지)
+# =========================
+def _tile_starts(length: int, size: int, stride: int) -> list:
+    """한 축의 타일 시작 좌표. 마지막 타일은 가장자리에 맞춤 (모든 타일이 size 크기)"""
+    if length <= size:
+        return [0]
+    n = -(-(length - size) // stride) + 1
+    return sorted({min(i * stride, length - size) for i in range(n)})
+
+def _tile_stride() -> int:
+    return max(1, int(INPUT_SIZE * (1.0 - TILE_OVERLAP)))
+
+def _tile_count(width: int, height: int) -> int:
+    stride = _tile_stride()
+    return len(_tile_starts(int(width), INPUT_SIZE, stride)) * len(_tile_starts(int(height), INPUT_SIZE, stride))
+
+def _tile_whole(width: int, height: int) -> bool:
+    """grid 모드에서 업로드 원본(축소 디코딩 전) 크기가 작아 타일 없이 전체 프레임 하나로 분류할지"""
+    return TILE_REGIONS == "grid" and min(width, height) < TILE_MIN_SIDE
+
+def _tile_scale(width: int, height: int) -> float:
+    """
+    격자 타일 수가 TILE_MAX_TILES 이하가 되는 최대 배율 (<= 1).
+    짧은 변은 INPUT_SIZE 아래로 줄이지 않음 (아주 길쭉한 이미지는 타일 수가 상한을 넘을 수 있음)
+    """
+    if TILE_REGIONS != "grid":
+        return 1.0
+    floor = min(1.0, INPUT_SIZE / float(min(width, height)))
+    scale = min(1.0, (TILE_MAX_TILES * _tile_stride() ** 2 / float(width * height)) ** 0.5)
+    while scale > floor and _tile_count(width * scale, height * scale) > TILE_MAX_TILES:
+        scale *= 0.95
+    return max(scale, floor)
+
+def _decode_for_tiles(buf) -> tuple:
+    """타일 모드 디코딩: 타일링에 쓸 배율까지만 축소 디코딩 (원본 크기 버퍼를 만들지 않음)"""
+    if REDUCED_DECODE and isinstance(buf, (bytes, bytearray, memoryview)):
+        if TILE_REGIONS == "faces":
+            return preprocess.decode_reduced(buf, *_decode_limits(crops=True))
+        _, w, h = preprocess.header_size(buf)
+        if w and h:
+            scale = 1.0 if _tile_whole(w, h) else _tile_scale(w, h)
+            return preprocess.decode_reduced(buf, max(INPUT_SIZE, int(min(w, h) * scale)), int(max(w, h) * scale))
+    return _load_image(buf), 1.0
+
+def _aggregate_tiles(fake_probs: list) -> float:
+    """타일별 fake 확률 → 이미지 fake 확률 (TILE_AGG)"""
+    if TILE_AGG == "mean":
+        return float(sum(fake_probs) / len(fake_probs))
+    if TILE_AGG == "topk":
+        top = sorted(fake_probs, reverse=True)[:max(1, TILE_TOPK)]
+        return float(sum(top) / len(top))
+    return float(max(fake_probs))
+
+def _tile_boxes(img: np.ndarray, faces, whole: bool = False) -> tuple:
+    """→ (타일 박스 [(x,y,w,h)] img 좌표, 격자 (rows, cols) | None). whole이면 전체 프레임 하나"""
+    H, W = img.shape[:2]
+    if TILE_REGIONS == "faces":
+        boxes = []
+        for x, y, w, h in sorted(faces, key=lambda b: b[2] * b[3], reverse=True)[:TILE_MAX_TILES]:
+            side = min(max(INPUT_SIZE, int(max(w, h) * (1 + 2 * FACE_MARGIN))), W, H)
+            cx, cy = x + w // 2, y + h // 2
+            x0 = min(max(0, cx - side // 2), W - side)
+            y0 = min(max(0, cy - side // 2), H - side)
+            boxes.append((x0, y0, side, side))
+        return boxes, None
+    if whole:
+        return [(0, 0, W, H)], (1, 1)
+    stride = _tile_stride()
+    ys, xs = _tile_starts(H, INPUT_SIZE, stride), _tile_starts(W, INPUT_SIZE, stride)
+    return [(x, y, min(INPUT_SIZE, W), min(INPUT_SIZE, H)) for y in ys for x in xs], (len(ys), len(xs))
+
+def _analyze_tiles_decoded(original: np.ndarray, src_scale: float = 1.0, faces=_DETECT) -> dict:
+    """src_scale: 디코딩 배율. 타일 수 상한에 맞춰 한 번 더 줄인 뒤 타일링하고, box는 업로드 원본 좌표로 되돌린다"""
+    if faces is _DETECT:
+        faces = _detect_faces(original, src_scale)
+    if ENFORCE_NOFACE or TILE_REGIONS == "faces":
+        if faces is None or len(faces) == 0:
+            return {"label": "NoFace", "score": 0.0, "tiles": [], "grid": None, "aggregate": None}
+
+    img, scale = original, src_scale
+    H, W = img.shape[:2]
+    # 타일링 여부는 업로드 원본 크기로 판단 (축소 디코딩/축소된 크기로 보면 큰 사진도 한 장으로 분류됨)
+    whole = _tile_whole(W / src_scale, H / src_scale)
+    s = 1.0 if whole else _tile_scale(W, H)
+    if s < 1.0:
+        img = cv2.resize(img, (max(1, int(W * s)), max(1, int(H * s))), interpolation=cv2.INTER_AREA)
+        faces = [tuple(int(v * s) for v in b) for b in faces] if faces is not None else faces
+        scale *= s
+    boxes, grid = _tile_boxes(img, faces if faces is not None else [], whole)
+
+    # TILE_BATCH_SIZE개씩만 텐서로 만들어 forward (타일 텐서를 한꺼번에 만들지 않음)
+    fake_probs = []
+    for i in range(0, len(boxes), TILE_BATCH_SIZE):
+        chunk = [img[y:y + h, x:x + w] for x, y, w, h in boxes[i:i + TILE_BATCH_SIZE]]
+        probs = _predict_probs(preprocess.to_batch(chunk, INPUT_SIZE))
+        fake_probs.extend(float(p[FAKE_IDX]) for p in probs)
+
+    tiles = [{"box": [int(round(v / scale)) for v in box], "fake_prob": round(p, 4)}
+             for box, p in zip(boxes, fake_probs)]
+    fake_prob = _aggregate_tiles(fake_probs)
+    agg = torch.zeros(2)
+    agg[FAKE_IDX], agg[REAL_IDX] = fake_prob, 1.0 - fake_prob
+    label, score = _label_from_probs(agg)
+    return {
+        "label": label,
+        "score": score,
+        "tiles": tiles,
+        # 격자 모드: 타일 fake 확률을 행/열로 배치한 거친 점수 맵
+        "grid": {"rows": grid[0], "cols": grid[1],
+                 "fake_prob": [[t["fake_prob"] for t in tiles[r * grid[1]:(r + 1) * grid[1]]]
+                               for r in range(grid[0])]} if grid else None,
+        "aggregate": {"method": TILE_AGG, "fake_prob": round(fake_prob, 4), "scale": round(scale, 4)},
+    }
+
+def analyze_tiles(image) -> dict:
+    """
+    큰 이미지를 겹치는 INPUT_SIZE 타일(또는 얼굴 중심 영역)로 나눠 TILE_BATCH_SIZE개씩 배치 분류 후 TILE_AGG로 집계.
+    반환: {"label", "score", "tiles": [{"box":[x,y,w,h], "fake_prob"}],
+           "grid": {"rows", "cols", "fake_prob": [[...]]} | None, "aggregate": {"method", "fake_prob", "scale"}}
+    FACE_MODE와 상관없이 호출 가능.
+    """
+    try:
+        original, src_scale = _decode_for_tiles(_read_input(image))
+        if original is None:
+            print(f"❌ 이미지 로딩 실패: {_describe(image)}")
+            return {"label": "Error", "score": 0.0, "tiles": [], "grid": None, "aggregate": None}
+        return _analyze_tiles_decoded(original, src_scale)
+    except Exception as e:
+        print(f"[ai] 타일 분석 예외: {e}")
+        return {"label": "Error", "score": 0.0, "tiles": [], "grid": None, "aggregate": None}
+
+# =========================
+# ✅ 판정 + 임베딩 (유사 이미지 검색용)
+# =========================
+def embed_and_classify(image) -> dict:
+    """
+    한 번의 forward로 판정과 풀링 임베딩(L2 정규화 float32 [D])을 같이 반환.
+    반환: {"label", "score", "embedding": np.ndarray | None}  ※ NoFace/Error면 embedding=None
+    임베딩이 필요하므로 결과 캐시/근사 중복/마이크로배처를 거치지 않고 항상 forward 한다.
+    """
+    try:
+        original, src_scale = _decode(_read_input(image))
+        if original is None:
+            print(f"❌ 이미지 로딩 실패: {_describe(image)}")
+            return {"label": "Error", "score": 0.0, "embedding": None}
+        early, tensor = _prepare(original, src_scale)
+        if early is not None:
+            return {"label": early, "score": 0.0, "embedding": None}
+
+        model = get_embed_model()
+        with torch.inference_mode(), autocast_context(INFERENCE_PRECISION):
+            logits, emb = model.forward_with_embedding(tensor.unsqueeze(0).to(device))
+        label, score = _label_from_probs(F.softmax(logits.float(), dim=1)[0].cpu())
+        emb = F.normalize(emb.float(), dim=1)[0].cpu().numpy()
+        return {"label": label, "score": score, "embedding": emb}
+    except Exception as e:
+        print(f"[ai] 임베딩 추출 예외: {e}")
+        return {"label": "Error", "score": 0.0, "embedding": None}
+
+_decode_pool = None
+_decode_pool_pid = None
+
+def _get_decode_pool() -> ThreadPoolExecutor:
+    # fork된 자식에서는 부모의 (스레드가 없는) 풀을 버리고 새로 만든다
+    global _decode_pool, _decode_pool_pid
+    if _decode_pool is None or _decode_pool_pid != os.getpid():
+        _decode_pool = ThreadPoolExecutor(max_workers=DECODE_WORKERS, thread_name_prefix="ai-decode")
+        _decode_pool_pid = os.getpid()
+    return _decode_pool
+
 # =========================
 # ✅ 판별 함수 (서비스에서 호출)
 # =========================
-def detect_and_classify(image_path: str):
+def detect_and_classify(image, with_info=False):
     """
-    반환: (label:str, confidence:float, image_path:str)
+    image: 파일 경로, 인코딩된 바이트, file-like, 또는 디코딩된 BGR ndarray
+    반환: (label:str, confidence:float, image_path:str|None)  ※ 경로 입력이 아니면 image_path=None
+          with_info=True면 (label, confidence, image_path, info) — info: 근사 중복 적중 시 {"near_duplicate": ...}, 아니면 {}
     label ∈ {"Fake","Real","Uncertain","NoFace","Error"}
     정책:
       - ENFORCE_NOFACE=True일 때
@@ -144,50 +1126,93 @@ def detect_and_classify(image_path: str):
         * 얼굴 1개 이상이면 crop 후 분류
       - USE_FACE_CROP=False일 때
         * 전체 프레임 분류(단, ENFORCE_NOFACE가 True면 사전 얼굴체크로 NoFace 보장)
+    FACE_MODE="multi"면 모든 얼굴을 분류해 MULTI_FACE_AGG로 집계한 결과를 반환 (얼굴별 결과는 analyze_faces).
+    같은 이미지(바이트 동일)는 RESULT_CACHE_ENABLED일 때 추론 없이 캐시에서 반환.
+    근사 중복(지각 해시 거리 NEAR_DUP_MAX_DISTANCE 이내 + near_dup.reusable 조건)은 NEAR_DUP_ENABLED일 때 저장된 판정을 반환.
     """
+    image_path = _describe(image)
     try:
-        original = cv2.imread(image_path)
-        if original is None:
-            print(f"❌ 이미지 로딩 실패: {image_path}")
-            return "Error", 0.0, image_path
-
-        # --- 얼굴 유무 선검사 ---
-        faces = _detect_faces(original)
-
-        if ENFORCE_NOFACE:
-            # 검출기 실패(None) 또는 탐지 0개 → 일관되게 NoFace
-            if faces is None or len(faces) == 0:
-                return "NoFace", 0.0, image_path
-
-        # --- 얼굴 크롭 정책 ---
-        if USE_FACE_CROP:
-            if faces is None or len(faces) == 0:
-                # 크롭 모드인데 얼굴이 없으면 NoFace
-                return "NoFace", 0.0, image_path
-            x, y, w, h = _pick_face(faces)
-            face_img = original[y:y + h, x:x + w]
-            pil = _prep_pil(face_img)
-        else:
-            # 전체 프레임 사용
-            pil = _prep_pil(original)
+        result, input_tensor, key = _load_and_prepare(image)
+        if result is None:
+            # --- 추론 ---
+            result = _classify_tensor(input_tensor)
+            _cache_put(key, *result)
 
-        # --- 전처리/추론 ---
-        input_tensor = transform(pil).unsqueeze(0).to(device)
-        with torch.no_grad():
-            output = model(input_tensor)
-            prob = F.softmax(output, dim=1)[0]  # 길이 2
-            fake_prob = float(prob[FAKE_IDX].item())
-            real_prob = float(prob[REAL_IDX].item())
-            score = max(fake_prob, real_prob)
-
-            # 임계값(선택): 확신 낮으면 Uncertain
-            if THRESH is not None and score < THRESH:
-                return "Uncertain", score, image_path
+        label, score = result[0], result[1]
+        info = result[2] if len(result) > 2 else {}
+    except Exception as e:
+        print(f"[ai] 예외: {e}")
+        label, score, info = "Error", 0.0, {}
+    return (label, score, image_path, info) if with_info else (label, score, image_path)
 
-            label = "Fake" if fake_prob >= real_prob else "Real"
-            return label, score, image_path
+def classify_async(image):
+    """detect_and_classify를 스레드풀에서 실행하고 Future 반환 (동시 호출은 마이크로배처가 묶어줌)"""
+    return _get_decode_pool().submit(detect_and_classify, image)
 
+def _run_chunk(chunk: list) -> list:
+    """chunk: [(index, image_path, tensor, key)] → [(index, label, score, image_path)]"""
+    try:
+        outs = _classify_tensors([t for _, _, t, _ in chunk])
     except Exception as e:
-        print(f"[ai] 예외: {e}")
-        return "Error", 0.0, image_path
+        print(f"[ai] 배치 추론 예외: {e}")
+        outs = [("Error", 0.0)] * len(chunk)
+    done = []
+    for (i, path, _, key), (label, score) in zip(chunk, outs):
+        _cache_put(key, label, score)
+        done.append((i, label, score, path))
+    return done
+
+def iter_classify_batch(images, eager=True, chunk_size=None):
+    """
+    images(리스트나 제너레이터)를 판별하면서 끝나는 대로 (index, label, confidence, image_path)를 yield.
+    순서는 입력 순서와 다를 수 있음.
+      - 디코딩/얼굴검출은 스레드풀에서, 동시에 떠 있는 작업은 청크 2개 분량으로 제한(메모리 상한)
+      - eager=True: 다음 이미지가 아직 준비 안 됐으면 모인 것만 바로 추론 (첫 결과 지연 최소화)
+      - eager=False: chunk_size만큼 모일 때까지 기다렸다가 추론 (처리량 우선)
+    """
+    chunk_size = chunk_size or BATCH_CHUNK_SIZE
+    window = max(2 * chunk_size, DECODE_WORKERS)
+    pool = _get_decode_pool()
+    source = enumerate(images)
+    inflight = deque()   # (index, image_path, Future)
+    pending = []         # (index, image_path, tensor, key)
+
+    def fill():
+        while len(inflight) < window:
+            nxt = next(source, None)
+            if nxt is None:
+                return
+            i, image = nxt
+            inflight.append((i, _describe(image), pool.submit(_load_and_prepare, image)))
 
+    fill()
+    while inflight:
+        i, path, fut = inflight[0]
+        if pending and (len(pending) >= chunk_size or (eager and not fut.done())):
+            yield from _run_chunk(pending)
+            pending = []
+            continue
+
+        inflight.popleft()
+        result, tensor, key = fut.result()
+        fill()
+        if result is not None:
+            yield i, result[0], result[1], path
+        else:
+            pending.append((i, path, tensor, key))
+
+    if pending:
+        yield from _run_chunk(pending)
+
+def classify_batch(images: list) -> list:
+    """
+    여러 이미지를 한꺼번에 판별. 반환: [(label, confidence, image_path), ...] (입력 순서 유지)
+      - 각 원소는 detect_and_classify와 같은 입력 타입(경로/바이트/file-like/ndarray)
+      - 디코딩/얼굴검출(+캐시 조회)은 스레드풀에서 병렬 처리
+      - 분류가 필요한 텐서만 모아 BATCH_CHUNK_SIZE 단위로 forward
+    정책은 detect_and_classify와 동일.
+    """
+    results = [None] * len(images)
+    for i, label, score, path in iter_classify_batch(images, eager=False):
+        results[i] = (label, score, path)
+    return results
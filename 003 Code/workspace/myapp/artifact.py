@@ -0,0 +1,74 @@
+# artifact.py — 추론 아티팩트(TorchScript/torch.export) 저장·로드 + manifest
+#  manifest(<artifact>.json): 포맷, 아티팩트/원본 체크포인트 SHA-256, 입력 크기, 클래스 매핑 등
+#  로드 시 아티팩트 해시를 검증하고, 원본 체크포인트가 바뀌었으면 쓰지 않는다.
+import os
+import json
+from datetime import datetime
+
+import torch
+
+from .cache import file_sha256
+
+FORMATS = ("torchscript", "export")
+
+
+def manifest_path(artifact_path: str) -> str:
+    return os.path.splitext(artifact_path)[0] + ".json"
+
+
+def read_manifest(artifact_path: str):
+    try:
+        with open(manifest_path(artifact_path), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_artifact(module, artifact_path: str, source_path: str, fmt="torchscript", **extra) -> dict:
+    """module: TorchScript 모듈(fmt=torchscript) 또는 ExportedProgram(fmt=export)"""
+    if fmt not in FORMATS:
+        raise ValueError(f"지원하지 않는 아티팩트 포맷: {fmt}")
+    os.makedirs(os.path.dirname(os.path.abspath(artifact_path)), exist_ok=True)
+    if fmt == "export":
+        torch.export.save(module, artifact_path)
+    else:
+        torch.jit.save(module, artifact_path)
+
+    manifest = {
+        "format": fmt,
+        "artifact_sha256": file_sha256(artifact_path),
+        "source": os.path.abspath(source_path),
+        "source_sha256": file_sha256(source_path),
+        "created_at": datetime.utcnow().isoformat(),
+        "torch": torch.__version__,
+        **extra,
+    }
+    with open(manifest_path(artifact_path), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
+
+
+def load_artifact(artifact_path: str, source_path: str = None, map_location="cpu"):
+    """
+    반환: (module | None, manifest | None)
+    아티팩트/manifest가 없거나, 아티팩트 해시가 틀리거나, 원본 체크포인트 해시가 다르면 module=None
+    """
+    if not os.path.exists(artifact_path):
+        return None, None
+    manifest = read_manifest(artifact_path)
+    if manifest is None:
+        print(f"[artifact] ⚠ manifest 없음: {manifest_path(artifact_path)}")
+        return None, None
+    if manifest.get("artifact_sha256") != file_sha256(artifact_path):
+        print(f"[artifact] ⚠ 아티팩트 해시 불일치(손상/교체됨): {artifact_path}")
+        return None, manifest
+    if source_path and os.path.exists(source_path) and manifest.get("source_sha256") != file_sha256(source_path):
+        print(f"[artifact] ⚠ {artifact_path} 는 다른 체크포인트로 만든 아티팩트입니다. 다시 변환하세요.")
+        return None, manifest
+
+    if manifest.get("format") == "export":
+        module = torch.export.load(artifact_path).module()
+    else:
+        module = torch.jit.load(artifact_path, map_location=map_location)
+        module.eval()
+    return module, manifest
@@ -0,0 +1,149 @@
+# async_fetch.py — 여러 이미지 URL 동시 다운로드 (asyncio + aiohttp)
+#  - 전체/호스트별 동시 연결 수 제한, 연결/읽기 타임아웃
+#  - 전체 타임아웃은 연결 슬롯을 얻은 뒤부터 잼 (같은 호스트 URL이 많아도 대기 시간은 제외)
+#  - fetch.py와 같은 디스크 캐시(ETag/Last-Modified 조건부 재검증)와 최대 바이트 제한 사용
+#  - iter_fetch()는 도착하는 순서대로 (url, bytes, error, from_cache)를 내보내는 동기 제너레이터
+import time
+import queue
+import asyncio
+import hashlib
+import threading
+import logging
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from .fetch import (URL_FETCH_TIMEOUT, URL_MAX_BYTES, DEFAULT_HEADERS,
+                    FetchError, normalize_url, url_cache, _max_age)
+
+logger = logging.getLogger(__name__)
+
+# =========================
+# ✅ 설정
+# =========================
+ASYNC_TOTAL_CONNECTIONS = 32     # 동시에 열 수 있는 전체 연결 수
+ASYNC_PER_HOST = 4               # 호스트별 동시 연결 수 (느린/작은 서버 보호)
+ASYNC_CONNECT_TIMEOUT = 3        # 초
+
+
+async def _read_capped(resp: aiohttp.ClientResponse, max_bytes: int) -> bytes:
+    if resp.content_length is not None and resp.content_length > max_bytes:
+        raise FetchError(f"이미지가 너무 큽니다 ({resp.content_length} bytes > {max_bytes})")
+    chunks, total = [], 0
+    async for chunk in resp.content.iter_chunked(64 * 1024):
+        total += len(chunk)
+        if total > max_bytes:
+            raise FetchError(f"이미지가 너무 큽니다 (>{max_bytes} bytes)")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+async def _request(session, url, norm, headers, meta, body, max_bytes):
+    async with session.get(url, headers=headers) as resp:
+        if resp.status == 304 and meta is not None:
+            # fetch.py와 같이 새 Cache-Control로 신선도 갱신
+            url_cache.revalidated += 1
+            meta["fetched_at"] = time.time()
+            meta["max_age"] = _max_age(resp.headers.get("Cache-Control")) or meta.get("max_age")
+            url_cache.store(norm, meta)
+            return url, body, None, True
+
+        resp.raise_for_status()
+        content = await _read_capped(resp, max_bytes)
+        url_cache.misses += 1
+
+        new_meta = {
+            "url": norm,
+            "etag": resp.headers.get("ETag"),
+            "last_modified": resp.headers.get("Last-Modified"),
+            "content_type": resp.headers.get("Content-Type"),
+            "max_age": _max_age(resp.headers.get("Cache-Control")),
+            "sha256": hashlib.sha256(content).hexdigest(),
+            "size": len(content),
+            "fetched_at": time.time(),
+        }
+        if new_meta["etag"] or new_meta["last_modified"] or new_meta["max_age"]:
+            try:
+                url_cache.store(norm, new_meta, content)
+            except OSError as e:
+                logger.warning(f"[async_fetch] 캐시 저장 실패: {e}")
+        return url, content, None, False
+
+
+async def _fetch_one(session, slots, url, timeout, max_bytes):
+    """반환: (url, content|None, error|None, from_cache)"""
+    norm = normalize_url(url)
+    meta, body = url_cache.load(norm)
+    headers = {}
+    if meta is not None:
+        max_age = meta.get("max_age")
+        if max_age and time.time() - meta.get("fetched_at", 0) < max_age:
+            url_cache.hits += 1
+            return url, body, None, True
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    try:
+        # 슬롯 대기는 타임아웃에 넣지 않고, 실제 요청(연결~본문)에만 timeout 적용
+        async with slots.total, slots.host(url):
+            return await asyncio.wait_for(
+                _request(session, url, norm, headers, meta, body, max_bytes), timeout)
+    except asyncio.TimeoutError:
+        return url, None, "다운로드 시간 초과", False
+    except Exception as e:
+        return url, None, f"이미지 다운로드 실패: {e}", False
+
+
+class _Slots:
+    """전체/호스트별 동시 요청 세마포어 (이벤트 루프마다 새로 만듦)"""
+
+    def __init__(self):
+        self.total = asyncio.Semaphore(ASYNC_TOTAL_CONNECTIONS)
+        self._hosts = {}
+
+    def host(self, url) -> asyncio.Semaphore:
+        key = urlsplit(url).netloc.lower()
+        sem = self._hosts.get(key)
+        if sem is None:
+            sem = self._hosts[key] = asyncio.Semaphore(ASYNC_PER_HOST)
+        return sem
+
+
+async def _fetch_all(urls, emit, timeout, max_bytes):
+    connector = aiohttp.TCPConnector(limit=ASYNC_TOTAL_CONNECTIONS, limit_per_host=ASYNC_PER_HOST)
+    # total은 풀 대기까지 포함하므로 쓰지 않음 → 요청별 wait_for(timeout) + 소켓 단위 타임아웃
+    client_timeout = aiohttp.ClientTimeout(total=None, sock_connect=ASYNC_CONNECT_TIMEOUT, sock_read=timeout)
+    slots = _Slots()
+    async with aiohttp.ClientSession(connector=connector, timeout=client_timeout,
+                                     headers=DEFAULT_HEADERS) as session:
+        tasks = [asyncio.create_task(_fetch_one(session, slots, u, timeout, max_bytes)) for u in urls]
+        for done in asyncio.as_completed(tasks):
+            emit(await done)
+
+
+_DONE = object()
+
+def iter_fetch(urls, timeout=URL_FETCH_TIMEOUT, max_bytes=URL_MAX_BYTES):
+    """
+    urls를 별도 스레드의 이벤트 루프에서 동시에 내려받고,
+    완료되는 순서대로 (url, content, error, from_cache)를 yield 한다.
+    """
+    q = queue.Queue()
+
+    def runner():
+        try:
+            asyncio.run(_fetch_all(urls, q.put, timeout, max_bytes))
+        except Exception as e:
+            logger.exception("[async_fetch] 이벤트 루프 예외")
+            q.put((None, None, f"다운로드 파이프라인 오류: {e}", False))
+        finally:
+            q.put(_DONE)
+
+    threading.Thread(target=runner, name="async-fetch", daemon=True).start()
+    while True:
+        item = q.get()
+        if item is _DONE:
+            return
+        yield item
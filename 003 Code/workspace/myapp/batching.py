@@ -0,0 +1,155 @@
+# batching.py — 동적 마이크로배칭 스케줄러
+#  - 여러 요청 스레드가 넣은 전처리 텐서를 몇 ms 동안 모아서 한 번의 배치 forward로 처리
+#  - 각 호출자는 자기 몫의 결과만 Future로 돌려받음
+#  - 배치 크기/큐 대기시간 히스토그램을 stats()로 노출 (튜닝용)
+import os
+import time
+import queue
+import threading
+import logging
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+
+class Histogram:
+    """고정 버킷 히스토그램. bounds는 각 버킷의 상한(이하)이며 마지막에 +inf 버킷이 자동 추가됨."""
+
+    def __init__(self, bounds):
+        self.bounds = list(bounds)
+        self._counts = [0] * (len(self.bounds) + 1)
+        self._total = 0
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        idx = len(self.bounds)
+        for i, b in enumerate(self.bounds):
+            if value <= b:
+                idx = i
+                break
+        with self._lock:
+            self._counts[idx] += 1
+            self._total += 1
+            self._sum += value
+
+    def snapshot(self):
+        with self._lock:
+            labels = [f"<={b}" for b in self.bounds] + [f">{self.bounds[-1]}"]
+            return {
+                "count": self._total,
+                "mean": (self._sum / self._total) if self._total else 0.0,
+                "buckets": dict(zip(labels, self._counts)),
+            }
+
+
+class _Pending:
+    __slots__ = ("item", "future", "enqueued_at")
+
+    def __init__(self, item):
+        self.item = item
+        self.future = Future()
+        self.enqueued_at = time.monotonic()
+
+
+class MicroBatcher:
+    """
+    run_batch(items: list) -> list 를 받아, 동시에 들어온 요청들을 묶어 실행한다.
+      - max_batch_size: 한 번에 처리할 최대 개수
+      - max_wait_ms: 첫 요청이 들어온 뒤 다른 요청을 기다리는 최대 시간
+    워커 스레드는 첫 submit 시점에 지연 생성되며, fork 이후(pid 변경)에는 새로 띄운다.
+    """
+
+    def __init__(self, run_batch, max_batch_size=16, max_wait_ms=5.0, name="batcher"):
+        self.run_batch = run_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.name = name
+
+        self.batch_size_hist = Histogram([1, 2, 4, 8, 16, 32, 64])
+        self.queue_wait_hist = Histogram([0.5, 1, 2, 5, 10, 20, 50, 100, 500])  # ms
+        self._batches = 0
+        self._errors = 0
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._pid = None
+
+    # ---------- 호출자 측 ----------
+    def submit(self, item) -> Future:
+        self._ensure_worker()
+        pending = _Pending(item)
+        self._queue.put(pending)
+        return pending.future
+
+    def infer(self, item, timeout=None):
+        return self.submit(item).result(timeout=timeout)
+
+    # ---------- 워커 ----------
+    def _ensure_worker(self):
+        pid = os.getpid()
+        if self._worker is not None and self._pid == pid and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is not None and self._pid == pid and self._worker.is_alive():
+                return
+            if self._pid != pid:
+                # fork로 복제된 큐/스레드 상태는 버리고 새로 시작
+                self._queue = queue.Queue()
+            self._pid = pid
+            self._worker = threading.Thread(target=self._loop, name=f"{self.name}-worker", daemon=True)
+            self._worker.start()
+
+    def _collect(self):
+        first = self._queue.get()
+        batch = [first]
+        deadline = first.enqueued_at + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    # 대기시간이 이미 지났으면 쌓여 있는 것만 비차단으로 가져감
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            started = time.monotonic()
+            for p in batch:
+                self.queue_wait_hist.observe((started - p.enqueued_at) * 1000.0)
+            self.batch_size_hist.observe(len(batch))
+            self._batches += 1
+
+            try:
+                results = self.run_batch([p.item for p in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(f"batch 결과 개수 불일치: {len(results)} != {len(batch)}")
+            except Exception as e:
+                self._errors += 1
+                logger.exception(f"[{self.name}] 배치 실행 실패")
+                for p in batch:
+                    if not p.future.cancelled():
+                        p.future.set_exception(e)
+                continue
+
+            for p, r in zip(batch, results):
+                if not p.future.cancelled():
+                    p.future.set_result(r)
+
+    # ---------- 통계 ----------
+    def stats(self):
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "batches": self._batches,
+            "errors": self._errors,
+            "queued": self._queue.qsize(),
+            "batch_size": self.batch_size_hist.snapshot(),
+            "queue_wait_ms": self.queue_wait_hist.snapshot(),
+        }
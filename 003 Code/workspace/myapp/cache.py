@@ -0,0 +1,192 @@
+# cache.py — 판별 결과 캐시 (이미지 바이트 SHA-256 + 모델 지문 → (label, score))
+#  - 1차: 프로세스 내부 LRU (OrderedDict, TTL/개수 제한)
+#  - 2차(선택): SQLite 테이블 — 모든 gunicorn 워커가 공유
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def sha256_hex(data) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_sha256(path, chunk_size=1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class LRUCache:
+    """스레드 안전 LRU. 항목마다 만료시각을 같이 저장 (ttl=None이면 만료 없음)"""
+
+    def __init__(self, max_entries=4096, ttl=None):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at is not None and expires_at < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        expires_at = (time.time() + self.ttl) if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteTier:
+    """워커 간 공유용 SQLite 캐시 테이블. 만료/개수 초과분은 put 시점에 정리"""
+
+    def __init__(self, path, ttl=None, max_rows=200_000):
+        self.path = path
+        self.ttl = ttl
+        self.max_rows = int(max_rows)
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self._puts = 0
+        self.evictions = 0
+
+    def _connect(self):
+        # fork 이후에는 부모의 커넥션을 쓰지 않음
+        if self._conn is not None and self._pid == os.getpid():
+            return self._conn
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS result_cache ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_result_cache_created ON result_cache(created_at)")
+        self._conn, self._pid = conn, os.getpid()
+        return conn
+
+    def get(self, key):
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT value, created_at FROM result_cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        value, created_at = row
+        if self.ttl and created_at + self.ttl < time.time():
+            return None
+        return value
+
+    def put(self, key, value):
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO result_cache(key, value, created_at) VALUES (?, ?, ?)",
+                (key, value, now),
+            )
+            self._puts += 1
+            # 정리는 가끔만 (매 put마다 COUNT 하지 않도록)
+            if self._puts % 256 == 0:
+                self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        removed = 0
+        if self.ttl:
+            removed += conn.execute(
+                "DELETE FROM result_cache WHERE created_at < ?", (now - self.ttl,)
+            ).rowcount
+        (count,) = conn.execute("SELECT COUNT(*) FROM result_cache").fetchone()
+        if count > self.max_rows:
+            removed += conn.execute(
+                "DELETE FROM result_cache WHERE key IN ("
+                " SELECT key FROM result_cache ORDER BY created_at ASC LIMIT ?)",
+                (count - self.max_rows,),
+            ).rowcount
+        self.evictions += max(removed, 0)
+
+
+class ResultCache:
+    """
+    key → (label, score) 캐시. get()은 메모리 → SQLite 순으로 조회하고,
+    SQLite에서 찾은 값은 메모리 LRU로 올린다.
+    """
+
+    def __init__(self, max_entries=4096, ttl=None, db_path=None, db_max_rows=200_000):
+        self.memory = LRUCache(max_entries=max_entries, ttl=ttl)
+        self.shared = SQLiteTier(db_path, ttl=ttl, max_rows=db_max_rows) if db_path else None
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        if self.shared is not None:
+            try:
+                raw = self.shared.get(key)
+            except Exception as e:
+                logger.warning(f"[cache] 공유 캐시 조회 실패: {e}")
+                raw = None
+            if raw is not None:
+                label, score = raw.split("|", 1)
+                value = (label, float(score))
+                self.memory.put(key, value)
+                self.shared_hits += 1
+                return value
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        self.memory.put(key, value)
+        if self.shared is not None:
+            label, score = value
+            try:
+                self.shared.put(key, f"{label}|{score!r}")
+            except Exception as e:
+                logger.warning(f"[cache] 공유 캐시 저장 실패: {e}")
+
+    def clear(self):
+        self.memory.clear()
+
+    def stats(self):
+        lookups = self.hits + self.shared_hits + self.misses
+        return {
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "hit_rate": ((self.hits + self.shared_hits) / lookups) if lookups else 0.0,
+            "size": len(self.memory),
+            "max_entries": self.memory.max_entries,
+            "evictions": self.memory.evictions + (self.shared.evictions if self.shared else 0),
+            "shared": self.shared.path if self.shared else None,
+        }
@@ -0,0 +1,214 @@
+# embeddings.py — 판별 임베딩 저장소 + 코사인 top-k 검색
+#  - 임베딩: DeepFakeDetector의 풀링 특징(분류 직전 벡터)을 L2 정규화 → 코사인 = 내적
+#  - 저장: <EMBED_DIR>/emb.f16 (float16 [N,D] 원시 행렬, append-only, np.memmap으로 읽음)
+#          <EMBED_DIR>/meta.jsonl (행마다 {"ref", "label", "score", "ts"}, 같은 순서)
+#    여러 워커가 같이 쓰므로 추가는 flock으로 직렬화하고, 읽는 쪽은 파일 크기가 바뀌면 다시 매핑
+#    추가가 중간에 죽어 두 파일의 행 수가 어긋나면 다음 추가가 flock 안에서 작은 쪽에 맞춰 자름
+#  - 검색: 청크 단위 행렬곱 + argpartition (전수). build_ivf()로 만든 IVF 인덱스가 있으면
+#          가까운 중심 nprobe개의 행 + IVF 생성 이후 추가된 행만 계산
+#    IVF 생성: python scripts/build_embedding_index.py --nlist 1024
+import os
+import json
+import time
+import fcntl
+import threading
+
+import numpy as np
+
+# =========================
+# ✅ 설정
+# =========================
+EMBED_DIR = "/home/ubuntu/deepfake-detector/embeddings"
+EMBED_DIM = 1536               # EfficientNet-B3 풀링 특징 차원
+EMBED_STORE_UPLOADS = False    # True면 /api/detect-upload 판정을 embed_and_classify로 하고 임베딩 저장
+                               # (한 번의 forward로 판정+임베딩, 대신 결과 캐시/마이크로배치를 거치지 않음)
+                               # ※ 판정은 fp32 eager 모델(ai.get_embed_model)이 함 → INFERENCE_PRECISION이
+                               #   "fp32"가 아니면 업로드 판정만 다른 정밀도로 나옴. fp32와 같이 쓸 것
+SIMILAR_TOP_K_MAX = 100
+SEARCH_CHUNK_ROWS = 65536      # 전수 검색 시 한 번에 float32로 올릴 행 수 (메모리 상한)
+IVF_NPROBE = 16
+
+
+class EmbeddingStore:
+    def __init__(self, directory=EMBED_DIR, dim=EMBED_DIM):
+        self.dir = directory
+        self.dim = dim
+        self.emb_path = os.path.join(directory, "emb.f16")
+        self.meta_path = os.path.join(directory, "meta.jsonl")
+        self.ivf_path = os.path.join(directory, "ivf.npz")
+        self.lock_path = os.path.join(directory, ".lock")
+        self._lock = threading.Lock()
+        self._mm = None
+        self._rows = 0
+        self._meta = []
+        self._meta_offset = 0
+        self._meta_scan = (0, 0)    # add()용 (줄 수, 끝 오프셋) 캐시
+        self._ivf = None
+        self._ivf_mtime = None
+
+    # --- 추가 ---
+    def add(self, embedding: np.ndarray, ref=None, label=None, score=None) -> int:
+        """정규화된 임베딩 한 줄 추가 → 행 번호"""
+        vec = np.asarray(embedding, dtype=np.float16).reshape(-1)
+        if vec.shape[0] != self.dim:
+            raise ValueError(f"임베딩 차원 불일치: {vec.shape[0]} != {self.dim}")
+        os.makedirs(self.dir, exist_ok=True)
+        line = json.dumps({"ref": ref, "label": label, "score": score, "ts": int(time.time())},
+                          ensure_ascii=False) + "\n"
+        row_bytes = 2 * self.dim
+        with open(self.lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                rows = os.path.getsize(self.emb_path) // row_bytes if os.path.exists(self.emb_path) else 0
+                lines, meta_end = self._scan_meta()
+                row = min(rows, lines)
+                # 이전 추가가 중간에 죽었으면(메타만 씀 / 임베딩 반쪽) 두 파일을 같은 행 수로 잘라 순서를 맞춤
+                if lines > row:
+                    meta_end = self._meta_end(row)
+                if os.path.exists(self.meta_path) and os.path.getsize(self.meta_path) != meta_end:
+                    os.truncate(self.meta_path, meta_end)
+                if os.path.exists(self.emb_path) and os.path.getsize(self.emb_path) != row * row_bytes:
+                    os.truncate(self.emb_path, row * row_bytes)
+                # 메타 먼저 → 임베딩 (읽는 쪽은 임베딩이 있는 행의 메타만 읽으므로 반쯤 쓴 행이 보이지 않음)
+                data = line.encode("utf-8")
+                with open(self.meta_path, "ab") as f:
+                    f.write(data)
+                with open(self.emb_path, "ab") as f:
+                    f.write(vec.tobytes())
+                self._meta_scan = (row + 1, meta_end + len(data))
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+        return row
+
+    def _scan_meta(self) -> tuple:
+        """meta.jsonl의 (완결된 줄 수, 마지막 완결 줄 끝 오프셋). 지난 스캔 이후 추가분만 읽음 (flock 안에서 호출)"""
+        size = os.path.getsize(self.meta_path) if os.path.exists(self.meta_path) else 0
+        lines, end = self._meta_scan
+        if size < end:
+            lines, end = 0, 0
+        if size > end:
+            with open(self.meta_path, "rb") as f:
+                f.seek(end)
+                pos = end
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    lines += chunk.count(b"\n")
+                    i = chunk.rfind(b"\n")
+                    if i >= 0:
+                        end = pos + i + 1
+                    pos += len(chunk)
+        self._meta_scan = (lines, end)
+        return lines, end
+
+    def _meta_end(self, n: int) -> int:
+        """n번째 줄 끝 오프셋 (복구 때만 호출)"""
+        end = 0
+        with open(self.meta_path, "rb") as f:
+            for _ in range(n):
+                end += len(f.readline())
+        return end
+
+    # --- 읽기 ---
+    def _refresh(self):
+        """다른 워커가 추가한 행 반영 (파일이 커졌을 때만 다시 매핑)"""
+        size = os.path.getsize(self.emb_path) if os.path.exists(self.emb_path) else 0
+        rows = size // (2 * self.dim)
+        if rows != self._rows:
+            self._mm = np.memmap(self.emb_path, dtype=np.float16, mode="r", shape=(rows, self.dim)) if rows else None
+            self._rows = rows
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                f.seek(self._meta_offset)
+                for line in f:
+                    if len(self._meta) >= rows or not line.endswith("\n"):
+                        break  # 임베딩이 아직 없는 줄 (쓰는 중이거나 중단된 추가 → 다음 add가 잘라냄)
+                    self._meta.append(json.loads(line))
+                    self._meta_offset += len(line.encode("utf-8"))
+        if os.path.exists(self.ivf_path):
+            mtime = os.path.getmtime(self.ivf_path)
+            if mtime != self._ivf_mtime:
+                data = np.load(self.ivf_path)
+                self._ivf = {k: data[k] for k in ("centroids", "order", "offsets", "rows")}
+                self._ivf_mtime = mtime
+
+    def __len__(self):
+        with self._lock:
+            self._refresh()
+            return self._rows
+
+    def _score_rows(self, mm, rows, q):
+        """rows(정렬된 행 번호 배열 또는 slice)의 코사인 유사도"""
+        return mm[rows].astype(np.float32) @ q
+
+    def search(self, query: np.ndarray, k=10, nprobe=IVF_NPROBE, exhaustive=False) -> list:
+        """query와 코사인 유사도 상위 k개 → [{"row", "similarity", **meta}] (exhaustive=True면 IVF 무시)"""
+        q = np.asarray(query, dtype=np.float32).reshape(-1)
+        q = q / (np.linalg.norm(q) or 1.0)
+        with self._lock:
+            self._refresh()
+            mm, n, ivf, meta = self._mm, min(self._rows, len(self._meta)), self._ivf, self._meta
+        if not n:
+            return []
+
+        ids_parts, score_parts = [], []
+        start = 0
+        if ivf is not None and not exhaustive and int(ivf["rows"]) <= n:
+            # IVF: 가까운 중심 nprobe개에 배정된 행만 + IVF 생성 이후 추가된 꼬리 행은 전수
+            built = int(ivf["rows"])
+            nearest = np.argsort(-(ivf["centroids"] @ q))[:nprobe]
+            cand = np.concatenate([ivf["order"][ivf["offsets"][c]:ivf["offsets"][c + 1]] for c in nearest])
+            cand.sort()
+            if len(cand):
+                ids_parts.append(cand)
+                score_parts.append(self._score_rows(mm, cand, q))
+            start = built
+
+        for lo in range(start, n, SEARCH_CHUNK_ROWS):
+            hi = min(n, lo + SEARCH_CHUNK_ROWS)
+            ids_parts.append(np.arange(lo, hi))
+            score_parts.append(self._score_rows(mm, slice(lo, hi), q))
+
+        if not ids_parts:
+            return []
+        ids, scores = np.concatenate(ids_parts), np.concatenate(score_parts)
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [{"row": int(ids[i]), "similarity": round(float(scores[i]), 4), **meta[int(ids[i])]} for i in top]
+
+    # --- IVF ---
+    def build_ivf(self, nlist=1024, iters=10, sample=200_000, seed=0) -> dict:
+        """
+        k-means(구면, 내적 기준)로 nlist개 중심을 만들고 모든 행을 배정 → ivf.npz
+        배정은 행 번호를 중심별로 정렬한 CSR(order/offsets) 형태로 저장
+        """
+        with self._lock:
+            self._refresh()
+            mm, n = self._mm, self._rows
+        if n < nlist:
+            raise ValueError(f"행 수({n})가 nlist({nlist})보다 적습니다")
+
+        rng = np.random.default_rng(seed)
+        train = mm[np.sort(rng.choice(n, size=min(sample, n), replace=False))].astype(np.float32)
+        centroids = train[rng.choice(len(train), size=nlist, replace=False)].copy()
+        for _ in range(iters):
+            assign = np.argmax(train @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = train[assign == c]
+                if len(members):
+                    v = members.sum(axis=0)
+                    centroids[c] = v / (np.linalg.norm(v) or 1.0)
+
+        assign = np.empty(n, dtype=np.int32)
+        for lo in range(0, n, SEARCH_CHUNK_ROWS):
+            hi = min(n, lo + SEARCH_CHUNK_ROWS)
+            assign[lo:hi] = np.argmax(mm[lo:hi].astype(np.float32) @ centroids.T, axis=1)
+        order = np.argsort(assign, kind="stable").astype(np.int64)
+        offsets = np.searchsorted(assign[order], np.arange(nlist + 1)).astype(np.int64)
+
+        tmp = self.ivf_path + ".tmp.npz"
+        np.savez(tmp, centroids=centroids, order=order, offsets=offsets, rows=np.int64(n))
+        os.replace(tmp, self.ivf_path)
+        return {"rows": n, "nlist": nlist, "largest_list": int(np.diff(offsets).max())}
+
+
+store = EmbeddingStore()
@@ -0,0 +1,198 @@
+# explain.py — Grad-CAM 설명 히트맵 (판정 경로와 분리, 요청 시 또는 백그라운드 풀에서 생성)
+#  - 대상: 이미 판정된 Image 레코드. 판정 때 캐시한 전처리 텐서(ai.tensor_cache)를 재사용하고,
+#    없으면 저장된 업로드 파일을 다시 디코딩
+#  - Grad-CAM: backbone.features 마지막 출력에 대한 대상 클래스 logit의 기울기로 채널 가중치 → ReLU(가중합)
+#  - 결과: 모델이 본 입력 위에 컬러맵을 겹친 PNG → EXPLAIN_DIR/<image_id>_<지문>.png, Image.heatmap_path에 기록
+#    같은 모델 지문이면 파일을 그대로 다시 보냄 (모델이 바뀌면 다시 계산)
+#  - 같은 이미지에 대한 동시 요청은 진행 중인 작업 하나를 같이 기다림
+import os
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+import torch
+
+from . import ai, preprocess
+
+logger = logging.getLogger(__name__)
+
+# =========================
+# ✅ 설정
+# =========================
+EXPLAIN_ENABLED = True         # False면 /explain 비활성 (eager 모델을 preload하지 않음)
+EXPLAIN_DIR = "/home/ubuntu/deepfake-detector/myapp/static/heatmaps"
+EXPLAIN_WORKERS = 1            # Grad-CAM 스레드 수 (판정 forward와 CPU를 나눠 쓰므로 작게)
+EXPLAIN_TIMEOUT = 30.0         # 요청 시 생성(wait) 최대 대기 초
+EXPLAIN_TARGET = "fake"        # "fake"(Fake 근거를 표시) | "pred"(예측 클래스의 근거)
+EXPLAIN_MAX_SIDE = 512         # 출력 PNG 긴 변 (전체 프레임 모드면 원본 가로세로 비율로 복원)
+HEATMAP_ALPHA = 0.45           # 컬러맵 불투명도
+
+
+def grad_cam(model, tensor: torch.Tensor, target: str = EXPLAIN_TARGET) -> tuple:
+    """
+    [3,H,W] 정규화 텐서 → (cam [h,w] 0~1 float32 ndarray, 대상 클래스, softmax 확률 [2])
+    model은 backbone.features/avgpool/classifier를 가진 eager DeepFakeDetector (ai.get_embed_model)
+    """
+    b = model.backbone
+    x = tensor.unsqueeze(0).to(ai.device)
+    # 기울기는 features 출력 → classifier 헤드 구간에만 필요 (backbone은 그래프 없이)
+    with torch.no_grad():
+        feats = b.features(x)
+    with torch.enable_grad():
+        feats = feats.detach().requires_grad_(True)
+        logits = b.classifier(torch.flatten(b.avgpool(feats), 1))
+        probs = torch.softmax(logits.float(), dim=1)[0].detach().cpu()
+        cls = ai.FAKE_IDX if target == "fake" else int(probs.argmax())
+        # 파라미터 기울기는 만들지 않음 (공유 모델이라 .backward() 대신 feats에 대해서만)
+        grads, = torch.autograd.grad(logits[0, cls], feats)
+    weights = grads.mean(dim=(2, 3), keepdim=True)
+    cam = torch.relu((weights * feats.detach()).sum(dim=1))[0]
+    cam = cam / cam.max() if float(cam.max()) > 0 else cam
+    return cam.cpu().numpy().astype(np.float32), cls, probs
+
+
+def _input_bgr(tensor: torch.Tensor) -> np.ndarray:
+    """정규화 텐서 → 모델이 본 uint8 BGR 이미지 (정규화 역변환)"""
+    rgb = tensor.permute(1, 2, 0).numpy() * np.array(preprocess.STD, dtype=np.float32) \
+        + np.array(preprocess.MEAN, dtype=np.float32)
+    return cv2.cvtColor(np.clip(rgb * 255.0, 0, 255).astype(np.uint8), cv2.COLOR_RGB2BGR)
+
+
+def render(tensor: torch.Tensor, cam: np.ndarray, aspect=None) -> bytes:
+    """입력 이미지 + 히트맵 오버레이 → PNG 바이트. aspect=(가로, 세로)면 그 비율로 되돌려 출력"""
+    base = _input_bgr(tensor)
+    size = base.shape[0]
+    heat = cv2.resize(cam, (size, size), interpolation=cv2.INTER_CUBIC)
+    heat = cv2.applyColorMap(np.clip(heat * 255.0, 0, 255).astype(np.uint8), cv2.COLORMAP_JET)
+    overlay = cv2.addWeighted(heat, HEATMAP_ALPHA, base, 1.0 - HEATMAP_ALPHA, 0)
+
+    w, h = aspect or (size, size)
+    scale = EXPLAIN_MAX_SIDE / float(max(w, h))
+    out_size = (max(1, int(round(w * scale))), max(1, int(round(h * scale))))
+    overlay = cv2.resize(overlay, out_size, interpolation=cv2.INTER_LINEAR)
+    ok, png = cv2.imencode(".png", overlay)
+    if not ok:
+        raise RuntimeError("PNG 인코딩 실패")
+    return png.tobytes()
+
+
+# =========================
+# ✅ 작업 (레코드 단위, 백그라운드 풀)
+# =========================
+class NotExplainable(Exception):
+    """얼굴 없음/디코딩 실패 등 히트맵을 만들 수 없는 이미지"""
+
+
+_pool = None
+_pool_pid = None
+_inflight = {}                 # image_id → Future
+_lock = threading.Lock()
+_stats = {"computed": 0, "served_cached": 0, "tensor_reused": 0, "errors": 0}
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    # fork된 자식에서는 부모의 (스레드가 없는) 풀을 버리고 새로 만든다
+    global _pool, _pool_pid, _inflight
+    if _pool is None or _pool_pid != os.getpid():
+        _pool = ThreadPoolExecutor(max_workers=EXPLAIN_WORKERS, thread_name_prefix="explain")
+        _pool_pid = os.getpid()
+        _inflight = {}
+    return _pool
+
+
+def cached_heatmap(record):
+    """현재 모델 지문으로 만든 히트맵 파일이 있으면 경로, 아니면 None"""
+    path = record.heatmap_path
+    if path and record.heatmap_fingerprint == ai.model_fingerprint() and os.path.exists(path):
+        with _lock:
+            _stats["served_cached"] += 1
+        return path
+    return None
+
+
+def _compute(app, image_id: int) -> str:
+    from .models import db, Image
+
+    with app.app_context():
+        record = db.session.get(Image, image_id)
+        if record is None:
+            raise NotExplainable("이미지를 찾을 수 없습니다")
+        path = cached_heatmap(record)
+        if path:
+            return path
+        source = record.file_path
+
+    with open(source, "rb") as f:
+        data = f.read()
+    early, tensor, reused = ai.prepared_tensor(data)
+    if tensor is None:
+        raise NotExplainable("얼굴을 인식할 수 없습니다" if early == "NoFace" else "이미지를 읽을 수 없습니다")
+
+    fingerprint = ai.model_fingerprint()
+    cam, _, _ = grad_cam(ai.get_embed_model(), tensor)
+    aspect = None
+    if not ai.USE_FACE_CROP:
+        _, w, h = preprocess.header_size(data)
+        aspect = (w, h) if w and h else None
+    png = render(tensor, cam, aspect)
+
+    os.makedirs(EXPLAIN_DIR, exist_ok=True)
+    out_path = os.path.join(EXPLAIN_DIR, f"{image_id}_{fingerprint}.png")
+    tmp = out_path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(png)
+    os.replace(tmp, out_path)
+
+    with app.app_context():
+        record = db.session.get(Image, image_id)
+        if record is not None:
+            old = record.heatmap_path
+            record.heatmap_path, record.heatmap_fingerprint = out_path, fingerprint
+            db.session.commit()
+            if old and old != out_path:
+                try:
+                    os.remove(old)
+                except OSError:
+                    pass
+    with _lock:
+        _stats["computed"] += 1
+        _stats["tensor_reused"] += int(reused)
+    return out_path
+
+
+def _run(app, image_id: int) -> str:
+    try:
+        return _compute(app, image_id)
+    except NotExplainable:
+        raise
+    except Exception:
+        logger.exception(f"[explain] Grad-CAM 실패: image_id={image_id}")
+        with _lock:
+            _stats["errors"] += 1
+        raise
+    finally:
+        with _lock:
+            _inflight.pop(image_id, None)
+
+
+def submit(app, image_id: int):
+    """히트맵 생성 예약 (이미 진행 중이면 그 Future) → Future[str: PNG 경로]"""
+    pool = _get_pool()
+    with _lock:
+        fut = _inflight.get(image_id)
+        if fut is None:
+            fut = pool.submit(_run, app, image_id)
+            _inflight[image_id] = fut
+    return fut
+
+
+def pending(image_id: int) -> bool:
+    with _lock:
+        return image_id in _inflight
+
+
+def stats() -> dict:
+    with _lock:
+        return {"workers": EXPLAIN_WORKERS, "inflight": len(_inflight), **_stats}
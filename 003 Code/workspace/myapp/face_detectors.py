@@ -0,0 +1,196 @@
+# face_detectors.py — 교체 가능한 얼굴 검출 백엔드
+#  - haar: 기존 OpenCV Haar cascade
+#  - yunet: OpenCV DNN 기반 YuNet (cv2.FaceDetectorYN, 로컬 .onnx 파일)
+#  - ssd: OpenCV DNN ResNet-10 SSD (로컬 deploy.prototxt + .caffemodel)
+#  - retinaface: retina-face 패키지 (선택 설치: pip install retina-face)
+# 모든 백엔드는 긴 변이 max_side가 되도록 줄인 사본에서 검출하고, 박스를 원본 해상도로 되돌린다.
+# OpenCV 검출기 객체는 스레드 간 공유가 안전하지 않아 스레드별로 지연 생성한다.
+import os
+import threading
+
+import cv2
+import numpy as np
+
+HAAR_PATH = os.path.join(cv2.data.haarcascades, "haarcascade_frontalface_default.xml") \
+    if hasattr(cv2, "data") and hasattr(cv2.data, "haarcascades") else None
+
+
+class FaceDetector:
+    """detect(img_bgr) → [(x, y, w, h), ...] (원본 좌표) | None(검출기 없음/실패)"""
+
+    name = "base"
+
+    def __init__(self, max_side=None, min_size=(60, 60)):
+        self.max_side = max_side
+        self.min_size = min_size
+        self._local = threading.local()
+
+    def _instance(self):
+        """스레드별 검출기 객체 (없으면 _create()로 생성)"""
+        if not hasattr(self._local, "obj"):
+            self._local.obj = self._create()
+        return self._local.obj
+
+    def _create(self):
+        raise NotImplementedError
+
+    def _detect(self, img_bgr, min_size):
+        """축소된 이미지에서 검출. min_size도 축소 좌표 기준"""
+        raise NotImplementedError
+
+    def detect(self, img_bgr, src_scale=1.0):
+        """src_scale: img_bgr가 업로드 원본 대비 몇 배 크기인지 (축소 디코딩이면 1/2, 1/4, ...). min_size 환산용"""
+        if img_bgr is None:
+            return None
+        h, w = img_bgr.shape[:2]
+        scale = 1.0
+        small = img_bgr
+        if self.max_side and max(h, w) > self.max_side:
+            scale = self.max_side / float(max(h, w))
+            small = cv2.resize(img_bgr, (max(1, round(w * scale)), max(1, round(h * scale))),
+                               interpolation=cv2.INTER_AREA)
+        min_scale = scale * src_scale
+        min_size = (max(1, int(self.min_size[0] * min_scale)), max(1, int(self.min_size[1] * min_scale)))
+        try:
+            boxes = self._detect(small, min_size)
+        except Exception as e:
+            print(f"[face] {self.name} 검출 예외: {e}")
+            return None
+        if boxes is None:
+            return None
+
+        out = []
+        for x, y, bw, bh in boxes:
+            # 원본 좌표로 복원 + 이미지 경계로 자르기
+            x0 = max(0, int(round(x / scale)))
+            y0 = max(0, int(round(y / scale)))
+            x1 = min(w, int(round((x + bw) / scale)))
+            y1 = min(h, int(round((y + bh) / scale)))
+            if x1 > x0 and y1 > y0:
+                out.append((x0, y0, x1 - x0, y1 - y0))
+        return out
+
+
+class HaarDetector(FaceDetector):
+    name = "haar"
+
+    def __init__(self, scale_factor=1.2, min_neighbors=4, cascade_path=HAAR_PATH, **kw):
+        super().__init__(**kw)
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.cascade_path = cascade_path
+
+    def _create(self):
+        if not (self.cascade_path and os.path.exists(self.cascade_path)):
+            return None
+        return cv2.CascadeClassifier(self.cascade_path)
+
+    def _detect(self, img_bgr, min_size):
+        cascade = self._instance()
+        if cascade is None:
+            # 검출기 자체가 없으면 None
+            return None
+        gray = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2GRAY)
+        faces = cascade.detectMultiScale(gray, scaleFactor=self.scale_factor,
+                                         minNeighbors=self.min_neighbors, minSize=min_size)
+        return [tuple(f) for f in faces]
+
+
+class YuNetDetector(FaceDetector):
+    name = "yunet"
+
+    def __init__(self, model_path, score_threshold=0.6, nms_threshold=0.3, top_k=50, **kw):
+        super().__init__(**kw)
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"YuNet 모델 파일이 없습니다: {model_path}")
+        self.model_path = model_path
+        self.score_threshold = score_threshold
+        self.nms_threshold = nms_threshold
+        self.top_k = top_k
+
+    def _create(self):
+        return cv2.FaceDetectorYN.create(self.model_path, "", (320, 320),
+                                         self.score_threshold, self.nms_threshold, self.top_k)
+
+    def _detect(self, img_bgr, min_size):
+        det = self._instance()
+        h, w = img_bgr.shape[:2]
+        det.setInputSize((w, h))
+        _, faces = det.detect(img_bgr)
+        if faces is None:
+            return []
+        return [(int(f[0]), int(f[1]), int(f[2]), int(f[3])) for f in faces
+                if f[2] >= min_size[0] and f[3] >= min_size[1]]
+
+
+class SSDDetector(FaceDetector):
+    name = "ssd"
+
+    def __init__(self, prototxt, model_path, score_threshold=0.6, **kw):
+        super().__init__(**kw)
+        for path in (prototxt, model_path):
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"SSD 모델 파일이 없습니다: {path}")
+        self.prototxt = prototxt
+        self.model_path = model_path
+        self.score_threshold = score_threshold
+
+    def _create(self):
+        return cv2.dnn.readNetFromCaffe(self.prototxt, self.model_path)
+
+    def _detect(self, img_bgr, min_size):
+        net = self._instance()
+        h, w = img_bgr.shape[:2]
+        blob = cv2.dnn.blobFromImage(cv2.resize(img_bgr, (300, 300)), 1.0, (300, 300), (104.0, 177.0, 123.0))
+        net.setInput(blob)
+        dets = net.forward()[0, 0]
+        out = []
+        for d in dets:
+            if d[2] < self.score_threshold:
+                continue
+            x0, y0, x1, y1 = (d[3:7] * np.array([w, h, w, h])).astype(int)
+            bw, bh = x1 - x0, y1 - y0
+            if bw >= min_size[0] and bh >= min_size[1]:
+                out.append((int(x0), int(y0), int(bw), int(bh)))
+        return out
+
+
+class RetinaFaceDetector(FaceDetector):
+    name = "retinaface"
+
+    def __init__(self, score_threshold=0.9, **kw):
+        super().__init__(**kw)
+        try:
+            from retinaface import RetinaFace  # noqa: F401
+        except ImportError as e:
+            raise ImportError("retinaface 백엔드는 retina-face 패키지가 필요합니다 (pip install retina-face)") from e
+        self.score_threshold = score_threshold
+
+    def _create(self):
+        from retinaface import RetinaFace
+        return RetinaFace
+
+    def _detect(self, img_bgr, min_size):
+        faces = self._instance().detect_faces(img_bgr, threshold=self.score_threshold)
+        if not isinstance(faces, dict):
+            return []
+        out = []
+        for f in faces.values():
+            x0, y0, x1, y1 = f["facial_area"]
+            if x1 - x0 >= min_size[0] and y1 - y0 >= min_size[1]:
+                out.append((int(x0), int(y0), int(x1 - x0), int(y1 - y0)))
+        return out
+
+
+BACKENDS = {
+    "haar": HaarDetector,
+    "yunet": YuNetDetector,
+    "ssd": SSDDetector,
+    "retinaface": RetinaFaceDetector,
+}
+
+
+def create_detector(name, **kwargs) -> FaceDetector:
+    if name not in BACKENDS:
+        raise ValueError(f"알 수 없는 얼굴 검출기: {name} (가능: {', '.join(BACKENDS)})")
+    return BACKENDS[name](**kwargs)
@@ -0,0 +1,241 @@
+# fetch.py — image_url 다운로드 계층
+#  - 워커(프로세스)별로 커넥션 풀을 가진 requests.Session 재사용
+#  - 스트리밍 다운로드 + 최대 바이트 초과 시 중단
+#  - 정규화 URL 기준 디스크 캐시: ETag/Last-Modified 저장 후 조건부 GET으로 재검증
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+import logging
+from dataclasses import dataclass, field
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# =========================
+# ✅ 설정
+# =========================
+URL_FETCH_TIMEOUT = 8                       # 초 (연결/읽기)
+URL_MAX_BYTES = 15 * 1024 * 1024            # 이보다 크면 다운로드 중단
+URL_CACHE_DIR = "/home/ubuntu/deepfake-detector/cache/url"
+URL_CACHE_MAX_FILES = 20_000                # 초과 시 오래된 항목부터 정리
+URL_POOL_SIZE = 16                          # 호스트별 keep-alive 커넥션 수
+DEFAULT_HEADERS = {"User-Agent": "Mozilla/5.0"}
+
+
+class FetchError(Exception):
+    """다운로드 실패 (HTTP 오류, 크기 초과 등)"""
+
+
+@dataclass
+class FetchResult:
+    url: str
+    content: bytes
+    content_type: str | None
+    from_cache: bool = False       # True면 본문을 다시 받지 않음(304 또는 신선한 캐시)
+    meta: dict = field(default_factory=dict)
+
+
+# =========================
+# ✅ 세션 (프로세스별)
+# =========================
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+def get_session() -> requests.Session:
+    global _session, _session_pid
+    if _session is not None and _session_pid == os.getpid():
+        return _session
+    with _session_lock:
+        if _session is None or _session_pid != os.getpid():
+            s = requests.Session()
+            adapter = HTTPAdapter(pool_connections=URL_POOL_SIZE, pool_maxsize=URL_POOL_SIZE)
+            s.mount("http://", adapter)
+            s.mount("https://", adapter)
+            s.headers.update(DEFAULT_HEADERS)
+            _session, _session_pid = s, os.getpid()
+    return _session
+
+
+# =========================
+# ✅ URL 정규화
+# =========================
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+def normalize_url(url: str) -> str:
+    """스킴/호스트 소문자화, 기본 포트와 fragment 제거, 쿼리 파라미터 정렬"""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != _DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    path = parts.path or "/"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, path, query, ""))
+
+
+# =========================
+# ✅ 스트리밍 다운로드
+# =========================
+def _download(resp: requests.Response, max_bytes: int) -> bytes:
+    length = resp.headers.get("Content-Length")
+    if length and length.isdigit() and int(length) > max_bytes:
+        raise FetchError(f"이미지가 너무 큽니다 ({length} bytes > {max_bytes})")
+    chunks, total = [], 0
+    for chunk in resp.iter_content(chunk_size=64 * 1024):
+        total += len(chunk)
+        if total > max_bytes:
+            raise FetchError(f"이미지가 너무 큽니다 (>{max_bytes} bytes)")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def _max_age(cache_control: str | None):
+    if not cache_control:
+        return None
+    if "no-cache" in cache_control or "no-store" in cache_control:
+        return 0
+    m = re.search(r"max-age=(\d+)", cache_control)
+    return int(m.group(1)) if m else None
+
+
+# =========================
+# ✅ 디스크 캐시
+# =========================
+class URLCache:
+    """<dir>/<sha256(normalized url)>.json(메타) + .bin(본문)"""
+
+    def __init__(self, cache_dir=URL_CACHE_DIR, max_files=URL_CACHE_MAX_FILES):
+        self.cache_dir = cache_dir
+        self.max_files = max_files
+        self._stores = 0
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+
+    def _paths(self, norm_url):
+        key = hashlib.sha256(norm_url.encode()).hexdigest()
+        return os.path.join(self.cache_dir, key + ".json"), os.path.join(self.cache_dir, key + ".bin")
+
+    def load(self, norm_url):
+        meta_path, body_path = self._paths(norm_url)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(body_path, "rb") as f:
+                body = f.read()
+            return meta, body
+        except (OSError, ValueError):
+            return None, None
+
+    def store(self, norm_url, meta, body=None):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        meta_path, body_path = self._paths(norm_url)
+        # 원자적 교체 (다른 워커가 반쯤 쓰인 파일을 읽지 않도록)
+        if body is not None:
+            tmp = f"{body_path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(body)
+            os.replace(tmp, body_path)
+        tmp = f"{meta_path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, meta_path)
+
+        self._stores += 1
+        if self._stores % 500 == 0:
+            self._prune()
+
+    def _prune(self):
+        try:
+            metas = [e for e in os.scandir(self.cache_dir) if e.name.endswith(".json")]
+            if len(metas) <= self.max_files:
+                return
+            metas.sort(key=lambda e: e.stat().st_mtime)
+            for e in metas[:len(metas) - self.max_files]:
+                for path in (e.path, e.path[:-5] + ".bin"):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+        except OSError as e:
+            logger.warning(f"[fetch] 캐시 정리 실패: {e}")
+
+    def stats(self):
+        return {"hits": self.hits, "revalidated": self.revalidated, "misses": self.misses,
+                "dir": self.cache_dir}
+
+
+url_cache = URLCache()
+
+
+def fetch_image(url: str, timeout=URL_FETCH_TIMEOUT, max_bytes=URL_MAX_BYTES) -> FetchResult:
+    """
+    URL 이미지를 가져온다.
+      - 캐시가 max-age 안이면 네트워크 없이 반환
+      - 캐시에 ETag/Last-Modified가 있으면 조건부 GET → 304면 캐시 본문 반환
+      - 그 외에는 스트리밍 다운로드 후 캐시에 저장
+    실패 시 FetchError / requests 예외를 던진다.
+    """
+    norm = normalize_url(url)
+    meta, body = url_cache.load(norm)
+
+    headers = {}
+    if meta is not None:
+        max_age = meta.get("max_age")
+        if max_age and time.time() - meta.get("fetched_at", 0) < max_age:
+            url_cache.hits += 1
+            return FetchResult(url, body, meta.get("content_type"), from_cache=True, meta=meta)
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    with get_session().get(url, headers=headers, timeout=timeout, stream=True) as r:
+        if r.status_code == 304 and meta is not None:
+            url_cache.revalidated += 1
+            meta["fetched_at"] = time.time()
+            meta["max_age"] = _max_age(r.headers.get("Cache-Control")) or meta.get("max_age")
+            url_cache.store(norm, meta)
+            return FetchResult(url, body, meta.get("content_type"), from_cache=True, meta=meta)
+
+        r.raise_for_status()
+        content = _download(r, max_bytes)
+        url_cache.misses += 1
+
+        meta = {
+            "url": norm,
+            "etag": r.headers.get("ETag"),
+            "last_modified": r.headers.get("Last-Modified"),
+            "content_type": r.headers.get("Content-Type"),
+            "max_age": _max_age(r.headers.get("Cache-Control")),
+            "sha256": hashlib.sha256(content).hexdigest(),
+            "size": len(content),
+            "fetched_at": time.time(),
+        }
+        # 재검증 수단이 없고 max-age도 없으면 저장해도 다시 받아야 하므로 캐시하지 않음
+        if meta["etag"] or meta["last_modified"] or meta["max_age"]:
+            try:
+                url_cache.store(norm, meta, content)
+            except OSError as e:
+                logger.warning(f"[fetch] 캐시 저장 실패: {e}")
+        return FetchResult(url, content, meta["content_type"], from_cache=False, meta=meta)
+
+
+def remember(url: str, **extra):
+    """캐시 메타에 부가정보(예: 저장된 미리보기 경로)를 기록"""
+    norm = normalize_url(url)
+    meta, _ = url_cache.load(norm)
+    if meta is None:
+        return
+    meta.update(extra)
+    try:
+        url_cache.store(norm, meta)
+    except OSError as e:
+        logger.warning(f"[fetch] 캐시 메타 갱신 실패: {e}")
@@ -0,0 +1,241 @@
+# jobs.py — 대량 판별 비동기 작업 큐 (외부 브로커 없이 로컬에서 동작)
+#  - POST 시 입력 파일을 JOB_DIR에 저장하고 Job 행(queued)을 만든 뒤 바로 ID 반환
+#  - 디스패처 스레드가 DB에서 우선순위 순으로 작업을 꺼내 프로세스 풀(웹 워커와 GIL 분리)에서 배치 추론
+#  - 청크마다 진행률/부분 결과를 DB에 기록 → 재시작해도 이어서 처리
+#  - gunicorn 워커가 여러 개여도 파일 락을 잡은 한 워커만 디스패처를 돌림
+import os
+import json
+import uuid
+import shutil
+import fcntl
+import threading
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from werkzeug.utils import secure_filename
+
+from .models import db, Job
+
+logger = logging.getLogger(__name__)
+
+# =========================
+# ✅ 설정
+# =========================
+JOB_DIR = "/home/ubuntu/deepfake-detector/jobs"
+JOB_WORKERS = 2                # 추론 프로세스 수
+JOB_MAX_QUEUE = 50             # 대기(queued) 작업이 이 이상이면 새 작업 거절(429)
+JOB_MAX_FILES = 1000           # 작업 하나에 넣을 수 있는 최대 이미지 수
+JOB_CHUNK_SIZE = 32            # 프로세스 하나에 한 번에 넘길 이미지 수 (= 한 배치)
+JOB_POLL_SECONDS = 2.0         # 다른 워커가 넣은 작업 확인 주기
+JOB_PRIORITY_RANGE = (-10, 10)
+
+
+class QueueFull(Exception):
+    """대기 작업 수가 JOB_MAX_QUEUE에 도달"""
+
+
+# =========================
+# ✅ 추론 프로세스 쪽 (spawn된 자식에서 실행)
+# =========================
+def _init_worker():
+    """풀 프로세스 시작 시 한 번: torch 스레드를 코어 수 / JOB_WORKERS로 나눔 (프로세스끼리 코어를 과다 점유하지 않게)"""
+    import torch
+    from . import ai
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // max(1, JOB_WORKERS)))
+    try:
+        torch.set_num_interop_threads(ai.TORCH_INTEROP_THREADS)
+    except RuntimeError:
+        # 이미 병렬 작업이 시작된 프로세스에서는 바꿀 수 없음
+        pass
+
+
+def _classify_paths(paths):
+    from . import ai, model_registry
+    model_registry.refresh(shadow=False)  # 웹 워커와 같은 활성 모델 (registry.json이 바뀌었을 때만 다시 적재)
+    return [(label, float(score)) for label, score, _ in ai.classify_batch(paths)]
+
+
+# =========================
+# ✅ 작업 생성/조회 (요청 스레드)
+# =========================
+def queue_depth() -> int:
+    return Job.query.filter_by(status="queued").count()
+
+
+def create_job(files, priority=0, user_id=None) -> Job:
+    """files: werkzeug FileStorage 리스트. 대기열이 가득 차면 QueueFull"""
+    if queue_depth() >= JOB_MAX_QUEUE:
+        raise QueueFull()
+
+    lo, hi = JOB_PRIORITY_RANGE
+    priority = max(lo, min(hi, int(priority)))
+
+    job_id = uuid.uuid4().hex
+    input_dir = os.path.join(JOB_DIR, job_id)
+    os.makedirs(input_dir, exist_ok=True)
+
+    inputs = []
+    for n, file in enumerate(files):
+        if not file or file.filename == "":
+            continue
+        original = secure_filename(file.filename) or f"image_{n}"
+        stored = f"{n:05d}_{original}"
+        file.save(os.path.join(input_dir, stored))
+        inputs.append([stored, original])
+
+    job = Job(id=job_id, status="queued", priority=priority, total=len(inputs),
+              input_dir=input_dir, inputs=json.dumps(inputs, ensure_ascii=False),
+              results="[]", user_id=user_id)
+    db.session.add(job)
+    db.session.commit()
+    _wake.set()
+    return job
+
+
+def job_to_dict(job: Job, offset=0) -> dict:
+    results = json.loads(job.results or "[]")
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "priority": job.priority,
+        "total": job.total,
+        "done": job.done,
+        "progress": round(job.done / job.total, 4) if job.total else 1.0,
+        "error": job.error,
+        "offset": offset,
+        "results": results[offset:],
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "updated_at": job.updated_at.isoformat() if job.updated_at else None,
+    }
+
+
+# =========================
+# ✅ 디스패처 (락을 잡은 워커 하나에서만)
+# =========================
+_wake = threading.Event()
+_dispatcher = None
+_dispatcher_pid = None
+_start_lock = threading.Lock()
+_pool = None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    """
+    JOB_WORKERS개 추론 프로세스. spawn이라 웹 워커의 preload 가중치를 copy-on-write로 공유하지 못하고
+    프로세스마다 모델을 따로 적재함 (메모리 = 모델 크기 × JOB_WORKERS 추가)
+    """
+    global _pool
+    if _pool is None:
+        # fork 대신 spawn: 웹 워커의 스레드/torch 상태를 물려받지 않음
+        _pool = ProcessPoolExecutor(max_workers=JOB_WORKERS, mp_context=multiprocessing.get_context("spawn"),
+                                    initializer=_init_worker)
+    return _pool
+
+
+def _claim_next():
+    job = (Job.query.filter_by(status="queued")
+           .order_by(Job.priority.desc(), Job.created_at.asc())
+           .first())
+    if job is None:
+        return None
+    claimed = Job.query.filter_by(id=job.id, status="queued").update({"status": "running"})
+    db.session.commit()
+    return db.session.get(Job, job.id) if claimed else None
+
+
+def _run_job(job: Job):
+    inputs = json.loads(job.inputs or "[]")
+    results = json.loads(job.results or "[]")
+    start = job.done  # 재시작 시 처리된 청크는 건너뜀
+
+    chunks = [inputs[i:i + JOB_CHUNK_SIZE] for i in range(start, len(inputs), JOB_CHUNK_SIZE)]
+    pool = _get_pool()
+    futures = [pool.submit(_classify_paths, [os.path.join(job.input_dir, s) for s, _ in chunk])
+               for chunk in chunks]
+
+    # 여러 청크가 프로세스 풀에서 동시에 돌고, 기록은 입력 순서대로
+    for chunk, fut in zip(chunks, futures):
+        try:
+            outs = fut.result()
+        except Exception:
+            logger.exception(f"[jobs] 청크 처리 실패: {job.id}")
+            outs = [("Error", 0.0)] * len(chunk)
+        for (_, original), (label, score) in zip(chunk, outs):
+            results.append({"filename": original, "label": label, "score": round(score, 4)})
+        job.done = len(results)
+        job.results = json.dumps(results, ensure_ascii=False)
+        db.session.commit()
+
+    job.status = "done"
+    db.session.commit()
+    shutil.rmtree(job.input_dir, ignore_errors=True)
+
+
+def _loop(app, lock_file):
+    with app.app_context():
+        # 락 보유자만 디스패처이므로, running으로 남은 작업은 이전 프로세스가 죽으며 남긴 것
+        Job.query.filter_by(status="running").update({"status": "queued"})
+        db.session.commit()
+
+        while True:
+            try:
+                job = _claim_next()
+                if job is None:
+                    _wake.wait(JOB_POLL_SECONDS)
+                    _wake.clear()
+                    continue
+                logger.info(f"[jobs] 시작 {job.id} (priority={job.priority}, total={job.total})")
+                try:
+                    _run_job(job)
+                except Exception as e:
+                    logger.exception(f"[jobs] 작업 실패: {job.id}")
+                    db.session.rollback()
+                    job.status = "failed"
+                    job.error = str(e)
+                    db.session.commit()
+            except Exception:
+                logger.exception("[jobs] 디스패처 루프 예외")
+                db.session.rollback()
+                _wake.wait(JOB_POLL_SECONDS)
+            finally:
+                db.session.remove()
+
+
+def _try_become_dispatcher(app):
+    """락을 잡을 때까지 주기적으로 재시도 (락을 가진 워커가 죽으면 다른 워커가 이어받음)"""
+    os.makedirs(JOB_DIR, exist_ok=True)
+    lock_file = open(os.path.join(JOB_DIR, ".dispatcher.lock"), "w")
+    while True:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            break
+        except OSError:
+            _wake.wait(JOB_POLL_SECONDS * 5)
+            _wake.clear()
+    logger.info(f"[jobs] 디스패처 시작 (pid={os.getpid()})")
+    _loop(app, lock_file)
+
+
+def ensure_dispatcher(app):
+    """프로세스별로 한 번 디스패처 스레드를 띄운다 (fork 이후 재호출해도 안전)"""
+    global _dispatcher, _dispatcher_pid, _pool
+    pid = os.getpid()
+    if _dispatcher is not None and _dispatcher_pid == pid:
+        return
+    with _start_lock:
+        if _dispatcher is not None and _dispatcher_pid == pid:
+            return
+        if _dispatcher_pid is not None and _dispatcher_pid != pid:
+            _pool = None  # 부모의 프로세스 풀은 쓰지 않음
+        _dispatcher_pid = pid
+        _dispatcher = threading.Thread(target=_try_become_dispatcher, args=(app,),
+                                       name="job-dispatcher", daemon=True)
+        _dispatcher.start()
+
+
+def init_app(app):
+    """요청이 들어오기 시작하면 디스패처 기동 (flask db 같은 CLI에서는 띄우지 않음)"""
+    @app.before_request
+    def _start_job_dispatcher():
+        ensure_dispatcher(app)
@@ -0,0 +1,395 @@
+# model_registry.py — 이름 붙인 체크포인트 목록 + 활성 모델 무중단 교체 + 섀도 평가
+#  - 상태 파일: <MODEL_DIR>/registry.json (모든 워커/추론 서버/작업 프로세스가 공유)
+#      {"models": {"dm2": {"path": "dm2.pth", "arch": "efficientnet_b3", "artifact": "dm2.ts.pt"}, ...},
+#       "active": "dm2", "shadow": {"name": "dm3", "sample_rate": 0.05} | null}
+#    path/artifact가 상대 경로면 MODEL_DIR 기준. 파일이 없으면 ai.MODEL_PATH 하나("default")만 있는 것으로 간주
+#  - 교체: 새 모델을 옆에 적재(+워밍업)한 뒤 ai.swap_model로 참조만 바꿈 → 진행 중인 요청은 이전 모델로 끝남
+#    관리 API를 받은 워커가 먼저 교체하고 파일을 쓰면, 나머지 워커는 감시 스레드가 mtime 변화를 보고 따라 바꿈
+#  - 섀도: 후보 모델이 실제 트래픽의 sample_rate 비율을 백그라운드 스레드에서 다시 판정
+#    (요청 경로에서는 샘플링 후 큐에 넣기만, 큐가 차면 버림) → 활성 모델과의 라벨 일치율/확률 차이/지연 기록
+#    활성 모델의 원시 forward(캐스케이드/TTA 전)와 같은 입력을 후보 모델로 원시 forward해 비교하고,
+#    활성 지연은 요청 경로에서 잰 값을 그대로 씀. server 모드에서는 추론 서버가 섀도를 돌림
+import os
+import re
+import json
+import time
+import queue
+import fcntl
+import random
+import threading
+import logging
+
+from .batching import Histogram
+
+logger = logging.getLogger(__name__)
+
+# =========================
+# ✅ 설정
+# =========================
+MODEL_DIR = os.environ.get("DEEPFAKE_MODEL_DIR", "/home/ubuntu/deepfake-detector/myapp/models")
+REGISTRY_PATH = os.path.join(MODEL_DIR, "registry.json")
+REGISTRY_POLL_SECONDS = 2.0    # 다른 워커가 바꾼 registry.json 확인 주기
+SHADOW_SAMPLE_RATE = 0.05      # 섀도 지정 시 sample_rate 기본값
+SHADOW_QUEUE_MAX = 32          # 대기 중인 섀도 배치 상한 (넘치면 버림)
+SHADOW_LOG_EVERY = 500         # 섀도 이미지 수가 이만큼 늘 때마다 통계 로그 (server 모드는 ai-stats에 안 보이므로)
+ADMIN_TOKEN = os.environ.get("DEEPFAKE_ADMIN_TOKEN")  # 관리 API 헤더 X-Admin-Token. 없으면 관리 API 비활성
+
+_NAME_RE = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+
+
+# =========================
+# ✅ registry.json 읽기/쓰기
+# =========================
+def _default_state() -> dict:
+    from . import ai
+    return {"models": {"default": {"path": ai.MODEL_PATH, "arch": ai.MODEL_ARCH, "artifact": ai.ARTIFACT_PATH}},
+            "active": "default", "shadow": None}
+
+
+def _resolve(path):
+    if not path:
+        return None
+    return path if os.path.isabs(path) else os.path.join(MODEL_DIR, path)
+
+
+def read_state() -> dict:
+    if not os.path.exists(REGISTRY_PATH):
+        return _default_state()
+    with open(REGISTRY_PATH, "r", encoding="utf-8") as f:
+        state = json.load(f)
+    state.setdefault("models", {})
+    state.setdefault("shadow", None)
+    return state
+
+
+def _update_state(fn) -> dict:
+    """flock 안에서 읽기 → fn(state) → 임시 파일 + os.replace (읽는 쪽은 항상 완전한 파일을 봄)"""
+    os.makedirs(MODEL_DIR, exist_ok=True)
+    with open(REGISTRY_PATH + ".lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            state = read_state()
+            fn(state)
+            tmp = f"{REGISTRY_PATH}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(state, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, REGISTRY_PATH)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+    return state
+
+
+def spec_of(state: dict, name: str) -> dict:
+    """registry 항목 → ai가 쓰는 모델 명세 {"name", "path", "arch", "artifact"} (절대 경로)"""
+    entry = state["models"].get(name)
+    if entry is None:
+        raise KeyError(f"등록되지 않은 모델: {name}")
+    from . import ai
+    return {"name": name, "path": _resolve(entry["path"]), "arch": entry.get("arch") or ai.MODEL_ARCH,
+            "artifact": _resolve(entry.get("artifact"))}
+
+
+def _same(a: dict, b: dict) -> bool:
+    keys = ("name", "path", "arch", "artifact")
+    return all(a.get(k) == b.get(k) for k in keys)
+
+
+# =========================
+# ✅ 관리 작업 (관리 API에서 호출)
+# =========================
+def register(name: str, path: str, arch: str = None, artifact: str = None) -> dict:
+    from . import ai
+    if not _NAME_RE.match(name or ""):
+        raise ValueError("모델 이름은 영문/숫자/._- 64자 이내여야 합니다")
+    if not path:
+        raise ValueError("체크포인트 경로(path)가 필요합니다")
+    if not os.path.exists(_resolve(path)):
+        raise ValueError(f"체크포인트 파일이 없습니다: {_resolve(path)}")
+    if arch and arch not in ai.DeepFakeDetector.ARCHS:
+        raise ValueError(f"지원하지 않는 모델 구조: {arch}")
+
+    def fn(state):
+        state["models"][name] = {"path": path, "arch": arch or ai.MODEL_ARCH, "artifact": artifact}
+    return _update_state(fn)
+
+
+def activate(name: str) -> dict:
+    """이 프로세스에서 먼저 적재/교체(실패하면 registry를 건드리지 않음) → registry 기록 → 다른 워커가 따라옴"""
+    from . import ai
+    spec = spec_of(read_state(), name)
+    if _same(spec, ai.active_spec()):
+        return {"active": name, "load_ms": 0.0, "unchanged": True, "fingerprint": ai.model_fingerprint()}
+    t0 = time.perf_counter()
+    _swap(spec)
+    load_ms = round(1000.0 * (time.perf_counter() - t0), 1)
+
+    def fn(state):
+        if name not in state["models"]:
+            raise KeyError(f"등록되지 않은 모델: {name}")
+        state["active"] = name
+        if (state.get("shadow") or {}).get("name") == name:
+            state["shadow"] = None
+    _update_state(fn)
+    refresh(force=True, shadow=_watch_shadow)
+    return {"active": name, "load_ms": load_ms, "unchanged": False, "fingerprint": ai.model_fingerprint()}
+
+
+def set_shadow(name: str = None, sample_rate: float = None) -> dict:
+    """name=None이면 섀도 평가 중지"""
+    state = read_state()
+    if name is not None:
+        spec_of(state, name)
+        if name == state.get("active"):
+            raise ValueError("활성 모델을 섀도로 지정할 수 없습니다")
+        rate = SHADOW_SAMPLE_RATE if sample_rate is None else float(sample_rate)
+        if not (0.0 < rate <= 1.0):
+            raise ValueError("sample_rate는 0보다 크고 1 이하여야 합니다")
+        shadow = {"name": name, "sample_rate": rate}
+    else:
+        shadow = None
+
+    def fn(state):
+        state["shadow"] = shadow
+    state = _update_state(fn)
+    refresh(force=True, shadow=_watch_shadow)
+    return state
+
+
+# =========================
+# ✅ 워커 동기화 (registry.json mtime 감시)
+# =========================
+_load_models = True            # False: server 모드 웹 워커 (명세/지문만 따라가고 forward는 추론 서버)
+_last_mtime = None
+_refresh_lock = threading.Lock()
+_watch_pid = None
+_watch_shadow = True           # False: server 모드 웹 워커 (섀도는 forward를 하는 추론 서버에서)
+
+
+def _mtime():
+    try:
+        return os.path.getmtime(REGISTRY_PATH)
+    except OSError:
+        return None
+
+
+def _swap(spec):
+    from . import ai, near_dup
+    ai.swap_model(spec, loaded=None if _load_models else False)
+    # 모델 지문이 바뀌었으니 근사 중복 인덱스도 새 지문의 행으로 다시 구성 (웹 앱이 아니면 아무것도 안 함)
+    try:
+        near_dup.rebuild()
+    except Exception:
+        logger.exception("[registry] 근사 중복 인덱스 재구성 실패")
+
+
+def refresh(force=False, shadow=True):
+    """
+    registry.json이 바뀌었으면 활성(+shadow=True면 섀도) 모델을 맞춘다.
+    활성 모델 적재는 호출한 스레드에서 하므로 요청 스레드에서는 활성 모델이 이미 같을 때만 부를 것
+    """
+    global _last_mtime
+    from . import ai
+    mtime = _mtime()
+    if mtime == _last_mtime and not force:
+        return
+    with _refresh_lock:
+        try:
+            state = read_state()
+            spec = spec_of(state, state["active"])
+            if not _same(spec, ai.active_spec()):
+                _swap(spec)
+            cfg = state.get("shadow") if shadow else None
+            if shadow or _shadow is not None:
+                _configure_shadow(dict(cfg, spec=spec_of(state, cfg["name"])) if cfg else None)
+        except Exception:
+            logger.exception("[registry] 모델 동기화 실패 (기존 모델 유지)")
+        # 실패해도 같은 파일로 계속 재시도하지 않음 (다음 변경 때 다시)
+        _last_mtime = mtime
+
+
+def _watch_loop():
+    refresh(force=True, shadow=_watch_shadow)  # 시작 시 섀도 설정 반영 (활성 모델은 apply_startup에서 이미 맞춤)
+    while True:
+        time.sleep(REGISTRY_POLL_SECONDS)
+        refresh(shadow=_watch_shadow)
+
+
+def _ensure_watch_thread():
+    # fork된 워커마다 자기 스레드 (마스터에서 만든 스레드는 fork를 넘지 못함)
+    global _watch_pid
+    if _watch_pid == os.getpid():
+        return
+    with _refresh_lock:
+        if _watch_pid != os.getpid():
+            threading.Thread(target=_watch_loop, name="model-registry", daemon=True).start()
+            _watch_pid = os.getpid()
+
+
+def apply_startup(load_models=True):
+    """
+    프로세스 시작 시 한 번: registry.json의 활성 모델을 ai의 명세로 설정 (아직 적재 전이면 적재하지 않음)
+    load_models=False면 이후 교체 때도 적재하지 않고 명세/지문만 바꿈
+    """
+    global _load_models, _last_mtime
+    from . import ai
+    _load_models = load_models
+    try:
+        state = read_state()
+        spec = spec_of(state, state["active"])
+    except Exception:
+        logger.exception("[registry] registry.json 읽기 실패 → 기본 모델 사용")
+        return
+    if not _same(spec, ai.active_spec()):
+        # 아직 적재 전이면 명세만 바꿔 두고 첫 사용(get_model) 때 적재
+        if ai._model is None:
+            ai.swap_model(spec, loaded=False)
+        else:
+            _swap(spec)
+    _last_mtime = _mtime()
+
+
+def init_app(app):
+    """웹 앱: 시작 시 활성 모델 명세 적용 + 첫 요청부터 워커별 감시 스레드(local 모드면 섀도 설정도 여기서 반영)"""
+    global _watch_shadow
+    from . import ai
+    local = ai.INFERENCE_BACKEND == "local"
+    _watch_shadow = local
+    apply_startup(load_models=local)
+
+    @app.before_request
+    def _registry_watch():
+        _ensure_watch_thread()
+
+
+def start_watcher():
+    """웹 앱 밖(추론 서버)에서: 시작 시 명세 적용 + 감시 스레드 (섀도 평가 포함)"""
+    apply_startup(load_models=True)
+    _ensure_watch_thread()
+
+
+# =========================
+# ✅ 섀도 평가
+# =========================
+_shadow = None                 # {"name", "sample_rate", "spec", "run"} (run: 적재된 forward용 모델)
+_shadow_queue = queue.Queue(maxsize=SHADOW_QUEUE_MAX)
+_shadow_pid = None
+_shadow_stats = {}
+_shadow_stats_lock = threading.Lock()
+
+
+def _reset_shadow_stats(name):
+    global _shadow_stats
+    with _shadow_stats_lock:
+        _shadow_stats = {
+            "name": name, "images": 0, "agree": 0, "dropped": 0, "errors": 0,
+            "fake_prob_abs_diff_sum": 0.0,
+            # 이미지당 지연 (ms) — active: 요청 경로에서 잰 값, shadow: 섀도 스레드에서 같은 배치
+            "active_ms": Histogram([1, 2, 5, 10, 20, 50, 100, 200, 500]),
+            "shadow_ms": Histogram([1, 2, 5, 10, 20, 50, 100, 200, 500]),
+        }
+
+
+def _offer(batch, probs, active_ms):
+    """요청 경로 훅: 샘플링된 배치만 큐에 넣고 바로 반환"""
+    cfg = _shadow
+    if cfg is None or random.random() >= cfg["sample_rate"]:
+        return
+    try:
+        _shadow_queue.put_nowait((cfg["name"], batch, probs, active_ms))
+    except queue.Full:
+        with _shadow_stats_lock:
+            if _shadow_stats:
+                _shadow_stats["dropped"] += len(batch)
+
+
+def _configure_shadow(cfg):
+    """cfg=None이면 중지. 같은 모델이면 sample_rate만 갱신. 후보 모델 적재는 섀도 스레드에서"""
+    global _shadow
+    from . import ai
+    if cfg is None:
+        _shadow = None
+        ai.shadow_hook = None
+        return
+    if _shadow is not None and _shadow["name"] == cfg["name"] and _same(_shadow["spec"], cfg["spec"]):
+        _shadow["sample_rate"] = cfg["sample_rate"]
+        return
+    _reset_shadow_stats(cfg["name"])
+    _shadow = {"name": cfg["name"], "sample_rate": cfg["sample_rate"], "spec": cfg["spec"], "run": None}
+    _ensure_shadow_thread()
+    ai.shadow_hook = _offer
+
+
+def _evaluate(cfg, batch, served, active_ms):
+    """served: 활성 모델의 원시 확률 (요청 경로에서 받은 것, 다시 돌리지 않음)"""
+    from . import ai
+    if cfg["run"] is None:
+        _, cfg["run"] = ai.load_model_spec(cfg["spec"])
+        logger.info(f"[registry] 섀도 모델 적재: {cfg['name']}")
+    n = len(batch)
+    t0 = time.perf_counter()
+    shadow = ai._local_forward_probs(batch, model=cfg["run"])
+    t1 = time.perf_counter()
+
+    agree = int((served.argmax(dim=1) == shadow.argmax(dim=1)).sum())
+    diff = float((served[:, ai.FAKE_IDX] - shadow[:, ai.FAKE_IDX]).abs().sum())
+    with _shadow_stats_lock:
+        if _shadow_stats.get("name") != cfg["name"]:
+            return
+        logged = _shadow_stats["images"] // SHADOW_LOG_EVERY
+        _shadow_stats["images"] += n
+        _shadow_stats["agree"] += agree
+        _shadow_stats["fake_prob_abs_diff_sum"] += diff
+        _shadow_stats["active_ms"].observe(active_ms)
+        _shadow_stats["shadow_ms"].observe(1000.0 * (t1 - t0) / n)
+        report = _shadow_stats["images"] // SHADOW_LOG_EVERY > logged
+    if report:
+        logger.info(f"[registry] 섀도 평가: {stats()['shadow']}")
+
+
+def _shadow_loop():
+    while True:
+        name, batch, served, active_ms = _shadow_queue.get()
+        cfg = _shadow
+        if cfg is None or cfg["name"] != name:
+            continue  # 설정이 바뀌기 전에 들어온 샘플
+        try:
+            _evaluate(cfg, batch, served, active_ms)
+        except Exception:
+            logger.exception("[registry] 섀도 평가 실패")
+            with _shadow_stats_lock:
+                if _shadow_stats:
+                    _shadow_stats["errors"] += 1
+
+
+def _ensure_shadow_thread():
+    global _shadow_pid
+    if _shadow_pid == os.getpid():
+        return
+    threading.Thread(target=_shadow_loop, name="model-shadow", daemon=True).start()
+    _shadow_pid = os.getpid()
+
+
+def stats() -> dict:
+    """활성 모델 + 섀도 평가 통계 (이 워커 기준)"""
+    from . import ai
+    spec = ai.active_spec()
+    out = {"active": spec.get("name"), "path": spec.get("path"), "shadow": None}
+    cfg = _shadow
+    if cfg is None:
+        return out
+    with _shadow_stats_lock:
+        s = dict(_shadow_stats)
+    n = s.get("images", 0)
+    out["shadow"] = {
+        "name": cfg["name"],
+        "sample_rate": cfg["sample_rate"],
+        "loaded": cfg["run"] is not None,
+        "images": n,
+        "dropped": s.get("dropped", 0),
+        "errors": s.get("errors", 0),
+        "label_agreement": round(s["agree"] / n, 4) if n else None,
+        "fake_prob_abs_diff_mean": round(s["fake_prob_abs_diff_sum"] / n, 5) if n else None,
+        "active_ms_per_image": s["active_ms"].snapshot() if n else None,
+        "shadow_ms_per_image": s["shadow_ms"].snapshot() if n else None,
+    }
+    return out
@@ -0,0 +1,206 @@
+# model_server.py — 전용 추론 프로세스 (모든 gunicorn 워커가 Unix 소켓으로 공유)
+#  - 서버: 모델을 한 번만 올리고, 여러 워커에서 온 텐서를 MicroBatcher로 묶어 forward
+#  - 클라이언트: ai.py에서 INFERENCE_BACKEND="server"일 때 사용. 스레드별 연결 재사용
+#  - 전송 형식: 고정 헤더 + 원시 텐서 바이트 (입력 float16/float32, 출력 float32 확률 [N,2])
+#
+# 실행 예)
+#   python -m myapp.model_server --socket /tmp/deepfake-model-0.sock --cpus 0-3
+#   python -m myapp.model_server --socket /tmp/deepfake-model-1.sock --cpus 4-7
+import os
+import sys
+import socket
+import struct
+import argparse
+import threading
+import socketserver
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MAGIC_REQ = b"DFK1"
+MAGIC_RES = b"DFR1"
+REQ_HEADER = struct.Struct("<4sBIHHH")   # magic, dtype, n, c, h, w
+RES_HEADER = struct.Struct("<4sBI")      # magic, status(0=ok,1=error), n(ok: 행 수 / error: 메시지 길이)
+DTYPES = {0: np.float32, 1: np.float16}
+DTYPE_CODES = {np.dtype(np.float32): 0, np.dtype(np.float16): 1}
+
+
+class ModelServerError(Exception):
+    """추론 서버 연결/응답 오류"""
+
+
+def _recv_exact(sock, size) -> bytes:
+    buf = bytearray(size)
+    view = memoryview(buf)
+    got = 0
+    while got < size:
+        n = sock.recv_into(view[got:], size - got)
+        if n == 0:
+            raise ConnectionError("연결이 끊겼습니다")
+        got += n
+    return bytes(buf)
+
+
+# =========================
+# ✅ 클라이언트 (웹 워커)
+# =========================
+class ModelClient:
+    """
+    sockets: 서버 소켓 경로 리스트. 워커 pid 기준으로 하나를 골라 붙는다(여러 서버에 고르게 분산).
+    wire_dtype: 입력 전송 dtype (float16이면 전송량 절반)
+    """
+
+    def __init__(self, sockets, wire_dtype="float16", timeout=30.0):
+        self.sockets = list(sockets)
+        self.wire_dtype = np.dtype(wire_dtype)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _path(self):
+        return self.sockets[os.getpid() % len(self.sockets)]
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and getattr(self._local, "pid", None) == os.getpid():
+            return conn
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        conn.settimeout(self.timeout)
+        conn.connect(self._path())
+        self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _drop(self):
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        if conn is not None:
+            try:
+                conn.close()
+            except OSError:
+                pass
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        """batch: [N,3,H,W] float 배열 → softmax 확률 [N,2] (float32)"""
+        arr = np.ascontiguousarray(batch, dtype=self.wire_dtype)
+        n, c, h, w = arr.shape
+        msg = REQ_HEADER.pack(MAGIC_REQ, DTYPE_CODES[arr.dtype], n, c, h, w) + arr.tobytes()
+
+        for attempt in range(2):  # 끊긴 keep-alive 연결이면 한 번 재연결
+            try:
+                conn = self._conn()
+                conn.sendall(msg)
+                magic, status, size = RES_HEADER.unpack(_recv_exact(conn, RES_HEADER.size))
+                if magic != MAGIC_RES:
+                    raise ModelServerError("잘못된 응답 헤더")
+                if status != 0:
+                    raise ModelServerError(_recv_exact(conn, size).decode("utf-8", "replace"))
+                out = np.frombuffer(_recv_exact(conn, size * 2 * 4), dtype=np.float32)
+                return out.reshape(size, 2)
+            except (ConnectionError, socket.timeout, OSError) as e:
+                self._drop()
+                if attempt == 1:
+                    raise ModelServerError(f"추론 서버 통신 실패({self._path()}): {e}")
+
+
+# =========================
+# ✅ 서버 (전용 프로세스)
+# =========================
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        server = self.server
+        while True:
+            try:
+                header = _recv_exact(self.request, REQ_HEADER.size)
+            except ConnectionError:
+                return
+            try:
+                magic, dtype, n, c, h, w = REQ_HEADER.unpack(header)
+                if magic != MAGIC_REQ or dtype not in DTYPES:
+                    raise ValueError("잘못된 요청 헤더")
+                size = n * c * h * w * np.dtype(DTYPES[dtype]).itemsize
+                arr = np.frombuffer(_recv_exact(self.request, size), dtype=DTYPES[dtype])
+                arr = arr.reshape(n, c, h, w).astype(np.float32)
+
+                # 행마다 배처에 넣어 다른 워커의 요청과 한 배치로 묶이게 함
+                futures = [server.batcher.submit(row) for row in arr]
+                probs = np.stack([f.result() for f in futures]).astype(np.float32)
+                self.request.sendall(RES_HEADER.pack(MAGIC_RES, 0, n) + probs.tobytes())
+            except ConnectionError:
+                return
+            except Exception as e:
+                logger.exception("[model_server] 요청 처리 실패")
+                msg = str(e).encode("utf-8")
+                try:
+                    self.request.sendall(RES_HEADER.pack(MAGIC_RES, 1, len(msg)) + msg)
+                except OSError:
+                    return
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def _parse_cpus(spec):
+    cpus = set()
+    for part in spec.split(","):
+        if "-" in part:
+            a, b = part.split("-")
+            cpus.update(range(int(a), int(b) + 1))
+        elif part:
+            cpus.add(int(part))
+    return cpus
+
+
+def serve(socket_path, cpus=None, threads=None, max_batch=None, max_wait_ms=None):
+    if cpus and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+
+    import torch
+    from . import ai, model_registry
+    from .batching import MicroBatcher
+
+    torch.set_num_threads(threads or (len(cpus) if cpus else os.cpu_count() or 1))
+    model_registry.start_watcher()   # registry.json의 활성 모델 사용 + 관리 API 교체를 따라감
+    if ai.OPTIMIZED_MODE:
+        ai.warmup()
+
+    def run_batch(rows):
+        batch = torch.from_numpy(np.stack(rows))
+        # 섀도 평가도 여기서 (웹 워커는 후보 모델을 올리지 않음)
+        return list(ai._served_forward_probs(batch).numpy())
+
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    server = _Server(socket_path, _Handler)
+    os.chmod(socket_path, 0o660)
+    server.batcher = MicroBatcher(run_batch,
+                                  max_batch_size=max_batch or ai.BATCH_MAX_SIZE,
+                                  max_wait_ms=ai.BATCH_MAX_WAIT_MS if max_wait_ms is None else max_wait_ms,
+                                  name="model-server")
+    logger.info(f"[model_server] listening on {socket_path} (pid={os.getpid()})")
+    print(f"[model_server] listening on {socket_path} (pid={os.getpid()})")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Deepfake 전용 추론 서버")
+    parser.add_argument("--socket", default="/tmp/deepfake-model-0.sock")
+    parser.add_argument("--cpus", default=None, help="고정할 코어 (예: 0-3 또는 0,2,4)")
+    parser.add_argument("--threads", type=int, default=None, help="torch intra-op 스레드 수")
+    parser.add_argument("--max-batch", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=None)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+    serve(args.socket, cpus=_parse_cpus(args.cpus) if args.cpus else None,
+          threads=args.threads, max_batch=args.max_batch, max_wait_ms=args.max_wait_ms)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
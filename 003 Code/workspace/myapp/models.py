@@ -23,8 +23,39 @@ class Image(db.Model):
     file_path = db.Column(db.String(255), nullable=False)
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
     result = db.Column(db.Text)
+    heatmap_path = db.Column(db.String(255))        # Grad-CAM PNG (explain.py)
+    heatmap_fingerprint = db.Column(db.String(16))  # 히트맵을 만든 ai.model_fingerprint() — 다르면 다시 생성
 
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     user = db.relationship('User', backref=db.backref('images', lazy=True))
 
 
+
+
+# ✅ 대량 판별 작업(Job) 테이블 — jobs.py 디스패처가 큐로 사용
+class Job(db.Model):
+    id = db.Column(db.String(32), primary_key=True)               # uuid hex
+    status = db.Column(db.String(16), nullable=False, default="queued", index=True)  # queued/running/done/failed
+    priority = db.Column(db.Integer, nullable=False, default=0)   # 클수록 먼저
+    total = db.Column(db.Integer, nullable=False, default=0)
+    done = db.Column(db.Integer, nullable=False, default=0)
+    input_dir = db.Column(db.String(255), nullable=False)
+    inputs = db.Column(db.Text)                                   # JSON: [[저장파일명, 원본파일명], ...]
+    results = db.Column(db.Text)                                  # JSON: 처리된 순서대로 결과 리스트
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(),
+                           onupdate=db.func.current_timestamp())
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+
+
+# ✅ 지각 해시 + 판정 (near_dup.py 근사 중복 인덱스의 원본 데이터)
+class ImageHash(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    phash = db.Column(db.BigInteger, nullable=False)              # 64비트 해시 (부호 있는 정수로 저장)
+    face_hash = db.Column(db.BigInteger, nullable=True)           # 얼굴 영역 해시 (얼굴이 정확히 하나일 때만)
+    label = db.Column(db.String(16), nullable=False)
+    score = db.Column(db.Float, nullable=False, default=0.0)
+    fingerprint = db.Column(db.String(16), nullable=False, index=True)  # ai.model_fingerprint() — 모델/설정이 바뀌면 무시
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
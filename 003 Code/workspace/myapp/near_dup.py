@@ -0,0 +1,347 @@
+# near_dup.py — 지각 해시(pHash/dHash) 근사 중복 인덱스
+#  - 재인코딩/리사이즈/살짝 잘린 사본은 바이트 SHA-256(결과 캐시)으로는 못 잡으므로
+#    64비트 지각 해시의 해밍 거리로 이전 판정을 찾는다
+#  - 인덱스: 64비트를 16비트 4조각으로 나눈 multi-index hash (조각별 정렬 배열 + searchsorted)
+#    비둘기집 원리: 거리 r 이내면 적어도 한 조각은 r//4 비트 이내로 같음 → 후보만 전체 거리 계산
+#  - 저장: 판정마다 ImageHash 행으로 DB에 기록 (백그라운드 스레드가 묶어서 insert)
+#    시작 시 DB에서 한 번에 읽어 정렬만 하므로 100만 행도 수 초 안에 재구성
+#    다른 워커가 넣은 행은 주기적으로 id > 마지막 id 만 읽어 이어붙임
+#  - 재사용 조건: 전체 프레임 해시는 얼굴만 바꾸거나 일부만 고친 합성본에도 거의 그대로이므로
+#    거리만으로는 재사용하지 않음 (reusable): Fake는 그대로, NoFace는 지금도 얼굴이 없을 때,
+#    Real/Uncertain은 얼굴 영역 해시까지 가까울 때만
+import os
+import time
+import queue
+import logging
+import threading
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+LABELS = ("Fake", "Real", "Uncertain", "NoFace")
+LABEL_CODES = {label: i for i, label in enumerate(LABELS)}
+
+NEAR_DUP_SYNC_SECONDS = 2.0    # 다른 워커가 추가한 행을 가져오는 주기 (= 내 insert가 인덱스에 보이는 지연)
+NEAR_DUP_MERGE_EVERY = 4096    # 최근 추가분이 이만큼 쌓이면 본 인덱스에 병합 (그 전까지는 선형 탐색)
+NEAR_DUP_LOAD_CHUNK = 200_000  # 재구성 시 DB에서 한 번에 가져올 행 수
+
+
+# =========================
+# ✅ 지각 해시
+# =========================
+def _bits_to_int(bits: np.ndarray) -> int:
+    return int.from_bytes(np.packbits(bits.astype(np.uint8).ravel()).tobytes(), "big")
+
+
+def phash(img_bgr: np.ndarray) -> int:
+    """32x32 그레이 → DCT → 저주파 8x8 계수가 중앙값보다 큰지 (64비트)"""
+    gray = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2GRAY) if img_bgr.ndim == 3 else img_bgr
+    small = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:8, :8]
+    return _bits_to_int(low > np.median(low))
+
+
+def dhash(img_bgr: np.ndarray) -> int:
+    """9x8 그레이에서 가로로 이웃한 픽셀 밝기 비교 (64비트). pHash보다 빠르고 조금 덜 견고"""
+    gray = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2GRAY) if img_bgr.ndim == 3 else img_bgr
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    return _bits_to_int(small[:, 1:] > small[:, :-1])
+
+
+HASHES = {"phash": phash, "dhash": dhash}
+
+
+def to_signed(h: int) -> int:
+    """uint64 → int64 (SQLite INTEGER는 부호 있는 64비트)"""
+    return h - (1 << 64) if h >= (1 << 63) else h
+
+
+# =========================
+# ✅ Multi-index hash
+# =========================
+_POPCOUNT8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+_CHUNKS = 4
+_CHUNK_BITS = 16
+
+
+def _hamming(hashes: np.ndarray, q: int) -> np.ndarray:
+    x = np.bitwise_xor(hashes, np.uint64(q))
+    return _POPCOUNT8[x.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+
+def _chunk(values, j):
+    return ((values >> np.uint64(j * _CHUNK_BITS)) & np.uint64(0xFFFF)).astype(np.uint16)
+
+
+def _neighbors16(v: int, r: int) -> list:
+    """16비트 값 v에서 r비트 이내로 다른 값들 (r은 0~2 정도만 실용적)"""
+    out = {v}
+    frontier = {v}
+    for _ in range(r):
+        frontier = {x ^ (1 << b) for x in frontier for b in range(_CHUNK_BITS)}
+        out |= frontier
+    return sorted(out)
+
+
+def _face_arrays(face_hashes, n):
+    """얼굴 해시 목록(None 포함) → (uint64 배열, 유무 bool 배열)"""
+    if face_hashes is None:
+        return np.zeros(n, np.uint64), np.zeros(n, bool)
+    has = np.fromiter((f is not None for f in face_hashes), dtype=bool, count=n)
+    return np.fromiter((f or 0 for f in face_hashes), dtype=np.uint64, count=n), has
+
+
+class _Snapshot:
+    """읽기 전용 인덱스 상태. 추가/병합 시 새 스냅샷으로 통째로 교체 (조회는 락 없이)"""
+    __slots__ = ("ids", "hashes", "labels", "scores", "faces", "has_face", "sorted_chunks", "recent")
+
+    def __init__(self, ids, hashes, labels, scores, faces, has_face, recent=None):
+        self.ids, self.hashes, self.labels, self.scores = ids, hashes, labels, scores
+        self.faces, self.has_face = faces, has_face
+        self.sorted_chunks = []
+        for j in range(_CHUNKS):
+            chunk = _chunk(hashes, j)
+            order = np.argsort(chunk, kind="stable")
+            self.sorted_chunks.append((chunk[order], order))
+        self.recent = recent or []   # [(id, hash, label_code, score, face_hash|None)] — 병합 전 최근 추가분
+
+
+class MultiIndexHash:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snap = _Snapshot(np.empty(0, np.int64), np.empty(0, np.uint64),
+                               np.empty(0, np.uint8), np.empty(0, np.float32),
+                               np.empty(0, np.uint64), np.empty(0, bool))
+        self.last_id = 0
+
+    def __len__(self):
+        snap = self._snap
+        return len(snap.ids) + len(snap.recent)
+
+    def build(self, ids, hashes, labels, scores, face_hashes=None):
+        """ids/hashes(uint64)/labels(코드)/scores 배열 + 얼굴 해시 목록(없으면 None)으로 통째로 재구성"""
+        faces, has_face = _face_arrays(face_hashes, len(ids))
+        snap = _Snapshot(np.asarray(ids, np.int64), np.asarray(hashes, np.uint64),
+                         np.asarray(labels, np.uint8), np.asarray(scores, np.float32), faces, has_face)
+        with self._lock:
+            self._snap = snap
+            self.last_id = int(snap.ids.max()) if len(snap.ids) else 0
+
+    def add_many(self, rows):
+        """rows: [(id, hash(uint64 int), label_code, score[, face_hash(uint64 int)|None])]"""
+        if not rows:
+            return
+        rows = [tuple(r) + (None,) * (5 - len(r)) for r in rows]
+        with self._lock:
+            snap = self._snap
+            recent = snap.recent + rows
+            self.last_id = max(self.last_id, max(r[0] for r in rows))
+            if len(recent) < NEAR_DUP_MERGE_EVERY:
+                new = _Snapshot.__new__(_Snapshot)
+                new.ids, new.hashes, new.labels, new.scores = snap.ids, snap.hashes, snap.labels, snap.scores
+                new.faces, new.has_face = snap.faces, snap.has_face
+                new.sorted_chunks, new.recent = snap.sorted_chunks, recent
+                self._snap = new
+                return
+            ids, hashes, labels, scores, face_hashes = zip(*recent)
+            faces, has_face = _face_arrays(face_hashes, len(ids))
+            self._snap = _Snapshot(
+                np.concatenate([snap.ids, np.array(ids, np.int64)]),
+                np.concatenate([snap.hashes, np.array(hashes, np.uint64)]),
+                np.concatenate([snap.labels, np.array(labels, np.uint8)]),
+                np.concatenate([snap.scores, np.array(scores, np.float32)]),
+                np.concatenate([snap.faces, faces]),
+                np.concatenate([snap.has_face, has_face]),
+            )
+
+    def query(self, h: int, max_distance: int):
+        """가장 가까운 항목 → {"id", "label", "score", "distance", "face_hash"(없으면 None)} | None"""
+        snap = self._snap
+        best = None
+
+        if len(snap.ids):
+            r = max_distance // _CHUNKS
+            q = np.array([h], dtype=np.uint64)
+            parts = []
+            for j, (values, order) in enumerate(snap.sorted_chunks):
+                for v in _neighbors16(int(_chunk(q, j)[0]), r):
+                    lo = np.searchsorted(values, v, side="left")
+                    hi = np.searchsorted(values, v, side="right")
+                    if hi > lo:
+                        parts.append(order[lo:hi])
+            if parts:
+                cand = np.unique(np.concatenate(parts))
+                dist = _hamming(snap.hashes[cand], h)
+                k = int(np.argmin(dist))
+                if dist[k] <= max_distance:
+                    i = cand[k]
+                    face = int(snap.faces[i]) if snap.has_face[i] else None
+                    best = (int(dist[k]), int(snap.ids[i]), int(snap.labels[i]), float(snap.scores[i]), face)
+
+        if snap.recent:
+            rec = np.array([r[1] for r in snap.recent], dtype=np.uint64)
+            dist = _hamming(rec, h)
+            k = int(np.argmin(dist))
+            if dist[k] <= max_distance and (best is None or dist[k] < best[0]):
+                rid, _, code, score, face = snap.recent[k]
+                best = (int(dist[k]), rid, code, score, face)
+
+        if best is None:
+            return None
+        distance, row_id, code, score, face = best
+        return {"id": row_id, "label": LABELS[code], "score": score, "distance": distance, "face_hash": face}
+
+
+def reusable(match: dict, face_hash, has_face: bool, max_distance: int) -> bool:
+    """
+    전체 프레임 해시로 찾은 match의 판정을 추론 없이 재사용해도 되는지
+    face_hash: 지금 이미지의 얼굴 영역 해시(얼굴이 정확히 하나일 때만, 아니면 None), has_face: 얼굴 검출 여부
+      - Fake: 재사용 (고친 사본이어도 원본이 이미 합성본)
+      - NoFace: 지금도 얼굴이 없을 때만 (얼굴을 붙여 넣은 사본 방지)
+      - Real/Uncertain: 양쪽 얼굴 해시가 있고 max_distance 이내일 때만 (얼굴만 바꾼 사본 방지)
+    """
+    label = match["label"]
+    if label == "Fake":
+        return True
+    if label == "NoFace":
+        return not has_face
+    if face_hash is None or match.get("face_hash") is None:
+        return False
+    return bin((face_hash ^ match["face_hash"]) & ((1 << 64) - 1)).count("1") <= max_distance
+
+
+# =========================
+# ✅ DB 연동 (재구성 / 기록 / 다른 워커 행 동기화)
+# =========================
+index = MultiIndexHash()
+_app = None
+_fingerprint_fn = None
+_ready = False
+_pending = queue.Queue()
+_sync_pid = None
+_sync_lock = threading.Lock()
+
+
+def ready() -> bool:
+    return _ready
+
+
+def _load_rows(fingerprint, after_id=0):
+    """ImageHash에서 id > after_id 행을 청크 단위로 읽어 (ids, hashes, labels, scores) 배열 + 얼굴 해시 목록"""
+    from .models import db, ImageHash
+
+    stmt = (db.select(ImageHash.id, ImageHash.phash, ImageHash.label, ImageHash.score, ImageHash.face_hash)
+            .where(ImageHash.fingerprint == fingerprint, ImageHash.id > after_id)
+            .order_by(ImageHash.id))
+    result = db.session.execute(stmt.execution_options(yield_per=NEAR_DUP_LOAD_CHUNK))
+    ids, hashes, labels, scores, faces = [], [], [], [], []
+    for rows in result.partitions():
+        ids.append(np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows)))
+        hashes.append(np.fromiter((r[1] for r in rows), dtype=np.int64, count=len(rows)).view(np.uint64))
+        labels.append(np.fromiter((LABEL_CODES.get(r[2], 0) for r in rows), dtype=np.uint8, count=len(rows)))
+        scores.append(np.fromiter((r[3] or 0.0 for r in rows), dtype=np.float32, count=len(rows)))
+        faces.extend(None if r[4] is None else r[4] & ((1 << 64) - 1) for r in rows)
+    if not ids:
+        return (np.empty(0, np.int64), np.empty(0, np.uint64), np.empty(0, np.uint8), np.empty(0, np.float32), [])
+    return np.concatenate(ids), np.concatenate(hashes), np.concatenate(labels), np.concatenate(scores), faces
+
+
+def rebuild():
+    """DB 전체에서 인덱스 재구성 (현재 모델 지문의 행만)"""
+    global _ready
+    if _app is None:
+        return
+    t0 = time.perf_counter()
+    from .models import db
+
+    with _app.app_context():
+        ids, hashes, labels, scores, faces = _load_rows(_fingerprint_fn())
+        # 마스터에서 연 DB 연결을 fork된 워커들이 같이 쓰지 않도록 정리
+        db.session.remove()
+        db.engine.dispose()
+    index.build(ids, hashes, labels, scores, faces)
+    _ready = True
+    logger.info(f"[near_dup] 인덱스 재구성: {len(ids)}행, {time.perf_counter() - t0:.2f}s")
+
+
+def record(h: int, label: str, score: float, face_hash: int = None):
+    """판정 결과 기록 예약 (백그라운드에서 DB insert → 다음 동기화 때 인덱스 반영)"""
+    if _app is None or label not in LABEL_CODES:
+        return
+    _ensure_sync_thread()
+    # 지문은 판정 시점 것으로 (flush 전에 모델이 바뀌어도 이전 모델 판정이 새 지문으로 저장되지 않게)
+    face = to_signed(face_hash) if face_hash is not None else None
+    _pending.put((to_signed(h), label, float(score), face, _fingerprint_fn()))
+
+
+def _flush_pending():
+    from .models import db, ImageHash
+
+    rows = []
+    while True:
+        try:
+            rows.append(_pending.get_nowait())
+        except queue.Empty:
+            break
+    if rows:
+        db.session.add_all([ImageHash(phash=h, label=label, score=score, face_hash=face, fingerprint=fingerprint)
+                            for h, label, score, face, fingerprint in rows])
+        db.session.commit()
+
+
+def _sync_loop():
+    while True:
+        time.sleep(NEAR_DUP_SYNC_SECONDS)
+        try:
+            with _app.app_context():
+                _flush_pending()
+                ids, hashes, labels, scores, faces = _load_rows(_fingerprint_fn(), after_id=index.last_id)
+            if len(ids):
+                index.add_many(list(zip(ids.tolist(), hashes.tolist(), labels.tolist(), scores.tolist(), faces)))
+        except Exception:
+            logger.exception("[near_dup] 동기화 실패")
+
+
+def _ensure_sync_thread():
+    # fork된 워커마다 자기 스레드 (마스터에서 만든 스레드는 fork를 넘지 못함)
+    global _sync_pid
+    if _sync_pid == os.getpid():
+        return
+    with _sync_lock:
+        if _sync_pid != os.getpid():
+            threading.Thread(target=_sync_loop, name="near-dup-sync", daemon=True).start()
+            _sync_pid = os.getpid()
+
+
+def init_app(app, fingerprint_fn):
+    """
+    fingerprint_fn: 현재 모델 지문을 돌려주는 함수 (지문이 다른 행은 읽지 않음)
+    인덱스는 gunicorn 마스터(preload) 또는 첫 요청에서 재구성. flask db 같은 CLI에서는 만들지 않음
+    """
+    global _app, _fingerprint_fn
+    _app, _fingerprint_fn = app, fingerprint_fn
+
+    @app.before_request
+    def _near_dup_startup():
+        global _ready
+        if not _ready:
+            with _sync_lock:
+                if not _ready:
+                    try:
+                        rebuild()
+                    except Exception:
+                        # 테이블이 아직 없는 등: 빈 인덱스로 계속 (요청은 막지 않음)
+                        logger.exception("[near_dup] 인덱스 재구성 실패 → 빈 인덱스로 시작")
+                        _ready = True
+        _ensure_sync_thread()
+
+
+def preload():
+    """gunicorn when_ready에서 호출: 마스터에서 재구성 → 워커는 fork로 배열을 공유"""
+    if _app is not None and not _ready:
+        try:
+            rebuild()
+        except Exception:
+            logger.exception("[near_dup] 인덱스 재구성 실패 (첫 요청에서 다시 시도)")
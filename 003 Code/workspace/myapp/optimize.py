@@ -0,0 +1,73 @@
+# optimize.py — 최적화 실행 모드 (channels_last / inference_mode / torch.compile / 워밍업)
+#  - ai.py의 OPTIMIZED_MODE=True일 때 forward용 모델(_runtime_model)이 convert_model() → compile_model() 두 단계를 거침
+#  - 켜기 전에 eager 모델과 수치가 같은지 verify()로 확인하고, 다르면 eager로 되돌린다
+#  - forward가 필요 없는 단계(convert_model, reference_copy)는 --preload 마스터에서 한 번만 해서
+#    워커들이 결과 페이지를 copy-on-write로 공유하게 하고, 워커는 compile/verify/warmup만 한다
+import copy
+import time
+
+import torch
+
+
+def is_eager(model) -> bool:
+    """TorchScript/torch.export 결과물이 아닌 일반 nn.Module인지 (compile/메모리 포맷 변환 대상)"""
+    return isinstance(model, torch.nn.Module) and not isinstance(model, torch.jit.ScriptModule)
+
+
+def convert_model(model, channels_last=True):
+    """channels_last: 가중치를 NHWC로 (CPU oneDNN conv가 더 빠름). 제자리 변환, forward 없음"""
+    # frozen TorchScript는 가중치가 상수라 변환 효과가 없지만 입력만 NHWC여도 이득이 있음
+    if channels_last and is_eager(model):
+        model = model.to(memory_format=torch.channels_last)
+    return model
+
+
+def compile_model(model, compile_mode=None):
+    """
+    compile_mode: None이면 torch.compile 안 함, 아니면 "default" / "reduce-overhead" / "max-autotune"
+    """
+    if compile_mode and is_eager(model):
+        model = torch.compile(model, mode=compile_mode, dynamic=True)
+    return model
+
+
+def prepare_input(batch: torch.Tensor, channels_last=True) -> torch.Tensor:
+    if channels_last and batch.dim() == 4:
+        return batch.contiguous(memory_format=torch.channels_last)
+    return batch
+
+
+def grad_context(optimized: bool):
+    """최적화 모드는 inference_mode (버전 카운터/autograd 메타데이터까지 생략)"""
+    return torch.inference_mode() if optimized else torch.no_grad()
+
+
+def reference_copy(model):
+    """verify용 eager 사본. 최적화가 모델을 제자리에서 바꾸기 전에 떠 둔다"""
+    return copy.deepcopy(model) if is_eager(model) else None
+
+
+def verify(reference, optimized, input_size, channels_last=True, batch=4, atol=1e-3):
+    """같은 입력에 대해 eager 대비 logit 최대 오차. (통과 여부, 오차)"""
+    x = torch.randn(batch, 3, input_size, input_size)
+    with torch.inference_mode():
+        ref = reference(x)
+        out = optimized(prepare_input(x, channels_last))
+    diff = float((ref.float() - out.float()).abs().max())
+    return diff <= atol, diff
+
+
+def warmup(forward, batch_sizes, input_size, repeats=2):
+    """
+    설정된 배치 크기들로 미리 forward (lazy 초기화/oneDNN 커널 선택/compile 그래프 생성)
+    forward: [N,3,H,W] 텐서를 받는 함수. 반환: {배치크기: 마지막 실행 ms}
+    """
+    timings = {}
+    for n in batch_sizes:
+        x = torch.zeros(n, 3, input_size, input_size)
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            forward(x)
+            timings[n] = round((time.perf_counter() - t0) * 1000.0, 2)
+    return timings
+
@@ -0,0 +1,100 @@
+# preprocess.py — 모델 입력 전처리 (cv2 리사이즈 1회 + NumPy 정규화, PIL 왕복 없음)
+#  기존: BGR → RGB 복사 → PIL → exif_transpose → Resize → ToTensor → Normalize (원본 크기 복사 여러 번)
+#  현재: BGR 원본 → cv2.resize(300x300) → 채널 뒤집기+정규화를 미리 잡아 둔 float 텐서에 바로 기록
+#  EXIF 회전은 cv2.imread/imdecode(IMREAD_COLOR)가 디코딩 때 이미 적용한다.
+#  큰 JPEG은 decode_reduced()로 1/2·1/4·1/8 크기로 바로 디코딩 (libjpeg DCT 축소, 원본 크기 버퍼를 만들지 않음)
+#  기존 torchvision 파이프라인과의 오차 확인: python scripts/check_preprocess.py --images <샘플 폴더>
+import io
+
+import cv2
+import numpy as np
+import torch
+from PIL import Image
+
+MEAN = (0.485, 0.456, 0.406)   # RGB
+STD = (0.229, 0.224, 0.225)
+
+# (x / 255 - mean) / std  ==  x * SCALE + BIAS  (RGB 채널 순서)
+_SCALE = np.array([1.0 / (255.0 * s) for s in STD], dtype=np.float32)
+_BIAS = np.array([-m / s for m, s in zip(MEAN, STD)], dtype=np.float32)
+
+_REDUCED_FLAGS = {2: cv2.IMREAD_REDUCED_COLOR_2, 4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8}
+
+
+def header_size(data: bytes):
+    """헤더만 읽어 (포맷, 가로, 세로). 픽셀은 디코딩하지 않음. 실패 시 (None, 0, 0)"""
+    try:
+        with Image.open(io.BytesIO(data)) as im:
+            return im.format, im.width, im.height
+    except Exception:
+        return None, 0, 0
+
+
+def pick_reduction(width: int, height: int, min_short: int, min_long: int = 0) -> int:
+    """축소 디코딩 배율(1/2/4/8) 중 결과가 짧은 변 >= min_short, 긴 변 >= min_long 을 지키는 가장 큰 값"""
+    short, long_ = min(width, height), max(width, height)
+    for factor in (8, 4, 2):
+        if -(-short // factor) >= min_short and -(-long_ // factor) >= min_long:
+            return factor
+    return 1
+
+
+def decode_reduced(data: bytes, min_short: int, min_long: int = 0):
+    """
+    인코딩된 바이트 → (BGR 이미지, 원본 대비 배율). 실패 시 (None, 1.0)
+    JPEG만 축소 디코딩 (다른 포맷은 IMREAD_REDUCED_*가 전체 디코딩 후 리사이즈라 이득이 없음)
+    """
+    buf = np.frombuffer(data, dtype=np.uint8)
+    if buf.size == 0:
+        return None, 1.0
+    fmt, w, h = header_size(data)
+    factor = pick_reduction(w, h, min_short, min_long) if fmt == "JPEG" else 1
+    if factor == 1:
+        return cv2.imdecode(buf, cv2.IMREAD_COLOR), 1.0
+    img = cv2.imdecode(buf, _REDUCED_FLAGS[factor])
+    if img is None:
+        return None, 1.0
+    # 실제 배율은 디코딩된 크기로 계산 (libjpeg은 올림 처리, EXIF 회전 시 가로/세로가 바뀜)
+    return img, max(img.shape[:2]) / float(max(w, h))
+
+
+def resize_bgr(img_bgr: np.ndarray, size: int) -> np.ndarray:
+    """
+    size x size로 리사이즈. 축소는 INTER_AREA(PIL antialias bilinear에 가까움), 확대는 INTER_LINEAR.
+    한 축은 줄고 다른 축은 느는 경우(길쭉한 이미지)는 축별로: 줄어드는 축을 먼저 INTER_AREA, 나머지를 INTER_LINEAR
+    """
+    h, w = img_bgr.shape[:2]
+    if h == size and w == size:
+        return img_bgr
+    if h >= size and w >= size:
+        return cv2.resize(img_bgr, (size, size), interpolation=cv2.INTER_AREA)
+    if h <= size and w <= size:
+        return cv2.resize(img_bgr, (size, size), interpolation=cv2.INTER_LINEAR)
+    # 축소 축 앨리어싱 방지 (한 번에 INTER_LINEAR로 줄이면 픽셀을 건너뜀)
+    shrunk = cv2.resize(img_bgr, (size, h) if w > size else (w, size), interpolation=cv2.INTER_AREA)
+    return cv2.resize(shrunk, (size, size), interpolation=cv2.INTER_LINEAR)
+
+
+def normalize_into(resized_bgr: np.ndarray, out: torch.Tensor) -> torch.Tensor:
+    """uint8 BGR [H,W,3] → out[3,H,W] (float32, RGB, ImageNet 정규화). out을 제자리에서 채워 반환"""
+    dst = out.numpy()
+    for c in range(3):
+        # RGB 채널 c ← BGR 채널 2-c
+        np.multiply(resized_bgr[:, :, 2 - c], _SCALE[c], out=dst[c], casting="unsafe")
+        dst[c] += _BIAS[c]
+    return out
+
+
+def to_tensor(img_bgr: np.ndarray, size: int = 300, out: torch.Tensor = None) -> torch.Tensor:
+    """BGR 이미지 한 장 → [3,size,size] 정규화 텐서 (out을 주면 그 버퍼에 기록)"""
+    if out is None:
+        out = torch.empty(3, size, size, dtype=torch.float32)
+    return normalize_into(resize_bgr(img_bgr, size), out)
+
+
+def to_batch(images_bgr: list, size: int = 300) -> torch.Tensor:
+    """BGR 이미지 여러 장 → [N,3,size,size] 텐서 하나 (torch.stack 없이 슬롯마다 직접 기록)"""
+    batch = torch.empty(len(images_bgr), 3, size, size, dtype=torch.float32)
+    for i, img in enumerate(images_bgr):
+        to_tensor(img, size, out=batch[i])
+    return batch
@@ -0,0 +1,132 @@
+# quantize.py — CPU 추론 정밀도 모드 (fp32 / bf16 autocast / int8 정적 양자화)
+#  - int8: FX 그래프 모드 PTQ. 로컬 샘플 폴더로 calibration 후 TorchScript 아티팩트 + manifest 저장
+#          → 서버 시작 시에는 아티팩트만 읽음 (calibration 재실행 없음)
+#  - bf16: 가중치는 fp32 그대로, forward만 autocast (CPU가 지원할 때만)
+#  - drift_report: 라벨 폴더(<dir>/Fake, <dir>/Real)로 fp32 대비 일치율/정확도/지연 비교
+import os
+import time
+import contextlib
+
+import torch
+import torch.nn.functional as F
+
+from .artifact import load_artifact as _load_artifact
+
+PRECISIONS = ("fp32", "bf16", "int8")
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+
+def bf16_supported() -> bool:
+    try:
+        return bool(torch.backends.mkldnn.is_available() and torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except Exception:
+        return False
+
+
+def autocast_context(precision: str):
+    """bf16이면 CPU autocast, 그 외에는 아무것도 안 하는 컨텍스트"""
+    if precision == "bf16" and bf16_supported():
+        return torch.autocast("cpu", dtype=torch.bfloat16)
+    return contextlib.nullcontext()
+
+
+def list_images(folder: str) -> list:
+    out = []
+    for root, _, names in os.walk(folder):
+        for name in sorted(names):
+            if name.lower().endswith(IMAGE_EXTS):
+                out.append(os.path.join(root, name))
+    return sorted(out)
+
+
+# =========================
+# ✅ INT8 정적 양자화
+# =========================
+def quantize_int8(model: torch.nn.Module, calib_batches, input_size=300, backend="x86"):
+    """
+    model(fp32, eval) → calibration → int8 TorchScript 모듈
+    calib_batches: [N,3,H,W] 텐서를 내는 iterable
+    """
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+
+    torch.backends.quantized.engine = backend
+    model = model.cpu().eval()
+    example = torch.randn(1, 3, input_size, input_size)
+    prepared = prepare_fx(model, get_default_qconfig_mapping(backend), (example,))
+
+    seen = 0
+    with torch.inference_mode():
+        for batch in calib_batches:
+            prepared(batch)
+            seen += batch.shape[0]
+    if seen == 0:
+        raise RuntimeError("calibration 이미지가 없습니다")
+
+    quantized = convert_fx(prepared)
+    with torch.inference_mode():
+        scripted = torch.jit.freeze(torch.jit.trace(quantized, example).eval())
+    return scripted, seen
+
+
+def load_artifact(artifact_path: str, source_path: str = None, backend="x86"):
+    """int8 아티팩트 로드 (양자화 엔진을 맞춘 뒤 artifact.load_artifact)"""
+    torch.backends.quantized.engine = backend
+    return _load_artifact(artifact_path, source_path)
+
+
+# =========================
+# ✅ 정확도 드리프트 리포트
+# =========================
+def _probs(model, batch, precision):
+    with torch.inference_mode(), autocast_context(precision):
+        return F.softmax(model(batch).float(), dim=1)
+
+
+def drift_report(reference, candidate, samples, precision="int8", fake_idx=0, batch_size=16):
+    """
+    reference: fp32 모델, candidate: 비교할 모델(같은 입력)
+    samples: [(tensor[3,H,W], true_label_idx|None), ...]
+    반환: 일치율, 각 정확도, 확률 차이, 이미지당 지연(ms)
+    """
+    n = agree = 0
+    ref_correct = cand_correct = labeled = 0
+    diffs = []
+    t_ref = t_cand = 0.0
+
+    for start in range(0, len(samples), batch_size):
+        chunk = samples[start:start + batch_size]
+        batch = torch.stack([t for t, _ in chunk])
+
+        t0 = time.perf_counter()
+        ref = _probs(reference, batch, "fp32")
+        t1 = time.perf_counter()
+        cand = _probs(candidate, batch, precision)
+        t2 = time.perf_counter()
+        t_ref += t1 - t0
+        t_cand += t2 - t1
+
+        ref_pred = ref.argmax(dim=1)
+        cand_pred = cand.argmax(dim=1)
+        agree += int((ref_pred == cand_pred).sum())
+        diffs.extend((ref[:, fake_idx] - cand[:, fake_idx]).abs().tolist())
+        for (_, y), rp, cp in zip(chunk, ref_pred.tolist(), cand_pred.tolist()):
+            if y is not None:
+                labeled += 1
+                ref_correct += int(rp == y)
+                cand_correct += int(cp == y)
+        n += len(chunk)
+
+    diffs.sort()
+    return {
+        "precision": precision,
+        "images": n,
+        "agreement": agree / n if n else 0.0,
+        "accuracy_fp32": ref_correct / labeled if labeled else None,
+        "accuracy_candidate": cand_correct / labeled if labeled else None,
+        "fake_prob_abs_diff_mean": sum(diffs) / len(diffs) if diffs else 0.0,
+        "fake_prob_abs_diff_p99": diffs[int(0.99 * (len(diffs) - 1))] if diffs else 0.0,
+        "fake_prob_abs_diff_max": diffs[-1] if diffs else 0.0,
+        "ms_per_image_fp32": 1000.0 * t_ref / n if n else 0.0,
+        "ms_per_image_candidate": 1000.0 * t_cand / n if n else 0.0,
+    }
@@ -1,14 +1,19 @@
-from flask import Blueprint, request, Response, send_from_directory, render_template, url_for, session, jsonify, current_app
+from flask import Blueprint, request, Response, send_file, send_from_directory, render_template, url_for, session, jsonify, current_app, stream_with_context
 from werkzeug.utils import secure_filename
-from .utils import allowed_file, nocache, is_valid_image  # resize_image 제거 상태 유지
-from .models import Image, db, User
-from .ai import detect_and_classify
+from .utils import allowed_file, nocache, is_valid_image, save_bytes_async, wait_saved  # resize_image 제거 상태 유지
+from .models import Image, db, User, Job
+from . import jobs, video, model_registry, explain
+from .embeddings import store as embedding_store, EMBED_STORE_UPLOADS, SIMILAR_TOP_K_MAX
+from .ai import detect_and_classify, iter_classify_batch, classify_async, analyze_faces, analyze_tiles, embed_and_classify, get_stats as get_ai_stats
 from .models import Image as ImageModel
-import os, uuid, json, jwt
+import os, uuid, json, jwt, tempfile, hmac
+from concurrent.futures import as_completed, TimeoutError as FutureTimeout
 from flask_cors import CORS
 from flask_login import login_required, current_user
 from .app_auth import token_required
-import logging, requests
+from .fetch import fetch_image, remember as remember_url, url_cache
+from .async_fetch import iter_fetch
+import logging
 from datetime import datetime
 
 log_dir = "/home/ubuntu/deepfake-detector/logs"
@@ -56,12 +61,12 @@ def upload_app(current_user_id):  # <- token_required 데코레이터가 user_id
         if is_valid_image(file):
             logger.debug("이미지유효성 검사 통과")
             try:
-                logger.debug(f"파일 저장 위치: {filepath}")
-                file.save(filepath)
-                logger.debug("파일 저장 완료")
+                data = file.read()
+                logger.debug(f"파일 저장 위치(비동기): {filepath}")
+                saved = save_bytes_async(data, filepath)
 
                 logger.debug(f"detect_and_classify() 호출 준비: {filepath}")
-                result_label, score, _ = detect_and_classify(filepath)
+                result_label, score, _ = detect_and_classify(data)
                 logger.debug(f"분석결과: label={result_label}, score={score:.4f}")
 
                 if result_label == "NoFace":
@@ -71,6 +76,10 @@ def upload_app(current_user_id):  # <- token_required 데코레이터가 user_id
                 else:
                     result = f"[{result_label}] 이미지 '{original_filename}' 분석 완료 (score: {score:.4f})"
 
+                # 파일이 실제로 저장된 뒤에만 레코드/URL을 만든다
+                if not wait_saved(saved):
+                    return Response(json.dumps({"error": "파일 저장 실패"}, ensure_ascii=False), mimetype='application/json'), 500
+
                 new_entry = Image(file_path=filepath, result=result, user_id=user_id)
                 db.session.add(new_entry)
                 db.session.commit()
@@ -122,9 +131,10 @@ def upload_web():
         filepath = os.path.join(upload_folder, unique_filename)
 
         try:
-            file.save(filepath)
+            data = file.read()
+            saved = save_bytes_async(data, filepath)
 
-            result_label, score, _ = detect_and_classify(filepath)
+            result_label, score, _ = detect_and_classify(data)
 
             if result_label == "NoFace":
                 result = "얼굴을 인식할 수 없습니다."
@@ -133,6 +143,12 @@ def upload_web():
             else:
                 result = f"{result_label} (score: {score:.4f})"
 
+            if not wait_saved(saved):
+                return render_template("result.html",
+                                       error="파일 저장 중 오류가 발생했습니다.",
+                                       result=None,
+                                       file_path=None)
+
             new_entry = Image(file_path=filepath, result=result, user_id=current_user.id)
             db.session.add(new_entry)
             db.session.commit()
@@ -184,10 +200,12 @@ def delete_image(image_id):
         return Response(json.dumps({"error": "이미지를 찾을 수 없습니다."}, ensure_ascii=False), mimetype='application/json'), 404
 
     file_path = image.file_path
-    try:
-        os.remove(file_path)
-    except FileNotFoundError:
-        pass
+    for path in (file_path, image.heatmap_path):
+        try:
+            if path:
+                os.remove(path)
+        except FileNotFoundError:
+            pass
 
     db.session.delete(image)
     db.session.commit()
@@ -202,6 +220,42 @@ def delete_image(image_id):
     return Response(json.dumps({"message": "삭제가 완료 되었습니다", "images": images_data}, ensure_ascii=False), mimetype='application/json'), 200
 
 
+# ============================
+#  Grad-CAM 설명 히트맵 (이미 판정된 내 이미지, 판정 경로와 별개)
+#  GET /explain/<image_id>          히트맵 PNG. 없으면 생성해서 반환 (최대 EXPLAIN_TIMEOUT초, 넘으면 202)
+#  GET /explain/<image_id>?wait=0   없으면 백그라운드 생성만 예약하고 202 → 나중에 같은 URL로 다시 요청
+# ============================
+@web_bp.route('/explain/<int:image_id>')
+@login_required
+def explain_image(image_id):
+    if not explain.EXPLAIN_ENABLED:
+        return jsonify({"ok": False, "error": "설명 히트맵이 비활성화되어 있습니다."}), 404
+    record = db.session.get(Image, image_id)
+    if record is None or record.user_id != current_user.id:
+        return jsonify({"ok": False, "error": "이미지를 찾을 수 없습니다."}), 404
+
+    path = explain.cached_heatmap(record)
+    if path is None:
+        pending = {"ok": True, "status": "pending", "url": url_for('web.explain_image', image_id=image_id)}
+        fut = explain.submit(current_app._get_current_object(), image_id)
+        if request.args.get("wait", "1").lower() in ['0', 'false', 'off', 'no']:
+            return jsonify(pending), 202
+        try:
+            path = fut.result(timeout=explain.EXPLAIN_TIMEOUT)
+        except FutureTimeout:
+            return jsonify(pending), 202
+        except explain.NotExplainable as e:
+            return jsonify({"ok": False, "error": str(e)}), 422
+        except Exception as e:
+            current_app.logger.exception("explain_image 예외")
+            return jsonify({"ok": False, "error": f"히트맵 생성 실패: {e}"}), 500
+
+    resp = send_file(path, mimetype="image/png", max_age=3600)
+    resp.cache_control.public = False
+    resp.cache_control.private = True
+    return resp
+
+
 @web_bp.route('/')
 @nocache
 def index():
@@ -247,8 +301,10 @@ def extension():
 # ============================
 @main_bp.route('/detect-upload', methods=['POST'])
 def detect_upload():
-    img_path = None
+    img_data = None
     saved_rel_path = None  # static 기준 상대경로
+    saved = None           # 비동기 저장 Future (새로 저장하는 경우만)
+    remember = None        # 저장이 끝나면 미리보기를 기억할 URL
     try:
         # 1) 파일 업로드
         if "image" in request.files:
@@ -268,8 +324,8 @@ def detect_upload():
             os.makedirs(save_dir, exist_ok=True)
 
             filepath = os.path.join(save_dir, filename)
-            file.save(filepath)
-            img_path = filepath
+            img_data = file.read()
+            saved = save_bytes_async(img_data, filepath)
             saved_rel_path = f"uploads/{date_folder}/{filename}"  # static 기준
 
         # 2) URL 업로드(FormData: image_url)
@@ -279,41 +335,55 @@ def detect_upload():
                 return jsonify({"ok": False, "error": "이미지 URL이 없습니다"}), 400
 
             try:
-                headers = {
-                    "User-Agent": "Mozilla/5.0",
-                    # 필요하면 Referer 도메인 조건부 추가
-                    # "Referer": img_url_origin
-                }
-                r = requests.get(img_url, headers=headers, timeout=8)
-                r.raise_for_status()
+                # 세션 재사용 + 크기 제한 + ETag/Last-Modified 조건부 재검증 (fetch.py)
+                fetched = fetch_image(img_url)
             except Exception as e:
                 return jsonify({"ok": False, "error": f"이미지 다운로드 실패: {e}"}), 400
 
-            ext = guess_ext_from_headers_or_url(r.headers.get("Content-Type"), img_url)  # 아래 util로 커버
-            filename = f"url_{uuid.uuid4().hex}{ext}"
+            img_data = fetched.content
+            cached_preview = fetched.meta.get("preview") if fetched.from_cache else None
+            if cached_preview and os.path.exists(os.path.join(current_app.static_folder, cached_preview)):
+                # 바뀌지 않은 URL → 이전에 저장한 미리보기 재사용 (추론은 결과 캐시에서 생략)
+                saved_rel_path = cached_preview
+            else:
+                ext = guess_ext_from_headers_or_url(fetched.content_type, img_url)  # 아래 util로 커버
+                filename = f"url_{uuid.uuid4().hex}{ext}"
 
-            date_folder = datetime.utcnow().strftime("%Y-%m-%d")
-            save_dir = os.path.join(current_app.static_folder, "uploads", date_folder)
-            os.makedirs(save_dir, exist_ok=True)
+                date_folder = datetime.utcnow().strftime("%Y-%m-%d")
+                save_dir = os.path.join(current_app.static_folder, "uploads", date_folder)
+                os.makedirs(save_dir, exist_ok=True)
 
-            filepath = os.path.join(save_dir, filename)
-            with open(filepath, "wb") as f:
-                f.write(r.content)
-            img_path = filepath
-            saved_rel_path = f"uploads/{date_folder}/{filename}"
+                filepath = os.path.join(save_dir, filename)
+                saved = save_bytes_async(img_data, filepath)
+                saved_rel_path = f"uploads/{date_folder}/{filename}"
+                remember = img_url
 
         else:
             return jsonify({"ok": False, "error": "이미지가 없습니다"}), 400
 
         # 3) 모델 분석
         try:
-            result_label, score, _ = detect_and_classify(img_path)
+            if EMBED_STORE_UPLOADS:
+                # 판정과 임베딩을 한 번의 forward로 → /api/similar 검색 대상으로 저장
+                analysis = embed_and_classify(img_data)
+                result_label, score, info = analysis["label"], analysis["score"], {}
+            else:
+                result_label, score, _, info = detect_and_classify(img_data, with_info=True)
         except Exception as e:
             current_app.logger.exception("모델 분석 중 예외")
             return jsonify({"ok": False, "error": f"모델 분석 실패: {e}"}), 500
 
-        # 4) 응답(★ preview_url 포함)
-        preview_url = url_for('static', filename=saved_rel_path, _external=True)
+        # 4) 저장이 끝난 뒤에만 미리보기 URL/임베딩 참조를 내줌 (실패하면 미리보기 없이 판정만)
+        if saved is not None and not wait_saved(saved):
+            saved_rel_path = None
+        elif remember:
+            remember_url(remember, preview=saved_rel_path)
+        if EMBED_STORE_UPLOADS and saved_rel_path and analysis["embedding"] is not None:
+            embedding_store.add(analysis["embedding"], ref=saved_rel_path, label=result_label,
+                                score=round(float(score), 4))
+
+        # 5) 응답(★ preview_url 포함)
+        preview_url = url_for('static', filename=saved_rel_path, _external=True) if saved_rel_path else None
 
         if result_label == "NoFace":
             return jsonify({"ok": True, "label": "NoFace", "result": "얼굴을 인식할 수 없습니다.",
@@ -322,13 +392,58 @@ def detect_upload():
             return jsonify({"ok": False, "label": "Error", "result": "이미지 분석 중 오류 발생",
                             "score": 0.0, "preview_url": preview_url})
         else:
+            # 근사 중복이면 저장된 판정을 그대로 쓴 것임을 표시 (near_duplicate: {"id", "distance"})
             return jsonify({"ok": True, "label": result_label, "result": result_label,
-                            "score": round(float(score), 4), "preview_url": preview_url})
+                            "score": round(float(score), 4), "preview_url": preview_url, **info})
     except Exception as e:
         current_app.logger.exception("detect_upload 함수 예외")
         return jsonify({"ok": False, "error": f"서버 내부 오류: {e}"}), 500
 
 
+# ============================
+#  다중 얼굴 분석 (얼굴별 박스/확률 + 집계 판정)
+#  POST /api/detect-faces   form: image=<파일>
+# ============================
+@main_bp.route('/detect-faces', methods=['POST'])
+def detect_faces():
+    file = request.files.get("image")
+    if not file or file.filename == "":
+        return jsonify({"ok": False, "error": "파일 이름이 없습니다"}), 400
+
+    analysis = analyze_faces(file.read())
+    if analysis["label"] == "Error":
+        return jsonify({"ok": False, "label": "Error", "result": "이미지 분석 중 오류 발생",
+                        "score": 0.0, "faces": []}), 500
+    if analysis["label"] == "NoFace":
+        return jsonify({"ok": True, "label": "NoFace", "result": "얼굴을 인식할 수 없습니다.",
+                        "score": 0.0, "faces": [], "aggregate": None})
+    return jsonify({"ok": True, "label": analysis["label"], "result": analysis["label"],
+                    "score": round(float(analysis["score"]), 4),
+                    "faces": analysis["faces"], "aggregate": analysis["aggregate"]})
+
+
+# ============================
+#  타일 분석 (큰 이미지를 겹치는 타일로 나눠 분류 + 타일 점수 맵)
+#  POST /api/detect-tiles   form: image=<파일>
+# ============================
+@main_bp.route('/detect-tiles', methods=['POST'])
+def detect_tiles():
+    file = request.files.get("image")
+    if not file or file.filename == "":
+        return jsonify({"ok": False, "error": "파일 이름이 없습니다"}), 400
+
+    analysis = analyze_tiles(file.read())
+    if analysis["label"] == "Error":
+        return jsonify({"ok": False, "label": "Error", "result": "이미지 분석 중 오류 발생",
+                        "score": 0.0, "tiles": [], "grid": None, "aggregate": None}), 500
+    if analysis["label"] == "NoFace":
+        return jsonify({"ok": True, "label": "NoFace", "result": "얼굴을 인식할 수 없습니다.",
+                        "score": 0.0, "tiles": [], "grid": None, "aggregate": None})
+    return jsonify({"ok": True, "label": analysis["label"], "result": analysis["label"],
+                    "score": round(float(analysis["score"]), 4), "tiles": analysis["tiles"],
+                    "grid": analysis["grid"], "aggregate": analysis["aggregate"]})
+
+
 # 간단 util (필요시 파일 상단에 추가)
 def guess_ext_from_headers_or_url(content_type: str | None, url: str) -> str:
     # content-type 우선
@@ -355,9 +470,42 @@ def multi_page():
     return render_template('multi.html')
 
 
+def _multi_item(filename, unique, result_label, score, no_preview):
+    if result_label == "NoFace":
+        result = "얼굴을 인식할 수 없습니다."
+    elif result_label == "Error":
+        result = "이미지 분석 중 오류 발생"
+    else:
+        result = f"{result_label} (score: {score:.4f})"
+
+    return {
+        "filename": filename,
+        "label": result_label,
+        "score": round(float(score), 4),
+        "result": result,
+        # 미리보기는 cleanup이 아니고 저장이 끝났을 때만 제공
+        "url": None if no_preview else url_for('web.uploaded_file', filename=unique, _external=True)
+    }
+
+
+def _wants_stream():
+    """stream=1 플래그 또는 Accept 헤더로 스트리밍 여부/형식 결정 → None | 'ndjson' | 'sse'"""
+    flag = (request.values.get('stream', '') or '').lower()
+    accept = request.headers.get('Accept', '')
+    if flag == 'sse' or 'text/event-stream' in accept:
+        return 'sse'
+    if flag in ['1', 'true', 'on', 'yes', 'ndjson'] or 'application/x-ndjson' in accept:
+        return 'ndjson'
+    return None
+
+
 @main_bp.route('/detect-multi', methods=['POST'])
 def detect_multi():
-    results = []
+    """
+    기본: 모든 이미지 처리 후 {"summary", "results"} JSON 한 번에 반환
+    stream=1(또는 Accept: application/x-ndjson): 이미지마다 한 줄씩 즉시 전송, 마지막 줄에 summary
+    stream=sse(또는 Accept: text/event-stream): 같은 내용을 SSE 이벤트(result/summary)로 전송
+    """
     try:
         # 폼에서 넘어온 cleanup 옵션 (체크박스 on → true)
         cleanup = (request.form.get('cleanup', '').lower() in ['1', 'true', 'on', 'yes'])
@@ -369,62 +517,347 @@ def detect_multi():
         if not files:
             return jsonify({"error": "파일이 비어있습니다."}), 400
 
-        for file in files:
+        # 1) 파일별 메타 (이름 없는 파일은 None)
+        entries = []  # (index, file, filename, unique) — 분석 대상만
+        empty = []    # 이름 없는 파일의 입력 위치
+        for idx, file in enumerate(files):
             if file.filename == "":
-                results.append({"filename": None, "label": "Error", "score": 0.0, "result": "파일 이름 없음"})
+                empty.append(idx)
                 continue
-
             filename = secure_filename(file.filename)
-            unique = f"{uuid.uuid4().hex}_{filename}"
-            filepath = os.path.join(upload_folder, unique)
-            file.save(filepath)
+            entries.append((idx, file, filename, f"{uuid.uuid4().hex}_{filename}"))
+
+        # 2) 바이트는 추론 직전에 하나씩 읽음 (cleanup이면 디스크 I/O 없음, 아니면 비동기 저장)
+        saves = {}  # entries 위치 → 저장 Future
+        def blobs():
+            for i, (_, file, _, unique) in enumerate(entries):
+                data = file.read()
+                if not cleanup:
+                    saves[i] = save_bytes_async(data, os.path.join(upload_folder, unique))
+                yield data
+
+        counts = {"Real": 0, "Fake": 0, "Uncertain": 0, "NoFace": 0, "Error": 0}
+        empty_item = {"filename": None, "label": "Error", "score": 0.0, "result": "파일 이름 없음"}
+
+        def items(eager):
+            """(입력 위치, 결과 dict)를 완료 순서대로"""
+            for idx in empty:
+                yield idx, dict(empty_item)
+            for i, result_label, score, _ in iter_classify_batch(blobs(), eager=eager):
+                idx, _, filename, unique = entries[i]
+                # 저장이 끝난 파일만 미리보기 URL 제공
+                no_preview = cleanup or not wait_saved(saves[i])
+                yield idx, _multi_item(filename, unique, result_label, score, no_preview)
+
+        def summary():
+            return {"total": len(files), "counts": counts}
+
+        mode = _wants_stream()
+        if mode is not None:
+            def generate():
+                try:
+                    for idx, item in items(eager=True):
+                        counts[item["label"]] = counts.get(item["label"], 0) + 1
+                        item["index"] = idx
+                        line = json.dumps(item, ensure_ascii=False)
+                        yield f"event: result\ndata: {line}\n\n" if mode == 'sse' else line + "\n"
+                except Exception as e:
+                    current_app.logger.exception("[multi] 스트리밍 중 예외")
+                    err = json.dumps({"error": f"서버 내부 오류: {str(e)}"}, ensure_ascii=False)
+                    yield f"event: error\ndata: {err}\n\n" if mode == 'sse' else err + "\n"
+                line = json.dumps({"summary": summary()}, ensure_ascii=False)
+                yield f"event: summary\ndata: {line}\n\n" if mode == 'sse' else line + "\n"
+
+            mimetype = 'text/event-stream' if mode == 'sse' else 'application/x-ndjson'
+            resp = Response(stream_with_context(generate()), mimetype=mimetype)
+            resp.headers['Cache-Control'] = 'no-cache'
+            resp.headers['X-Accel-Buffering'] = 'no'  # Nginx 버퍼링 끄기
+            return resp
+
+        # 3) 일반 모드: 처리량 우선 배치 + 입력 순서로 조립
+        results = [None] * len(files)
+        for idx, item in items(eager=False):
+            counts[item["label"]] = counts.get(item["label"], 0) + 1
+            results[idx] = item
+        return jsonify({"summary": summary(), "results": results}), 200
+
+    except Exception as e:
+        current_app.logger.error(f"/api/detect-multi 예외: {e}")
+        return jsonify({"error": f"서버 내부 오류: {str(e)}"}), 500
+
 
+# ============================
+#  여러 URL 동시 판별 (NDJSON 스트리밍)
+#  POST /api/detect-urls   body: {"urls": [...]}  또는 form urls=...&urls=...
+#  응답: URL마다 한 줄 {"url","ok","label","score",...}, 마지막 줄 {"summary": ...}
+# ============================
+DETECT_URLS_MAX = 100
+
+def _url_result_line(url, label, score, cached):
+    if label == "NoFace":
+        item = {"url": url, "ok": True, "label": "NoFace", "result": "얼굴을 인식할 수 없습니다.", "score": 0.0}
+    elif label == "Error":
+        item = {"url": url, "ok": False, "label": "Error", "result": "이미지 분석 중 오류 발생", "score": 0.0}
+    else:
+        item = {"url": url, "ok": True, "label": label, "result": label, "score": round(float(score), 4)}
+    item["cached"] = cached
+    return json.dumps(item, ensure_ascii=False) + "\n"
+
+
+@main_bp.route('/detect-urls', methods=['POST'])
+def detect_urls():
+    payload = request.get_json(silent=True) or {}
+    urls = payload.get("urls") if isinstance(payload, dict) else None
+    if urls is None:
+        urls = request.form.getlist("urls")
+    if not isinstance(urls, list):
+        return jsonify({"ok": False, "error": "urls는 리스트여야 합니다"}), 400
+
+    # 공백/중복 제거, http(s)만 허용
+    seen, clean = set(), []
+    for u in urls:
+        u = (u or "").strip() if isinstance(u, str) else ""
+        if u.lower().startswith(("http://", "https://")) and u not in seen:
+            seen.add(u)
+            clean.append(u)
+    if not clean:
+        return jsonify({"ok": False, "error": "이미지 URL이 없습니다"}), 400
+    if len(clean) > DETECT_URLS_MAX:
+        return jsonify({"ok": False, "error": f"URL은 최대 {DETECT_URLS_MAX}개까지 가능합니다"}), 400
+
+    def generate():
+        counts = {"Real": 0, "Fake": 0, "Uncertain": 0, "NoFace": 0, "Error": 0}
+        pending = {}  # Future -> (url, from_cache)
+
+        def finished(fut):
+            url, cached = pending.pop(fut)
             try:
-                result_label, score, _ = detect_and_classify(filepath)
+                label, score, _ = fut.result()
+            except Exception:
+                logger.exception(f"[detect-urls] 분석 예외: {url}")
+                label, score = "Error", 0.0
+            counts[label] = counts.get(label, 0) + 1
+            return _url_result_line(url, label, score, cached)
+
+        # 다운로드가 끝나는 대로 추론에 투입 (동시 추론은 마이크로배처가 한 배치로 묶음)
+        for url, content, error, from_cache in iter_fetch(clean):
+            if error is not None:
+                counts["Error"] += 1
+                yield json.dumps({"url": url, "ok": False, "label": "Error", "error": error, "score": 0.0},
+                                 ensure_ascii=False) + "\n"
+            else:
+                pending[classify_async(content)] = (url, from_cache)
 
-                # 요청이 cleanup이면 파일 삭제
-                if cleanup:
-                    try:
-                        os.remove(filepath)
-                    except Exception as e:
-                        current_app.logger.warning(f"[multi] 파일 삭제 실패: {e}")
+            for fut in [f for f in pending if f.done()]:
+                yield finished(fut)
 
-                if result_label == "NoFace":
-                    result = "얼굴을 인식할 수 없습니다."
-                elif result_label == "Error":
-                    result = "이미지 분석 중 오류 발생"
-                else:
-                    result = f"{result_label} (score: {score:.4f})"
-
-                results.append({
-                    "filename": filename,
-                    "label": result_label,
-                    "score": round(float(score), 4),
-                    "result": result,
-                    # 미리보기는 cleanup 아닐 때만 제공
-                    "url": None if cleanup else url_for('web.uploaded_file', filename=unique, _external=True)
-                })
-            except Exception as e:
-                results.append({
-                    "filename": filename,
-                    "label": "Error",
-                    "score": 0.0,
-                    "result": f"처리 오류: {str(e)}"
-                })
-
-        summary = {
-            "total": len(results),
-            "counts": {
-                "Real": sum(1 for r in results if r["label"] == "Real"),
-                "Fake": sum(1 for r in results if r["label"] == "Fake"),
-                "Uncertain": sum(1 for r in results if r["label"] == "Uncertain"),
-                "NoFace": sum(1 for r in results if r["label"] == "NoFace"),
-                "Error": sum(1 for r in results if r["label"] == "Error"),
-            }
-        }
-        return jsonify({"summary": summary, "results": results}), 200
+        for fut in as_completed(list(pending)):
+            yield finished(fut)
+
+        yield json.dumps({"summary": {"total": len(clean), "counts": counts}}, ensure_ascii=False) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
 
+# ============================
+#  대량 판별 비동기 작업 (Authorization: Bearer 토큰, 작업은 만든 사용자만 조회)
+#  POST /api/jobs            form: images=..., priority=0  → 202 {"job_id", "status_url"}
+#  GET  /api/jobs/<job_id>   ?offset=N (이미 받은 결과 건너뛰기) → 진행률 + 부분 결과
+# ============================
+@main_bp.route('/jobs', methods=['POST'])
+@token_required
+def create_detect_job(current_user_id):
+    files = request.files.getlist("images")
+    files = [f for f in files if f and f.filename]
+    if not files:
+        return jsonify({"error": "업로드된 이미지가 없습니다."}), 400
+    if len(files) > jobs.JOB_MAX_FILES:
+        return jsonify({"error": f"이미지는 최대 {jobs.JOB_MAX_FILES}개까지 가능합니다."}), 400
+
+    try:
+        priority = int(request.form.get("priority", 0))
+    except ValueError:
+        return jsonify({"error": "priority는 정수여야 합니다."}), 400
+
+    try:
+        job = jobs.create_job(files, priority=priority, user_id=current_user_id)
+    except jobs.QueueFull:
+        resp = jsonify({"error": "대기 중인 작업이 너무 많습니다. 잠시 후 다시 시도하세요."})
+        resp.headers["Retry-After"] = "30"
+        return resp, 429
     except Exception as e:
-        current_app.logger.error(f"/api/detect-multi 예외: {e}")
+        current_app.logger.exception("/api/jobs 생성 예외")
         return jsonify({"error": f"서버 내부 오류: {str(e)}"}), 500
 
+    return jsonify({
+        "job_id": job.id,
+        "status": job.status,
+        "total": job.total,
+        "status_url": url_for('main.get_detect_job', job_id=job.id, _external=True),
+    }), 202
+
+
+@main_bp.route('/jobs/<job_id>', methods=['GET'])
+@token_required
+def get_detect_job(current_user_id, job_id):
+    job = db.session.get(Job, job_id)
+    # 다른 사용자의 작업은 존재 여부도 알려주지 않음
+    if job is None or job.user_id != current_user_id:
+        return jsonify({"error": "작업을 찾을 수 없습니다."}), 404
+    offset = max(0, request.args.get("offset", 0, type=int))
+    return jsonify(jobs.job_to_dict(job, offset=offset)), 200
+
+# ============================
+#  유사 이미지 검색 (이전 제출물 중 임베딩 코사인 유사도 상위 k개)
+#  POST /api/similar   form: image=<파일>, k=<개수>(선택, 기본 10), store=1(선택: 이 이미지도 저장)
+# ============================
+@main_bp.route('/similar', methods=['POST'])
+def similar():
+    file = request.files.get("image")
+    if not file or file.filename == "":
+        return jsonify({"ok": False, "error": "파일 이름이 없습니다"}), 400
+    k = max(1, min(SIMILAR_TOP_K_MAX, request.form.get("k", 10, type=int)))
+    store = (request.form.get("store", "").lower() in ['1', 'true', 'on', 'yes'])
+
+    data = file.read()
+    analysis = embed_and_classify(data)
+    if analysis["label"] == "Error":
+        return jsonify({"ok": False, "label": "Error", "result": "이미지 분석 중 오류 발생", "matches": []}), 500
+    if analysis["embedding"] is None:
+        return jsonify({"ok": True, "label": analysis["label"], "result": "얼굴을 인식할 수 없습니다.",
+                        "score": 0.0, "matches": []})
+
+    matches = embedding_store.search(analysis["embedding"], k=k)
+    for m in matches:
+        m["preview_url"] = url_for('static', filename=m["ref"], _external=True) if m.get("ref") else None
+
+    if store:
+        date_folder = datetime.utcnow().strftime("%Y-%m-%d")
+        ext = os.path.splitext(secure_filename(file.filename))[1].lower() or ".jpg"
+        rel = f"uploads/{date_folder}/{uuid.uuid4().hex}{ext}"
+        # 저장된 파일만 검색 결과의 미리보기로 참조
+        if wait_saved(save_bytes_async(data, os.path.join(current_app.static_folder, rel))):
+            embedding_store.add(analysis["embedding"], ref=rel, label=analysis["label"],
+                                score=round(float(analysis["score"]), 4))
+
+    return jsonify({"ok": True, "label": analysis["label"], "result": analysis["label"],
+                    "score": round(float(analysis["score"]), 4), "matches": matches})
+
+
+# ============================
+#  영상 판별 (프레임 샘플링 + 얼굴 트랙 + 배치 분류)
+#  POST /api/detect-video   form: video=<파일>, sample_fps=<초당 샘플 수>(선택), early_stop=0|1(선택)
+#  응답: 전체 판정 + 구간별/트랙별 fake 확률
+# ============================
+@main_bp.route('/detect-video', methods=['POST'])
+def detect_video():
+    file = request.files.get("video")
+    if not file or file.filename == "":
+        return jsonify({"ok": False, "error": "영상 파일이 없습니다"}), 400
+    if request.content_length and request.content_length > video.VIDEO_MAX_BYTES:
+        return jsonify({"ok": False, "error": "영상 파일이 너무 큽니다"}), 413
+
+    sample_fps = request.form.get("sample_fps", type=float)
+    if sample_fps is not None and not (0 < sample_fps <= 30):
+        return jsonify({"ok": False, "error": "sample_fps는 0보다 크고 30 이하여야 합니다"}), 400
+    early_stop = request.form.get("early_stop")
+    if early_stop is not None:
+        early_stop = early_stop.lower() in ['1', 'true', 'on', 'yes']
+
+    # VideoCapture는 경로가 필요 → 임시 파일로 청크 단위 복사 후 바로 삭제
+    ext = os.path.splitext(secure_filename(file.filename))[1].lower() or ".mp4"
+    fd, tmp_path = tempfile.mkstemp(suffix=ext, prefix="video_")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            file.save(out)
+        result = video.analyze_video(tmp_path, sample_fps=sample_fps, early_stop=early_stop)
+    except Exception as e:
+        current_app.logger.exception("detect_video 예외")
+        return jsonify({"ok": False, "error": f"영상 분석 실패: {e}"}), 500
+    finally:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+    if result["label"] == "Error":
+        return jsonify({"ok": False, "label": "Error", "result": result.get("error", "영상 분석 중 오류 발생"),
+                        "score": 0.0}), 400
+    if result["label"] == "NoFace":
+        return jsonify({"ok": True, "result": "얼굴을 인식할 수 없습니다.", **result})
+    return jsonify({"ok": True, "result": result["label"], **result})
+
+# ============================
+#  추론 통계 (배치 크기/대기시간 히스토그램 등 튜닝용)
+#  GET /api/ai-stats   헤더 X-Admin-Token (관리 API와 같은 토큰)
+# ============================
+@main_bp.route('/ai-stats', methods=['GET'])
+def ai_stats():
+    denied = _admin_denied()
+    if denied:
+        return denied
+    stats = get_ai_stats()
+    stats["url_cache"] = url_cache.stats()
+    stats["models"] = model_registry.stats()
+    stats["explain"] = explain.stats()
+    return jsonify(stats), 200
+
+# ============================
+#  모델 레지스트리 관리 (헤더 X-Admin-Token = 환경변수 DEEPFAKE_ADMIN_TOKEN)
+#  GET  /api/admin/models                     등록 모델/활성/섀도 + 이 워커의 섀도 평가 통계
+#  POST /api/admin/models                     json: {"name", "path", "arch"(선택), "artifact"(선택)} 등록
+#  POST /api/admin/models/activate            json: {"name"} 무중단 교체 (다른 워커는 몇 초 안에 따라옴)
+#  POST /api/admin/models/shadow              json: {"name", "sample_rate"} 섀도 평가 시작, {"name": null}이면 중지
+# ============================
+def _admin_denied():
+    token = model_registry.ADMIN_TOKEN
+    if not token:
+        return jsonify({"ok": False, "error": "관리 API가 비활성화되어 있습니다"}), 403
+    if not hmac.compare_digest(request.headers.get("X-Admin-Token", ""), token):
+        return jsonify({"ok": False, "error": "관리자 토큰이 올바르지 않습니다"}), 401
+    return None
+
+
+@main_bp.route('/admin/models', methods=['GET', 'POST'])
+def admin_models():
+    denied = _admin_denied()
+    if denied:
+        return denied
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        try:
+            model_registry.register(data.get("name"), data.get("path"),
+                                    arch=data.get("arch"), artifact=data.get("artifact"))
+        except (ValueError, TypeError) as e:
+            return jsonify({"ok": False, "error": str(e)}), 400
+    return jsonify({"ok": True, "registry": model_registry.read_state(), "stats": model_registry.stats()}), 200
+
+
+@main_bp.route('/admin/models/activate', methods=['POST'])
+def admin_activate_model():
+    denied = _admin_denied()
+    if denied:
+        return denied
+    name = (request.get_json(silent=True) or {}).get("name")
+    try:
+        result = model_registry.activate(name)
+    except KeyError as e:
+        return jsonify({"ok": False, "error": str(e.args[0])}), 404
+    except Exception as e:
+        current_app.logger.exception("모델 교체 실패")
+        return jsonify({"ok": False, "error": f"모델 적재 실패 (기존 모델 유지): {e}"}), 500
+    return jsonify({"ok": True, **result}), 200
+
+
+@main_bp.route('/admin/models/shadow', methods=['POST'])
+def admin_shadow_model():
+    denied = _admin_denied()
+    if denied:
+        return denied
+    data = request.get_json(silent=True) or {}
+    try:
+        state = model_registry.set_shadow(data.get("name"), data.get("sample_rate"))
+    except KeyError as e:
+        return jsonify({"ok": False, "error": str(e.args[0])}), 404
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    return jsonify({"ok": True, "shadow": state.get("shadow")}), 200
@@ -6,6 +6,9 @@ import jwt, datetime
 from flask import make_response
 import imghdr
 import logging 
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image
 
 logger = logging.getLogger(__name__)
@@ -31,6 +34,39 @@ def resize_image(filepath, size=(200, 200)):
         print(f"❌ 이미지 리사이징 실패: {e}")
 
 
+# 업로드 원본 비동기 저장 (추론과 디스크 쓰기를 겹침)
+#  URL/DB 행을 내주기 전에는 wait_saved()로 쓰기 완료를 확인할 것 (안 그러면 아직 없는 파일을 가리킬 수 있음)
+SAVE_TIMEOUT = 30.0
+_persist_pool = None
+_persist_lock = threading.Lock()
+
+def _write_bytes(data, filepath):
+    try:
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        with open(filepath, "wb") as f:
+            f.write(data)
+    except Exception as e:
+        logger.exception(f"비동기 파일 저장 실패: {filepath} ({e})")
+        raise
+
+def save_bytes_async(data, filepath):
+    """data를 filepath에 백그라운드 스레드로 저장 → Future (경로를 응답/DB에 쓰기 전에 wait_saved로 확인)"""
+    global _persist_pool
+    if _persist_pool is None:
+        with _persist_lock:
+            if _persist_pool is None:
+                _persist_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="persist")
+    return _persist_pool.submit(_write_bytes, data, filepath)
+
+def wait_saved(future, timeout=SAVE_TIMEOUT) -> bool:
+    """save_bytes_async의 쓰기가 끝날 때까지 대기. 성공하면 True (실패는 _write_bytes가 이미 로그를 남김)"""
+    try:
+        future.result(timeout=timeout)
+        return True
+    except Exception:
+        return False
+
+
 # 캐시 방지 헤더 데코레이터(로그인한 사용자만 볼수 있는 페이지에서 응답에 캐시 방지
 # 헤더를 넣어 브라우저가 페이지를 저장할 수 없게 함
 def nocache(view):
@@ -0,0 +1,268 @@
+# video.py — 영상 딥페이크 판별 (프레임 샘플링 + 얼굴 트랙 + 배치 분류)
+#  - cv2.VideoCapture로 한 프레임씩 디코딩 (영상 전체를 메모리에 올리지 않음)
+#  - VIDEO_SAMPLE_FPS 간격으로 샘플링. 건너뛰는 프레임은 grab()만 (색변환/복사 없음)
+#    "seek" 모드는 샘플 시각으로 바로 이동 (샘플 간격이 길 때 중간 프레임 디코딩 생략)
+#  - 얼굴 검출은 VIDEO_DETECT_EVERY 샘플마다 한 번, 그 사이는 템플릿 매칭으로 트랙을 이어감
+#  - 얼굴 크롭은 미리 잡아 둔 [B,3,H,W] 버퍼에 모았다가 한 번에 forward
+#  - 구간(VIDEO_SEGMENT_SECONDS)별/트랙별/전체 fake 확률 반환, 판정이 충분히 확실하면 조기 종료
+#  메모리 사용: 현재 프레임 + 트랙 템플릿 + 배치 버퍼 + 구간별 누적값(샘플 수 상한으로 제한)
+import math
+
+import cv2
+import torch
+
+from . import ai, preprocess
+
+# =========================
+# ✅ 설정
+# =========================
+VIDEO_MAX_BYTES = 200 * 1024 * 1024
+VIDEO_SAMPLE_FPS = 2.0         # 초당 분석할 프레임 수
+VIDEO_SAMPLING = "grab"        # "grab"(순차 디코딩) | "seek"(샘플 시각으로 이동, 키프레임 기준 디코딩)
+VIDEO_MAX_SAMPLES = 600        # 분석할 최대 샘플 프레임 수 (영상 길이와 무관하게 작업량 상한)
+VIDEO_DETECT_EVERY = 5         # 샘플 N개마다 얼굴 재검출 (트랙을 잃으면 즉시 재검출)
+VIDEO_MAX_TRACKS = 4           # 동시에 따라갈 최대 얼굴 수 (큰 얼굴 우선)
+VIDEO_TRACK_MIN_SCORE = 0.5    # 템플릿 매칭 점수가 이보다 낮으면 트랙 상실
+VIDEO_SEGMENT_SECONDS = 2.0
+VIDEO_BATCH_SIZE = 32          # 한 번의 forward에 넣을 최대 얼굴 크롭 수
+VIDEO_EARLY_STOP = True
+VIDEO_EARLY_STOP_MIN_FRAMES = 20     # 얼굴이 나온 샘플이 이만큼 쌓여야 조기 종료 판단
+VIDEO_EARLY_STOP_CONFIDENCE = 0.95   # 누적 fake 확률 평균이 이 이상 또는 (1-이 값) 이하이면 종료
+
+_TRACK_SEARCH = 0.5            # 트랙 탐색 창 = 박스 크기 대비 여백 비율
+_TRACK_GRAY_SIDE = 64          # 템플릿 매칭용 얼굴 크기 (작을수록 빠름)
+
+
+def _iou(a, b):
+    ax2, ay2, bx2, by2 = a[0] + a[2], a[1] + a[3], b[0] + b[2], b[1] + b[3]
+    iw = max(0, min(ax2, bx2) - max(a[0], b[0]))
+    ih = max(0, min(ay2, by2) - max(a[1], b[1]))
+    inter = iw * ih
+    union = a[2] * a[3] + b[2] * b[3] - inter
+    return inter / union if union else 0.0
+
+
+class _Track:
+    __slots__ = ("id", "box", "template", "fake_sum", "count")
+
+    def __init__(self, track_id, box, gray):
+        self.id = track_id
+        self.fake_sum = 0.0
+        self.count = 0
+        self.reset(box, gray)
+
+    def reset(self, box, gray):
+        self.box = tuple(int(v) for v in box)
+        x, y, w, h = self.box
+        self.template = gray[y:y + h, x:x + w].copy()
+
+    def follow(self, gray) -> bool:
+        """이전 박스 주변 창에서 템플릿 매칭. 성공 시 박스/템플릿 갱신"""
+        x, y, w, h = self.box
+        H, W = gray.shape[:2]
+        dx, dy = int(w * _TRACK_SEARCH), int(h * _TRACK_SEARCH)
+        x0, y0 = max(0, x - dx), max(0, y - dy)
+        x1, y1 = min(W, x + w + dx), min(H, y + h + dy)
+        window = gray[y0:y1, x0:x1]
+        if window.shape[0] < h or window.shape[1] < w or self.template.size == 0:
+            return False
+
+        # 축소해서 매칭 (얼굴이 커도 비용 일정)
+        f = min(1.0, _TRACK_GRAY_SIDE / float(max(w, h)))
+        tmpl = cv2.resize(self.template, (max(1, int(w * f)), max(1, int(h * f))), interpolation=cv2.INTER_AREA)
+        win = cv2.resize(window, (max(tmpl.shape[1], int(window.shape[1] * f)),
+                                  max(tmpl.shape[0], int(window.shape[0] * f))), interpolation=cv2.INTER_AREA)
+        res = cv2.matchTemplate(win, tmpl, cv2.TM_CCOEFF_NORMED)
+        _, score, _, loc = cv2.minMaxLoc(res)
+        if score < VIDEO_TRACK_MIN_SCORE:
+            return False
+        self.reset((x0 + int(loc[0] / f), y0 + int(loc[1] / f), w, h), gray)
+        return True
+
+
+def _sample_frames(cap, fps, sample_fps, sampling):
+    """(프레임 번호, 초, BGR 프레임)을 샘플 간격대로 하나씩 yield"""
+    step = max(1.0, fps / sample_fps)
+    if sampling == "seek":
+        n = 0
+        while True:
+            target = int(round(n * step))
+            cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+            ok, frame = cap.read()
+            if not ok:
+                return
+            yield target, target / fps, frame
+            n += 1
+
+    idx, next_pick = 0, 0.0
+    while True:
+        if idx >= next_pick:
+            ok, frame = cap.read()
+            if not ok:
+                return
+            yield idx, idx / fps, frame
+            next_pick += step
+        elif not cap.grab():
+            return
+        idx += 1
+
+
+class _Analyzer:
+    def __init__(self, sample_fps, early_stop):
+        self.sample_fps = sample_fps
+        self.early_stop = early_stop
+        self.tracks = []
+        self.all_tracks = {}       # 트랙 ID → 트랙 (응답의 트랙별 점수용, 최대 얼굴 수 × 재검출 횟수)
+        self.next_track_id = 0
+        self.since_detect = VIDEO_DETECT_EVERY  # 첫 샘플에서 바로 검출
+        self.batch = torch.empty(VIDEO_BATCH_SIZE, 3, ai.INPUT_SIZE, ai.INPUT_SIZE)
+        self.pending = []          # 배치 슬롯별 (구간 번호, 샘플 번호, 트랙)
+        self.frame_probs = {}      # (구간 번호, 샘플 번호) → [얼굴별 fake 확률] (flush 중에만 사용)
+        self.segments = {}         # 구간 번호 → [fake 확률 합, 샘플 수]
+        self.face_frames = 0
+        self.fake_sum = 0.0
+        self.detections = 0
+
+    # --- 얼굴 트랙 ---
+    def _update_tracks(self, frame, gray):
+        alive = [t for t in self.tracks if t.follow(gray)] if self.since_detect < VIDEO_DETECT_EVERY else []
+        if self.since_detect < VIDEO_DETECT_EVERY and len(alive) == len(self.tracks) and alive:
+            self.tracks = alive
+            self.since_detect += 1
+            return
+
+        # 재검출 (주기 도달 또는 트랙 상실) → IoU로 기존 트랙 ID 이어붙이기
+        self.detections += 1
+        self.since_detect = 1
+        faces = ai._detect_faces(frame) or []
+        faces = sorted(faces, key=lambda b: b[2] * b[3], reverse=True)[:VIDEO_MAX_TRACKS]
+        tracks = []
+        for box in faces:
+            best = max(self.tracks, key=lambda t: _iou(t.box, box), default=None)
+            if best is not None and _iou(best.box, box) > 0.3 and best not in tracks:
+                best.reset(box, gray)
+                tracks.append(best)
+            else:
+                tracks.append(_Track(self.next_track_id, box, gray))
+                self.next_track_id += 1
+        self.tracks = tracks
+        self.all_tracks.update({t.id: t for t in tracks})
+
+    # --- 배치 분류 ---
+    def _flush(self):
+        if not self.pending:
+            return
+        probs = ai._predict_probs(self.batch[:len(self.pending)])   # 이미지와 같은 캐스케이드 + TTA
+        for (seg, sample, track), prob in zip(self.pending, probs):
+            fake = float(prob[ai.FAKE_IDX])
+            track.fake_sum += fake
+            track.count += 1
+            self.frame_probs.setdefault((seg, sample), []).append(fake)
+        self.pending = []
+
+        # 프레임 점수 = 얼굴별 확률 집계(MULTI_FACE_AGG) → 구간/전체 누적
+        for (seg, _), fakes in self.frame_probs.items():
+            score = ai._aggregate_faces(fakes)
+            acc = self.segments.setdefault(seg, [0.0, 0])
+            acc[0] += score
+            acc[1] += 1
+            self.fake_sum += score
+            self.face_frames += 1
+        self.frame_probs = {}
+
+    def _confident(self) -> bool:
+        if not self.early_stop or self.face_frames < VIDEO_EARLY_STOP_MIN_FRAMES:
+            return False
+        mean = self.fake_sum / self.face_frames
+        return mean >= VIDEO_EARLY_STOP_CONFIDENCE or mean <= 1.0 - VIDEO_EARLY_STOP_CONFIDENCE
+
+    def run(self, cap, fps):
+        samples, stopped_early, last_t = 0, False, 0.0
+        for frame_no, t, frame in _sample_frames(cap, fps, self.sample_fps, VIDEO_SAMPLING):
+            if samples >= VIDEO_MAX_SAMPLES:
+                break
+            samples += 1
+            last_t = t
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            self._update_tracks(frame, gray)
+            if not self.tracks:
+                continue
+
+            # 프레임 하나의 크롭은 같은 배치에 넣음 (VIDEO_MAX_TRACKS <= VIDEO_BATCH_SIZE)
+            if len(self.pending) + len(self.tracks) > VIDEO_BATCH_SIZE:
+                self._flush()
+                if self._confident():
+                    stopped_early = True
+                    break
+            seg = int(t // VIDEO_SEGMENT_SECONDS)
+            for track in self.tracks:
+                crop = ai._crop_with_margin(frame, track.box, ai.FACE_MARGIN)
+                preprocess.to_tensor(crop, ai.INPUT_SIZE, out=self.batch[len(self.pending)])
+                self.pending.append((seg, frame_no, track))
+
+        self._flush()
+        return samples, stopped_early, last_t
+
+
+def _verdict(fake_prob):
+    prob = torch.zeros(2)
+    prob[ai.FAKE_IDX], prob[ai.REAL_IDX] = fake_prob, 1.0 - fake_prob
+    return ai._label_from_probs(prob)
+
+
+def analyze_video(path, sample_fps=None, early_stop=None) -> dict:
+    """
+    영상 파일 경로 → {"label", "score", "fake_prob", "segments": [...], "tracks": [...], "stats": {...}}
+    label ∈ {"Fake","Real","Uncertain","NoFace","Error"}
+    """
+    sample_fps = float(sample_fps or VIDEO_SAMPLE_FPS)
+    early_stop = VIDEO_EARLY_STOP if early_stop is None else bool(early_stop)
+
+    cap = cv2.VideoCapture(path)
+    try:
+        if not cap.isOpened():
+            return {"label": "Error", "score": 0.0, "error": "영상을 열 수 없습니다"}
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        if not fps or math.isnan(fps) or fps <= 0:
+            fps = 30.0
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+
+        analyzer = _Analyzer(sample_fps, early_stop)
+        samples, stopped_early, last_t = analyzer.run(cap, fps)
+    finally:
+        cap.release()
+
+    stats = {
+        "fps": round(fps, 3),
+        "duration": round(total_frames / fps, 2) if total_frames else None,
+        "analyzed_until": round(last_t, 2),
+        "sampled_frames": samples,
+        "face_frames": analyzer.face_frames,
+        "detections": analyzer.detections,
+        "stopped_early": stopped_early,
+    }
+    if analyzer.face_frames == 0:
+        return {"label": "NoFace", "score": 0.0, "fake_prob": None, "segments": [], "tracks": [], "stats": stats}
+
+    segments = []
+    for seg in sorted(analyzer.segments):
+        total, count = analyzer.segments[seg]
+        segments.append({
+            "start": round(seg * VIDEO_SEGMENT_SECONDS, 2),
+            "end": round((seg + 1) * VIDEO_SEGMENT_SECONDS, 2),
+            "frames": count,
+            "fake_prob": round(total / count, 4),
+        })
+    tracks = [{"id": t.id, "frames": t.count, "fake_prob": round(t.fake_sum / t.count, 4)}
+              for t in sorted(analyzer.all_tracks.values(), key=lambda t: t.id) if t.count]
+
+    fake_prob = analyzer.fake_sum / analyzer.face_frames
+    label, score = _verdict(fake_prob)
+    return {
+        "label": label,
+        "score": round(score, 4),
+        "fake_prob": round(fake_prob, 4),
+        "segments": segments,
+        "tracks": tracks,
+        "stats": stats,
+    }
@@ -0,0 +1,103 @@
+# bench_face_detectors.py — 얼굴 검출 백엔드별 지연/재현율 비교
+#
+#   # 얼굴이 있는 샘플 폴더: 이미지 단위 재현율(얼굴 1개 이상 검출 비율)
+#   python scripts/bench_face_detectors.py --images /data/faces
+#
+#   # 박스 정답이 있으면 IoU>=0.5 기준 박스 재현율까지
+#   #   gt.json: {"a.jpg": [[x, y, w, h], ...], ...}  (파일명은 --images 기준 상대경로)
+#   python scripts/bench_face_detectors.py --images /data/faces --gt gt.json --backends haar,yunet --max-sides 0,640,480
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2  # noqa: E402
+
+from myapp import ai  # noqa: E402
+from myapp.face_detectors import BACKENDS, create_detector  # noqa: E402
+from myapp.quantize import list_images  # noqa: E402
+
+
+def _iou(a, b):
+    ax1, ay1, ax2, ay2 = a[0], a[1], a[0] + a[2], a[1] + a[3]
+    bx1, by1, bx2, by2 = b[0], b[1], b[0] + b[2], b[1] + b[3]
+    iw = max(0, min(ax2, bx2) - max(ax1, bx1))
+    ih = max(0, min(ay2, by2) - max(ay1, by1))
+    inter = iw * ih
+    union = a[2] * a[3] + b[2] * b[3] - inter
+    return inter / union if union else 0.0
+
+
+def _pct(values, q):
+    values = sorted(values)
+    return values[int(q * (len(values) - 1))] if values else 0.0
+
+
+def bench(detector, images, gt=None, iou=0.5):
+    times, hit_images, gt_total, gt_found = [], 0, 0, 0
+    for rel, img in images:
+        t0 = time.perf_counter()
+        faces = detector.detect(img) or []
+        times.append((time.perf_counter() - t0) * 1000.0)
+        hit_images += int(len(faces) > 0)
+        if gt is not None and rel in gt:
+            for box in gt[rel]:
+                gt_total += 1
+                gt_found += int(any(_iou(box, f) >= iou for f in faces))
+    n = len(images)
+    return {
+        "images": n,
+        "ms_mean": round(sum(times) / n, 2) if n else 0.0,
+        "ms_p50": round(_pct(times, 0.5), 2),
+        "ms_p95": round(_pct(times, 0.95), 2),
+        "image_recall": round(hit_images / n, 4) if n else 0.0,
+        "box_recall": round(gt_found / gt_total, 4) if gt_total else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="얼굴 검출 백엔드 비교")
+    parser.add_argument("--images", required=True, help="얼굴이 포함된 샘플 이미지 폴더")
+    parser.add_argument("--gt", default=None, help="박스 정답 JSON (선택)")
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--max-sides", default=f"0,{ai.FACE_DETECT_MAX_SIDE or 0}",
+                        help="검출 해상도(긴 변) 목록. 0이면 원본")
+    parser.add_argument("--limit", type=int, default=500)
+    args = parser.parse_args()
+
+    images = []
+    for path in list_images(args.images)[:args.limit]:
+        img = cv2.imread(path, cv2.IMREAD_COLOR)
+        if img is not None:
+            images.append((os.path.relpath(path, args.images), img))
+    if not images:
+        sys.exit(f"{args.images} 에 읽을 수 있는 이미지가 없습니다")
+
+    gt = None
+    if args.gt:
+        with open(args.gt, encoding="utf-8") as f:
+            gt = json.load(f)
+
+    rows = []
+    for name in [b.strip() for b in args.backends.split(",") if b.strip()]:
+        for side in sorted({int(s) for s in args.max_sides.split(",") if s.strip()}):
+            kw = ai._detector_kwargs(name)
+            kw["max_side"] = side or None
+            try:
+                detector = create_detector(name, **kw)
+            except Exception as e:
+                print(f"[bench] {name} 건너뜀: {e}")
+                break
+            detector.detect(images[0][1])  # 스레드별 검출기 생성/첫 호출 비용은 제외
+            row = {"backend": name, "max_side": side or "full", **bench(detector, images, gt)}
+            print(json.dumps(row, ensure_ascii=False))
+            rows.append(row)
+
+    print(json.dumps(rows, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
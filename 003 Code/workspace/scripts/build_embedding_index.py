@@ -0,0 +1,55 @@
+# build_embedding_index.py — 임베딩 저장소(myapp/embeddings.py)의 IVF 인덱스 생성
+#
+#   python scripts/build_embedding_index.py --nlist 1024
+#   python scripts/build_embedding_index.py --nlist 1024 --check 200   # 전수 검색 대비 top-10 재현율 확인
+#
+# 생성 후 추가된 행은 검색 시 전수로 계산되므로, 행이 많이 늘면 다시 실행하면 됨 (서버 재시작 불필요)
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from myapp.embeddings import EmbeddingStore, EMBED_DIR  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="임베딩 IVF 인덱스 생성")
+    parser.add_argument("--dir", default=EMBED_DIR)
+    parser.add_argument("--nlist", type=int, default=1024, help="중심(리스트) 수. 대략 sqrt(행 수)의 몇 배")
+    parser.add_argument("--iters", type=int, default=10)
+    parser.add_argument("--sample", type=int, default=200_000, help="k-means 학습에 쓸 행 수")
+    parser.add_argument("--check", type=int, default=0, help="무작위 질의 N개로 전수 검색 대비 재현율 측정")
+    parser.add_argument("--nprobe", type=int, default=16)
+    args = parser.parse_args()
+
+    store = EmbeddingStore(args.dir)
+    exact = None
+    if args.check:
+        # 비교 기준: 전수 검색 결과
+        rng = np.random.default_rng(1)
+        n = len(store)
+        rows = rng.choice(n, size=min(args.check, n), replace=False)
+        queries = [np.asarray(store._mm[r], dtype=np.float32) for r in rows]
+        exact = [{m["row"] for m in store.search(q, k=10, exhaustive=True)} for q in queries]
+
+    t0 = time.perf_counter()
+    info = store.build_ivf(nlist=args.nlist, iters=args.iters, sample=args.sample)
+    info["seconds"] = round(time.perf_counter() - t0, 2)
+
+    if exact is not None:
+        t1 = time.perf_counter()
+        hits = sum(len(truth & {m["row"] for m in store.search(q, k=10, nprobe=args.nprobe)})
+                   for q, truth in zip(queries, exact))
+        info["recall_at_10"] = round(hits / (10 * len(exact)), 4)
+        info["ms_per_query"] = round(1000.0 * (time.perf_counter() - t1) / len(exact), 2)
+
+    print(json.dumps(info, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
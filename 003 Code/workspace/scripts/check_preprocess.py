@@ -0,0 +1,134 @@
+# check_preprocess.py — 새 전처리(myapp/preprocess.py)와 기존 PIL/torchvision 파이프라인 비교
+#
+#   python scripts/check_preprocess.py --images /data/samples
+#   python scripts/check_preprocess.py --images /data/samples --with-model   # fake 확률 차이까지
+#   python scripts/check_preprocess.py --images /data/samples --reduced      # 축소 디코딩 vs 전체 디코딩
+#
+# 텐서 오차(정규화 후 값)와, --with-model이면 같은 모델에서의 fake 확률 차이를 보고하고
+# 확률 차이가 --prob-tol 을 넘는 이미지가 있으면 종료 코드 1.
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2  # noqa: E402
+import torch  # noqa: E402
+import torch.nn.functional as F  # noqa: E402
+from PIL import Image, ImageOps  # noqa: E402
+from torchvision import transforms  # noqa: E402
+
+from myapp import ai, preprocess  # noqa: E402
+from myapp.quantize import list_images  # noqa: E402
+
+# 기존 서비스 전처리 (비교 기준)
+legacy_transform = transforms.Compose([
+    transforms.Resize((ai.INPUT_SIZE, ai.INPUT_SIZE), antialias=True),
+    transforms.ToTensor(),
+    transforms.Normalize(mean=list(preprocess.MEAN), std=list(preprocess.STD)),
+])
+
+
+def legacy_tensor(img_bgr):
+    pil = ImageOps.exif_transpose(Image.fromarray(cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB)))
+    return legacy_transform(pil)
+
+
+def check_reduced(args):
+    """전체 해상도 디코딩 vs ai.REDUCED_DECODE 축소 디코딩: 디코딩 시간, 메모리(픽셀 수), 최종 텐서 오차"""
+    olds, news = [], []
+    t_full = t_reduced = 0.0
+    px_full = px_reduced = 0
+    min_short, min_long = ai._decode_limits()
+    for path in list_images(args.images)[:args.limit]:
+        with open(path, "rb") as f:
+            data = f.read()
+        t0 = time.perf_counter()
+        full = ai._load_image(data)
+        t1 = time.perf_counter()
+        reduced, _ = preprocess.decode_reduced(data, min_short, min_long)
+        t2 = time.perf_counter()
+        if full is None or reduced is None:
+            continue
+        t_full += t1 - t0
+        t_reduced += t2 - t1
+        px_full += full.shape[0] * full.shape[1]
+        px_reduced += reduced.shape[0] * reduced.shape[1]
+        olds.append(preprocess.to_tensor(full, ai.INPUT_SIZE))
+        news.append(preprocess.to_tensor(reduced, ai.INPUT_SIZE))
+    if not olds:
+        sys.exit(f"{args.images} 에 읽을 수 있는 이미지가 없습니다")
+
+    diff = (torch.stack(olds) - torch.stack(news)).abs()
+    print(json.dumps({
+        "images": len(olds),
+        "tensor_abs_diff_mean": round(float(diff.mean()), 5),
+        "tensor_abs_diff_max": round(float(diff.max()), 5),
+        "ms_per_decode_full": round(1000.0 * t_full / len(olds), 3),
+        "ms_per_decode_reduced": round(1000.0 * t_reduced / len(olds), 3),
+        "pixel_ratio": round(px_reduced / px_full, 4) if px_full else None,
+    }, ensure_ascii=False, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="전처리 동등성 검사")
+    parser.add_argument("--images", required=True)
+    parser.add_argument("--limit", type=int, default=200)
+    parser.add_argument("--with-model", action="store_true", help="모델 fake 확률 차이도 비교")
+    parser.add_argument("--prob-tol", type=float, default=0.01, help="허용 fake 확률 차이")
+    parser.add_argument("--reduced", action="store_true",
+                        help="기존 파이프라인 대신 전체 디코딩 → 새 전처리를 기준으로, 축소 디코딩 결과와 비교")
+    args = parser.parse_args()
+    if args.reduced:
+        return check_reduced(args)
+
+    paths = list_images(args.images)[:args.limit]
+    olds, news = [], []
+    t_old = t_new = 0.0
+    for path in paths:
+        img = ai._load_image(path)
+        if img is None:
+            continue
+        t0 = time.perf_counter()
+        olds.append(legacy_tensor(img))
+        t1 = time.perf_counter()
+        news.append(preprocess.to_tensor(img, ai.INPUT_SIZE))
+        t2 = time.perf_counter()
+        t_old += t1 - t0
+        t_new += t2 - t1
+    if not olds:
+        sys.exit(f"{args.images} 에 읽을 수 있는 이미지가 없습니다")
+
+    old, new = torch.stack(olds), torch.stack(news)
+    diff = (old - new).abs()
+    report = {
+        "images": len(olds),
+        "tensor_abs_diff_mean": round(float(diff.mean()), 5),
+        "tensor_abs_diff_max": round(float(diff.max()), 5),
+        "ms_per_image_legacy": round(1000.0 * t_old / len(olds), 3),
+        "ms_per_image_fused": round(1000.0 * t_new / len(olds), 3),
+    }
+
+    failed = False
+    if args.with_model:
+        model = ai.get_model()
+        with torch.inference_mode():
+            p_old = torch.cat([F.softmax(model(old[i:i + 16]).float(), dim=1) for i in range(0, len(old), 16)])
+            p_new = torch.cat([F.softmax(model(new[i:i + 16]).float(), dim=1) for i in range(0, len(new), 16)])
+        pdiff = (p_old[:, ai.FAKE_IDX] - p_new[:, ai.FAKE_IDX]).abs()
+        report.update({
+            "fake_prob_abs_diff_mean": round(float(pdiff.mean()), 5),
+            "fake_prob_abs_diff_max": round(float(pdiff.max()), 5),
+            "label_agreement": round(float((p_old.argmax(1) == p_new.argmax(1)).float().mean()), 4),
+        })
+        failed = float(pdiff.max()) > args.prob_tol
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if failed:
+        sys.exit(f"fake 확률 차이가 허용치({args.prob_tol})를 넘는 이미지가 있습니다")
+
+
+if __name__ == "__main__":
+    main()
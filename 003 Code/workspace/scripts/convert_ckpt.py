@@ -0,0 +1,97 @@
+# convert_ckpt.py — 학습 체크포인트 → 추론 아티팩트 컴파일러
+#  지원 입력: nn.Module 통째 pickle, state_dict, {"state_dict": ...}, DDP 'module.' 접두어
+#  출력: BatchNorm을 conv에 folding한 그래프
+#        - torchscript: trace + torch.jit.freeze (기본)
+#        - export: torch.export (배치 차원 동적)
+#  + manifest(<out>.json): 포맷, 아티팩트/원본 SHA-256, 입력 크기, 클래스 매핑, eager 대비 최대 오차
+#
+#   python scripts/convert_ckpt.py --ckpt myapp/models/dm2.pth --out myapp/models/dm2.ts.pt
+#   python scripts/convert_ckpt.py --ckpt old_full_model.pth --trust-pickle   # nn.Module pickle (신뢰 가능한 파일만)
+#
+# 서버(myapp/ai.py)는 ARTIFACT_PATH가 있으면 이 아티팩트를 우선 사용하고,
+# 서버 쪽에서는 더 이상 weights_only=False 로드를 하지 않는다.
+import os
+import sys
+import json
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import torch  # noqa: E402
+from torch.fx.experimental.optimization import fuse as fuse_conv_bn  # noqa: E402
+
+from myapp import ai  # noqa: E402
+from myapp.artifact import save_artifact  # noqa: E402
+
+
+def load_any_checkpoint(path, trust_pickle=False) -> torch.nn.Module:
+    try:
+        ckpt = torch.load(path, map_location="cpu", weights_only=True)
+    except Exception as e:
+        if not trust_pickle:
+            sys.exit(f"안전 로드 실패: {e}\n신뢰할 수 있는 파일이면 --trust-pickle 로 다시 실행하세요.")
+        print(f"[convert] 안전 로드 실패 → weights_only=False 로 재시도 (--trust-pickle): {e}")
+        ckpt = torch.load(path, map_location="cpu", weights_only=False)
+
+    if isinstance(ckpt, torch.nn.Module):
+        model = ckpt
+    elif isinstance(ckpt, dict):
+        model = ai._build_model_from_state_dict(ckpt.get("state_dict", ckpt))
+    else:
+        sys.exit(f"지원하지 않는 체크포인트 타입: {type(ckpt)}")
+    return model.cpu().eval()
+
+
+def compile_model(model, fmt, input_size, max_batch):
+    """conv-bn folding 후 TorchScript(frozen) 또는 ExportedProgram 생성"""
+    example = torch.randn(1, 3, input_size, input_size)
+    fused = fuse_conv_bn(model)  # eval 모드 FX 그래프에서 Conv2d+BatchNorm2d → Conv2d
+
+    with torch.inference_mode():
+        if fmt == "export":
+            batch = torch.export.Dim("batch", min=1, max=max_batch)
+            return torch.export.export(fused, (example,), dynamic_shapes=({0: batch},))
+        traced = torch.jit.trace(fused, example)
+        return torch.jit.freeze(traced.eval())
+
+
+def max_abs_diff(reference, compiled, fmt, input_size, batch=4):
+    x = torch.randn(batch, 3, input_size, input_size)
+    run = compiled.module() if fmt == "export" else compiled
+    with torch.inference_mode():
+        return float((reference(x) - run(x)).abs().max())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="체크포인트 → 추론 아티팩트 변환")
+    parser.add_argument("--ckpt", default=ai.MODEL_PATH)
+    parser.add_argument("--out", default=ai.ARTIFACT_PATH)
+    parser.add_argument("--format", choices=["torchscript", "export"], default="torchscript")
+    parser.add_argument("--input-size", type=int, default=ai.INPUT_SIZE)
+    parser.add_argument("--max-batch", type=int, default=256, help="export 포맷의 동적 배치 상한")
+    parser.add_argument("--trust-pickle", action="store_true",
+                        help="weights_only 로드 실패 시 일반 pickle 로드 허용 (신뢰 가능한 파일만)")
+    parser.add_argument("--tolerance", type=float, default=1e-3, help="eager 대비 허용 최대 오차(logit)")
+    args = parser.parse_args()
+
+    model = load_any_checkpoint(args.ckpt, trust_pickle=args.trust_pickle)
+    compiled = compile_model(model, args.format, args.input_size, args.max_batch)
+
+    diff = max_abs_diff(model, compiled, args.format, args.input_size)
+    print(f"[convert] eager 대비 최대 오차: {diff:.2e}")
+    if diff > args.tolerance:
+        sys.exit(f"오차가 허용치({args.tolerance})를 넘습니다. 변환 결과를 저장하지 않습니다.")
+
+    manifest = save_artifact(
+        compiled, args.out, args.ckpt, fmt=args.format,
+        precision="fp32",
+        input_size=args.input_size,
+        class_mapping={str(ai.FAKE_IDX): "Fake", str(ai.REAL_IDX): "Real"},
+        bn_folded=True,
+        max_abs_diff=diff,
+    )
+    print(json.dumps(manifest, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# quantize_model.py — int8 calibration / 정밀도별 정확도 드리프트 리포트
+#
+#   # 샘플 폴더로 calibration → myapp/ai.py의 INT8_ARTIFACT_PATH 에 아티팩트 + manifest 저장
+#   python scripts/quantize_model.py calibrate --images /data/calib --limit 300
+#
+#   # 라벨 폴더(<dir>/Fake, <dir>/Real)로 fp32 대비 비교
+#   python scripts/quantize_model.py report --labeled /data/val --precision int8
+import os
+import sys
+import json
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import torch  # noqa: E402
+
+from myapp import ai  # noqa: E402
+from myapp import quantize  # noqa: E402
+from myapp.artifact import save_artifact  # noqa: E402
+
+
+def _tensors(paths):
+    """서비스와 같은 전처리(얼굴 정책 포함). NoFace/로딩 실패 이미지는 건너뜀"""
+    for path in paths:
+        img = ai._load_image(path)
+        if img is None:
+            continue
+        early, tensor = ai._prepare(img)
+        if early is None:
+            yield path, tensor
+
+
+def _batches(paths, batch_size):
+    buf = []
+    for _, t in _tensors(paths):
+        buf.append(t)
+        if len(buf) == batch_size:
+            yield torch.stack(buf)
+            buf = []
+    if buf:
+        yield torch.stack(buf)
+
+
+def cmd_calibrate(args):
+    paths = quantize.list_images(args.images)[:args.limit]
+    print(f"[calibrate] 이미지 {len(paths)}장 → {args.out}")
+    scripted, seen = quantize.quantize_int8(ai._load_checkpoint_model(), _batches(paths, args.batch_size))
+    manifest = save_artifact(scripted, args.out, ai.MODEL_PATH,
+                             precision="int8", calibration_images=seen,
+                             input_size=ai.INPUT_SIZE,
+                             class_mapping={str(ai.FAKE_IDX): "Fake", str(ai.REAL_IDX): "Real"},
+                             calibration_dir=os.path.abspath(args.images))
+    print(json.dumps(manifest, ensure_ascii=False, indent=2))
+
+
+def cmd_report(args):
+    samples = []
+    for cls_idx, cls_name in ((ai.FAKE_IDX, "Fake"), (ai.REAL_IDX, "Real")):
+        folder = os.path.join(args.labeled, cls_name)
+        if os.path.isdir(folder):
+            samples += [(t, cls_idx) for _, t in _tensors(quantize.list_images(folder)[:args.limit])]
+    if not samples:
+        sys.exit(f"{args.labeled}/Fake, {args.labeled}/Real 에 이미지가 없습니다")
+
+    reference = ai._load_checkpoint_model().cpu()
+    if args.precision == "int8":
+        candidate, _ = quantize.load_artifact(args.artifact, ai.MODEL_PATH)
+        if candidate is None:
+            sys.exit(f"int8 아티팩트가 없거나 체크포인트와 맞지 않습니다: {args.artifact}")
+    else:
+        if args.precision == "bf16" and not quantize.bf16_supported():
+            print("⚠ 이 CPU는 bf16을 지원하지 않아 fp32로 실행됩니다")
+        candidate = reference
+
+    report = quantize.drift_report(reference, candidate, samples, precision=args.precision,
+                                   fake_idx=ai.FAKE_IDX, batch_size=args.batch_size)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="추론 정밀도(int8/bf16) 도구")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("calibrate", help="int8 정적 양자화 아티팩트 생성")
+    p.add_argument("--images", required=True, help="calibration용 샘플 이미지 폴더")
+    p.add_argument("--limit", type=int, default=300)
+    p.add_argument("--batch-size", type=int, default=16)
+    p.add_argument("--out", default=ai.INT8_ARTIFACT_PATH)
+    p.set_defaults(func=cmd_calibrate)
+
+    p = sub.add_parser("report", help="fp32 대비 정확도 드리프트")
+    p.add_argument("--labeled", required=True, help="Fake/, Real/ 하위 폴더를 가진 라벨 폴더")
+    p.add_argument("--precision", choices=["int8", "bf16"], default="int8")
+    p.add_argument("--artifact", default=ai.INT8_ARTIFACT_PATH)
+    p.add_argument("--limit", type=int, default=1000, help="클래스별 최대 이미지 수")
+    p.add_argument("--batch-size", type=int, default=16)
+    p.set_defaults(func=cmd_report)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+# 테스트는 workspace 루트에서 실행: python -m pytest -q tests
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
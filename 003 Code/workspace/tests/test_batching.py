@@ -0,0 +1,73 @@
+# batching.py — Histogram 버킷 / MicroBatcher 묶음·결과 분배·오류 전파
+import threading
+
+import pytest
+
+pytest.importorskip("flask")  # myapp 패키지 import에 필요
+
+from myapp.batching import Histogram, MicroBatcher  # noqa: E402
+
+
+def test_histogram_buckets_and_mean():
+    h = Histogram([1, 5, 10])
+    for v in (0.5, 1, 3, 10, 11, 100):
+        h.observe(v)
+    snap = h.snapshot()
+    assert snap["count"] == 6
+    assert snap["mean"] == pytest.approx((0.5 + 1 + 3 + 10 + 11 + 100) / 6)
+    assert snap["buckets"] == {"<=1": 2, "<=5": 1, "<=10": 1, ">10": 2}
+
+
+def test_histogram_empty():
+    snap = Histogram([1, 2]).snapshot()
+    assert snap["count"] == 0 and snap["mean"] == 0.0
+
+
+def test_concurrent_submits_share_a_batch():
+    sizes = []
+    release = threading.Event()
+
+    def run_batch(items):
+        sizes.append(len(items))
+        release.wait(5)
+        return [x * 10 for x in items]
+
+    batcher = MicroBatcher(run_batch, max_batch_size=8, max_wait_ms=200, name="test")
+    futures = [batcher.submit(i) for i in range(5)]
+    release.set()
+    assert [f.result(timeout=5) for f in futures] == [0, 10, 20, 30, 40]
+    assert sum(sizes) == 5 and max(sizes) > 1
+    stats = batcher.stats()
+    assert stats["batches"] == len(sizes)
+    assert stats["batch_size"]["count"] == len(sizes)
+
+
+def test_max_batch_size_is_respected():
+    sizes = []
+
+    def run_batch(items):
+        sizes.append(len(items))
+        return items
+
+    batcher = MicroBatcher(run_batch, max_batch_size=3, max_wait_ms=200, name="test")
+    futures = [batcher.submit(i) for i in range(7)]
+    assert [f.result(timeout=5) for f in futures] == list(range(7))
+    assert max(sizes) <= 3 and sum(sizes) == 7
+
+
+def test_errors_propagate_to_every_caller():
+    def run_batch(items):
+        raise ValueError("boom")
+
+    batcher = MicroBatcher(run_batch, max_batch_size=4, max_wait_ms=50, name="test")
+    futures = [batcher.submit(i) for i in range(3)]
+    for f in futures:
+        with pytest.raises(ValueError):
+            f.result(timeout=5)
+    assert batcher.stats()["errors"] >= 1
+
+
+def test_result_count_mismatch_is_an_error():
+    batcher = MicroBatcher(lambda items: items[:-1], max_batch_size=4, max_wait_ms=0, name="test")
+    with pytest.raises(RuntimeError):
+        batcher.infer(1, timeout=5)
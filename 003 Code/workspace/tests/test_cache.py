@@ -0,0 +1,81 @@
+# cache.py — LRU 축출/만료, SQLite 계층 공유·만료, ResultCache 조회 순서
+import time
+
+import pytest
+
+pytest.importorskip("flask")  # myapp 패키지 import에 필요
+
+from myapp.cache import LRUCache, SQLiteTier, ResultCache  # noqa: E402
+
+
+def test_lru_evicts_least_recently_used():
+    c = LRUCache(max_entries=2)
+    c.put("a", 1)
+    c.put("b", 2)
+    assert c.get("a") == 1      # a가 최근 사용으로 이동
+    c.put("c", 3)               # b가 축출
+    assert c.get("b") is None
+    assert c.get("a") == 1 and c.get("c") == 3
+    assert len(c) == 2 and c.evictions == 1
+
+
+def test_lru_ttl_expires(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    c = LRUCache(max_entries=4, ttl=10)
+    c.put("a", 1)
+    now[0] += 5
+    assert c.get("a") == 1
+    now[0] += 6
+    assert c.get("a") is None
+    assert len(c) == 0
+
+
+def test_sqlite_tier_shared_between_instances(tmp_path):
+    path = str(tmp_path / "cache.db")
+    SQLiteTier(path).put("k", "Fake|0.9")
+    assert SQLiteTier(path).get("k") == "Fake|0.9"
+    assert SQLiteTier(path).get("missing") is None
+
+
+def test_sqlite_tier_ttl(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    tier = SQLiteTier(str(tmp_path / "cache.db"), ttl=10)
+    tier.put("k", "Real|0.7")
+    assert tier.get("k") == "Real|0.7"
+    now[0] += 11
+    assert tier.get("k") is None
+
+
+def test_sqlite_tier_evicts_oldest_rows(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    tier = SQLiteTier(str(tmp_path / "cache.db"), max_rows=100)
+    for i in range(256):        # 256번째 put에서 정리
+        now[0] += 1
+        tier.put(f"k{i}", "Fake|0.5")
+    assert tier.get("k0") is None
+    assert tier.get("k255") == "Fake|0.5"
+    assert tier.evictions == 156
+
+
+def test_result_cache_promotes_shared_hits(tmp_path):
+    path = str(tmp_path / "cache.db")
+    ResultCache(db_path=path).put("k", ("Fake", 0.875))
+
+    other = ResultCache(db_path=path)   # 다른 워커: 메모리는 비어 있음
+    assert other.get("k") == ("Fake", 0.875)
+    assert other.get("k") == ("Fake", 0.875)
+    assert other.get("missing") is None
+    stats = other.stats()
+    assert (stats["shared_hits"], stats["hits"], stats["misses"]) == (1, 1, 1)
+    assert stats["size"] == 1
+
+
+def test_result_cache_memory_only():
+    c = ResultCache(max_entries=8)
+    assert c.get("k") is None
+    c.put("k", ("Real", 0.6))
+    assert c.get("k") == ("Real", 0.6)
+    assert c.stats()["shared"] is None
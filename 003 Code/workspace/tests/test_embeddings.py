@@ -0,0 +1,94 @@
+# embeddings.py — 전수 검색 / IVF 검색 (생성 이후 추가된 행 포함)
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("flask")  # myapp 패키지 import에 필요
+
+from myapp.embeddings import EmbeddingStore  # noqa: E402
+
+DIM = 16
+
+
+def _unit(rng, n):
+    v = rng.standard_normal((n, DIM)).astype(np.float32)
+    return v / np.linalg.norm(v, axis=1, keepdims=True)
+
+
+@pytest.fixture
+def store(tmp_path):
+    rng = np.random.default_rng(0)
+    s = EmbeddingStore(directory=str(tmp_path), dim=DIM)
+    for i, v in enumerate(_unit(rng, 200)):
+        s.add(v, ref=f"r{i}", label="Real", score=0.5)
+    return s
+
+
+def test_exhaustive_search_returns_self_first(store):
+    assert len(store) == 200
+    v = store._mm[37].astype(np.float32)
+    hits = store.search(v, k=5)
+    assert hits[0]["row"] == 37 and hits[0]["ref"] == "r37"
+    assert hits[0]["similarity"] == pytest.approx(1.0, abs=1e-3)
+    sims = [h["similarity"] for h in hits]
+    assert sims == sorted(sims, reverse=True)
+
+
+def test_ivf_with_all_probes_matches_exhaustive(store):
+    info = store.build_ivf(nlist=8, iters=5, seed=1)
+    assert info["rows"] == 200
+    q = _unit(np.random.default_rng(5), 1)[0]
+    exact = [h["row"] for h in store.search(q, k=10, exhaustive=True)]
+    assert [h["row"] for h in store.search(q, k=10, nprobe=8)] == exact
+
+
+def test_ivf_finds_stored_vector_with_one_probe(store):
+    store.build_ivf(nlist=8, iters=5, seed=1)
+    for row in (0, 99, 199):
+        v = store._mm[row].astype(np.float32)
+        # 자기 자신이 배정된 중심이 가장 가까운 중심이므로 nprobe=1로도 찾음
+        assert store.search(v, k=1, nprobe=1)[0]["row"] == row
+
+
+def test_rows_added_after_ivf_are_searched(store):
+    store.build_ivf(nlist=8, iters=5, seed=1)
+    v = _unit(np.random.default_rng(9), 1)[0]
+    row = store.add(v, ref="new")
+    hit = store.search(v, k=1, nprobe=1)[0]
+    assert hit["row"] == row and hit["ref"] == "new"
+
+
+def test_build_ivf_needs_enough_rows(tmp_path):
+    s = EmbeddingStore(directory=str(tmp_path), dim=DIM)
+    s.add(_unit(np.random.default_rng(0), 1)[0])
+    with pytest.raises(ValueError):
+        s.build_ivf(nlist=4)
+
+
+def test_dimension_mismatch(tmp_path):
+    s = EmbeddingStore(directory=str(tmp_path), dim=DIM)
+    with pytest.raises(ValueError):
+        s.add(np.zeros(DIM + 1, dtype=np.float32))
+
+
+def test_add_repairs_interrupted_append(tmp_path):
+    s = EmbeddingStore(directory=str(tmp_path), dim=DIM)
+    vecs = _unit(np.random.default_rng(3), 3)
+    s.add(vecs[0], ref="a")
+    # 메타만 쓰고 죽은 추가 → 읽는 쪽에는 보이지 않고, 다음 add가 잘라냄
+    with open(s.meta_path, "a", encoding="utf-8") as f:
+        f.write('{"ref": "orphan"}\n')
+    assert len(s) == 1 and len(s._meta) == 1
+    assert s.add(vecs[1], ref="b") == 1
+
+    # 임베딩 반쪽 + 메타 줄 반쪽에서 죽은 추가
+    with open(s.emb_path, "ab") as f:
+        f.write(vecs[2].astype(np.float16).tobytes()[:DIM])
+    with open(s.meta_path, "a", encoding="utf-8") as f:
+        f.write('{"ref": "par')
+    other = EmbeddingStore(directory=str(tmp_path), dim=DIM)   # 다른 워커
+    assert other.add(vecs[2], ref="c") == 2
+
+    fresh = EmbeddingStore(directory=str(tmp_path), dim=DIM)
+    assert len(fresh) == 3
+    assert [fresh.search(v, k=1)[0]["ref"] for v in vecs] == ["a", "b", "c"]
+    assert s.search(vecs[2], k=1)[0]["ref"] == "c"
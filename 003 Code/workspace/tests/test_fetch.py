@@ -0,0 +1,126 @@
+# fetch.py — URL 정규화, 디스크 캐시 ETag/304 재검증, max-age 안에서는 네트워크 생략
+import time
+
+import pytest
+
+pytest.importorskip("requests")
+pytest.importorskip("flask")  # myapp 패키지 import에 필요
+
+from myapp import fetch  # noqa: E402
+from myapp.fetch import URLCache, normalize_url  # noqa: E402
+
+
+@pytest.mark.parametrize("url,expected", [
+    ("HTTP://Example.COM:80/a.jpg#frag", "http://example.com/a.jpg"),
+    ("https://example.com:443/a.jpg?b=2&a=1", "https://example.com/a.jpg?a=1&b=2"),
+    ("https://example.com:8443?x=", "https://example.com:8443/?x="),
+    ("  https://example.com/a.jpg  ", "https://example.com/a.jpg"),
+])
+def test_normalize_url(url, expected):
+    assert normalize_url(url) == expected
+
+
+class _Response:
+    def __init__(self, status_code, body=b"", headers=None):
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers or {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def iter_content(self, chunk_size):
+        for i in range(0, len(self.body), chunk_size):
+            yield self.body[i:i + chunk_size]
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise fetch.requests.HTTPError(str(self.status_code))
+
+
+class _Session:
+    """응답을 차례로 돌려주고, 받은 요청 헤더를 기록"""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def get(self, url, headers=None, timeout=None, stream=False):
+        self.requests.append(dict(headers or {}))
+        return self.responses.pop(0)
+
+
+@pytest.fixture
+def now(tmp_path, monkeypatch):
+    monkeypatch.setattr(fetch, "url_cache", URLCache(cache_dir=str(tmp_path)))
+    clock = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: clock[0])
+    return clock
+
+
+def _use(monkeypatch, session):
+    monkeypatch.setattr(fetch, "get_session", lambda: session)
+    return session
+
+
+def test_etag_revalidation_returns_cached_body(now, monkeypatch):
+    s = _use(monkeypatch, _Session(
+        _Response(200, b"img-bytes", {"ETag": '"v1"', "Content-Type": "image/jpeg"}),
+        _Response(304),
+    ))
+    first = fetch.fetch_image("https://Example.com/a.jpg")
+    assert first.content == b"img-bytes" and not first.from_cache
+
+    # 같은 정규화 URL → 조건부 GET, 304면 본문을 다시 받지 않음
+    second = fetch.fetch_image("https://example.com:443/a.jpg#x")
+    assert s.requests[1] == {"If-None-Match": '"v1"'}
+    assert second.from_cache and second.content == b"img-bytes"
+    assert second.content_type == "image/jpeg"
+    stats = fetch.url_cache.stats()
+    assert (stats["misses"], stats["revalidated"], stats["hits"]) == (1, 1, 0)
+
+
+def test_changed_resource_is_downloaded_again(now, monkeypatch):
+    _use(monkeypatch, _Session(
+        _Response(200, b"old", {"ETag": '"v1"'}),
+        _Response(200, b"new", {"ETag": '"v2"'}),
+        _Response(304),
+    ))
+    fetch.fetch_image("https://example.com/a.jpg")
+    assert fetch.fetch_image("https://example.com/a.jpg").content == b"new"
+    assert fetch.fetch_image("https://example.com/a.jpg").content == b"new"
+
+
+def test_max_age_skips_network_until_expired(now, monkeypatch):
+    s = _use(monkeypatch, _Session(
+        _Response(200, b"img", {"Cache-Control": "public, max-age=60", "Last-Modified": "Mon, 01 Jan 2024"}),
+        _Response(304, headers={"Cache-Control": "max-age=120"}),
+    ))
+    fetch.fetch_image("https://example.com/a.jpg")
+    now[0] += 30
+    assert fetch.fetch_image("https://example.com/a.jpg").from_cache
+    assert len(s.requests) == 1 and fetch.url_cache.hits == 1
+
+    # 만료 → 재검증, 304의 max-age로 신선도 갱신
+    now[0] += 31
+    assert fetch.fetch_image("https://example.com/a.jpg").content == b"img"
+    assert s.requests[1] == {"If-Modified-Since": "Mon, 01 Jan 2024"}
+    now[0] += 100
+    assert fetch.fetch_image("https://example.com/a.jpg").from_cache
+    assert len(s.requests) == 2
+
+
+def test_uncacheable_response_is_not_stored(now, monkeypatch):
+    s = _use(monkeypatch, _Session(_Response(200, b"a"), _Response(200, b"b")))
+    fetch.fetch_image("https://example.com/a.jpg")
+    assert fetch.fetch_image("https://example.com/a.jpg").content == b"b"
+    assert s.requests == [{}, {}]
+
+
+def test_oversized_download_aborts(now, monkeypatch):
+    _use(monkeypatch, _Session(_Response(200, b"x" * 100)))
+    with pytest.raises(fetch.FetchError):
+        fetch.fetch_image("https://example.com/a.jpg", max_bytes=10)
@@ -0,0 +1,88 @@
+# jobs.py — 작업 생성(우선순위 범위 제한, 대기열 가득 차면 429), 작업 조회는 만든 사용자만
+import io
+
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("torchvision")
+pytest.importorskip("cv2")
+flask = pytest.importorskip("flask")  # myapp 패키지 import에 필요
+jwt = pytest.importorskip("jwt")
+
+from werkzeug.datastructures import FileStorage  # noqa: E402
+
+from myapp import jobs  # noqa: E402
+from myapp.models import db, Job  # noqa: E402
+from myapp.routes import main_bp  # noqa: E402
+
+SECRET = "test-secret"
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_DIR", str(tmp_path / "jobs"))
+    # 디스패처 없이 생성/조회만 (create_app은 운영 DB 경로와 디스패처 기동을 붙이므로 최소 앱 사용)
+    app = flask.Flask(__name__)
+    app.config.update(SECRET_KEY=SECRET, TESTING=True,
+                      SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'test.db'}")
+    db.init_app(app)
+    app.register_blueprint(main_bp)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+
+
+def _files(*names):
+    return [FileStorage(io.BytesIO(b"\xff\xd8fake"), filename=n) for n in names]
+
+
+def _auth(user_id):
+    return {"Authorization": "Bearer " + jwt.encode({"user_id": user_id}, SECRET, algorithm="HS256")}
+
+
+@pytest.mark.parametrize("priority,expected", [(99, 10), (-99, -10), (3, 3), ("4", 4)])
+def test_create_job_clamps_priority(app, priority, expected):
+    job = jobs.create_job(_files("a.jpg"), priority=priority, user_id=1)
+    assert db.session.get(Job, job.id).priority == expected
+
+
+def test_create_job_stores_inputs(app):
+    job = jobs.create_job(_files("a.jpg", "", "../b.jpg"), user_id=1)
+    assert job.status == "queued" and job.total == 2
+    d = jobs.job_to_dict(job)
+    assert (d["done"], d["progress"], d["results"]) == (0, 0.0, [])
+
+
+def test_queue_full(app, monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_MAX_QUEUE", 2)
+    for _ in range(2):
+        jobs.create_job(_files("a.jpg"), user_id=1)
+    with pytest.raises(jobs.QueueFull):
+        jobs.create_job(_files("a.jpg"), user_id=1)
+
+    resp = app.test_client().post("/api/jobs", headers=_auth(1),
+                                  data={"images": (io.BytesIO(b"x"), "a.jpg")},
+                                  content_type="multipart/form-data")
+    assert resp.status_code == 429 and resp.headers["Retry-After"] == "30"
+    assert jobs.queue_depth() == 2
+
+
+def test_job_is_scoped_to_owner(app):
+    client = app.test_client()
+    assert client.post("/api/jobs", data={"images": (io.BytesIO(b"x"), "a.jpg")}).status_code == 401
+
+    resp = client.post("/api/jobs", headers=_auth(1), data={"images": (io.BytesIO(b"x"), "a.jpg")},
+                       content_type="multipart/form-data")
+    assert resp.status_code == 202
+    job_id = resp.get_json()["job_id"]
+    assert db.session.get(Job, job_id).user_id == 1
+
+    url = f"/api/jobs/{job_id}"
+    assert client.get(url, headers=_auth(1)).get_json()["job_id"] == job_id
+    # 다른 사용자에게는 없는 작업과 같은 응답
+    other = client.get(url, headers=_auth(2))
+    missing = client.get("/api/jobs/" + "0" * 32, headers=_auth(2))
+    assert other.status_code == missing.status_code == 404
+    assert other.get_json() == missing.get_json()
+    assert client.get(url).status_code == 401
@@ -0,0 +1,120 @@
+# model_registry.py — 등록/교체(registry.json 기록 + ai 활성 모델 참조 교체) / 다른 워커 동기화 / 섀도 평가
+import json
+
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("torchvision")
+pytest.importorskip("cv2")
+pytest.importorskip("flask")  # myapp 패키지 import에 필요
+
+from myapp import ai, near_dup, model_registry as reg  # noqa: E402
+
+
+class _Dummy(torch.nn.Module):
+    def __init__(self, name):
+        super().__init__()
+        self.name = name
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    monkeypatch.setattr(reg, "MODEL_DIR", str(tmp_path))
+    monkeypatch.setattr(reg, "REGISTRY_PATH", str(tmp_path / "registry.json"))
+    monkeypatch.setattr(reg, "_last_mtime", None)
+    monkeypatch.setattr(reg, "_load_models", True)
+    monkeypatch.setattr(reg, "_shadow", None)
+    # ai 전역 상태는 테스트 뒤에 되돌림
+    for name in ("_active_spec", "_model", "_run_model", "_embed_model", "_fingerprint", "shadow_hook"):
+        monkeypatch.setattr(ai, name, getattr(ai, name))
+    monkeypatch.setattr(ai, "model_fingerprint", lambda: ai._active_spec.get("name"))
+    monkeypatch.setattr(near_dup, "rebuild", lambda: None)
+
+    loaded = []
+
+    def load_model_spec(spec):
+        loaded.append(spec["name"])
+        m = _Dummy(spec["name"])
+        return m, m
+    monkeypatch.setattr(ai, "load_model_spec", load_model_spec)
+
+    for name in ("a", "b"):
+        (tmp_path / f"{name}.pth").write_bytes(b"x")
+        reg.register(name, f"{name}.pth")
+    return loaded
+
+
+def test_register_writes_relative_paths(registry, tmp_path):
+    state = json.loads((tmp_path / "registry.json").read_text(encoding="utf-8"))
+    assert state["models"]["a"]["path"] == "a.pth"
+    assert reg.spec_of(state, "a")["path"] == str(tmp_path / "a.pth")
+
+
+def test_register_rejects_bad_input(registry):
+    with pytest.raises(ValueError):
+        reg.register("bad name!", "a.pth")
+    with pytest.raises(ValueError):
+        reg.register("c", "missing.pth")
+
+
+def test_activate_swaps_reference_and_records_state(registry):
+    out = reg.activate("b")
+    assert not out["unchanged"] and out["active"] == "b"
+    assert ai.active_spec()["name"] == "b"
+    assert ai._model.name == "b" and ai._run_model is ai._model
+    assert reg.read_state()["active"] == "b"
+    assert registry == ["b"]
+
+    # 같은 모델로 다시 교체하면 적재하지 않음
+    assert reg.activate("b")["unchanged"]
+    assert registry == ["b"]
+
+
+def test_activate_unknown_model(registry):
+    with pytest.raises(KeyError):
+        reg.activate("nope")
+    assert ai.active_spec()["name"] != "nope"
+
+
+def test_other_worker_follows_registry(registry):
+    reg.activate("a")
+    # 다른 워커가 registry.json을 바꾼 상황
+    reg._update_state(lambda state: state.update(active="b"))
+    reg.refresh(force=True, shadow=False)
+    assert ai.active_spec()["name"] == "b" and ai._model.name == "b"
+
+
+def test_spec_only_swap_in_server_mode_workers(registry, monkeypatch):
+    monkeypatch.setattr(reg, "_load_models", False)
+    reg.activate("b")
+    assert ai.active_spec()["name"] == "b"
+    assert ai._model is None and registry == []
+
+
+def test_shadow_compares_against_served_probs(registry, monkeypatch):
+    reg._reset_shadow_stats("b")
+    cfg = {"name": "b", "sample_rate": 1.0, "spec": {"name": "b"}, "run": _Dummy("b")}
+    served = torch.tensor([[0.9, 0.1], [0.2, 0.8], [0.6, 0.4]])
+    candidate = torch.tensor([[0.8, 0.2], [0.3, 0.7], [0.3, 0.7]])
+
+    def active_forward(batch):
+        raise AssertionError("섀도 평가가 활성 모델을 다시 돌리면 안 됨")
+    monkeypatch.setattr(ai, "_forward_probs", active_forward)
+    monkeypatch.setattr(ai, "_local_forward_probs", lambda batch, model=None: candidate)
+
+    reg._evaluate(cfg, torch.zeros(3, 3, 8, 8), served, active_ms=7.0)
+    s = reg._shadow_stats
+    assert s["images"] == 3 and s["agree"] == 2
+    assert s["fake_prob_abs_diff_sum"] == pytest.approx(0.1 + 0.1 + 0.3)
+    assert s["active_ms"].snapshot()["mean"] == pytest.approx(7.0)
+
+
+def test_offer_samples_and_drops_when_full(registry, monkeypatch):
+    monkeypatch.setattr(reg, "_shadow", {"name": "b", "sample_rate": 1.0})
+    monkeypatch.setattr(reg, "_shadow_queue", reg.queue.Queue(maxsize=1))
+    reg._reset_shadow_stats("b")
+    batch, probs = torch.zeros(2, 3, 8, 8), torch.zeros(2, 2)
+    reg._offer(batch, probs, 1.0)
+    reg._offer(batch, probs, 1.0)
+    assert reg._shadow_queue.qsize() == 1
+    assert reg._shadow_stats["dropped"] == 2
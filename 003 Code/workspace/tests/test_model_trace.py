@@ -0,0 +1,25 @@
+# DeepFakeDetector는 torch.fx로 추적 가능해야 함 (quantize.py prepare_fx, convert_ckpt.py fuse)
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("torchvision")
+
+from myapp.ai import DeepFakeDetector  # noqa: E402
+
+
+@pytest.mark.parametrize("arch", ["efficientnet_b0", "mobilenet_v3_small"])
+def test_symbolic_trace(arch):
+    model = DeepFakeDetector(pretrained=False, arch=arch).eval()
+    traced = torch.fx.symbolic_trace(model)
+    x = torch.randn(2, 3, 224, 224)
+    with torch.no_grad():
+        assert torch.allclose(traced(x), model(x), atol=1e-5)
+
+
+def test_forward_with_embedding_matches_forward():
+    model = DeepFakeDetector(pretrained=False, arch="efficientnet_b0").eval()
+    x = torch.randn(1, 3, 224, 224)
+    with torch.no_grad():
+        logits, emb = model.forward_with_embedding(x)
+        assert torch.allclose(logits, model(x), atol=1e-5)
+    assert emb.shape == (1, model.backbone.classifier.in_features)
@@ -0,0 +1,178 @@
+# near_dup.py — MultiIndexHash 조회가 선형 탐색(최근접 해밍 거리)과 같은 결과인지
+import os
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+pytest.importorskip("flask")  # myapp 패키지 import에 필요
+
+from myapp import near_dup  # noqa: E402
+from myapp.near_dup import MultiIndexHash, LABEL_CODES  # noqa: E402
+
+
+def _flip(h, bits):
+    for b in bits:
+        h ^= 1 << b
+    return h
+
+
+def _brute(rows, q):
+    return min(bin(h ^ q).count("1") for _, h, _, _ in rows)
+
+
+def _index(rows):
+    index = MultiIndexHash()
+    ids, hashes, labels, scores = zip(*rows)
+    index.build(np.array(ids), np.array(hashes, dtype=np.uint64), np.array(labels), np.array(scores))
+    return index
+
+
+@pytest.fixture
+def rows():
+    rng = random.Random(0)
+    return [(i + 1, rng.getrandbits(64), LABEL_CODES["Fake"] if i % 2 else LABEL_CODES["Real"], 0.9)
+            for i in range(2000)]
+
+
+def test_exact_match(rows):
+    index = _index(rows)
+    row_id, h, code, _ = rows[123]
+    hit = index.query(h, max_distance=8)
+    assert hit["id"] == row_id and hit["distance"] == 0
+    assert hit["label"] == near_dup.LABELS[code]
+
+
+@pytest.mark.parametrize("flips", [1, 4, 8, 10])
+def test_finds_nearest_within_radius(rows, flips):
+    index = _index(rows)
+    rng = random.Random(flips)
+    radius = 10
+    for _, h, _, _ in rows[:50]:
+        q = _flip(h, rng.sample(range(64), flips))
+        hit = index.query(q, max_distance=radius)
+        # 비둘기집 원리: 거리 <= radius인 항목이 있으면 반드시 찾고, 그게 최근접이어야 함
+        assert hit is not None
+        assert hit["distance"] == _brute(rows, q)
+
+
+def test_none_beyond_radius(rows):
+    index = _index(rows[:1])
+    _, h, _, _ = rows[0]
+    assert index.query(_flip(h, range(20)), max_distance=8) is None
+
+
+def test_recent_rows_before_and_after_merge(rows, monkeypatch):
+    monkeypatch.setattr(near_dup, "NEAR_DUP_MERGE_EVERY", 8)
+    index = _index(rows[:100])
+    index.add_many(rows[100:105])          # 병합 전: recent 선형 탐색
+    assert len(index) == 105 and index.last_id == 105
+    assert index.query(rows[102][1], max_distance=4)["id"] == 103
+    index.add_many(rows[105:110])          # 임계치 도달 → 본 인덱스로 병합
+    assert len(index) == 110 and index.last_id == 110
+    assert index.query(rows[102][1], max_distance=4)["id"] == 103
+    assert index.query(rows[108][1], max_distance=4)["id"] == 109
+
+
+def test_signed_roundtrip():
+    h = (1 << 64) - 1
+    assert near_dup.to_signed(h) == -1
+    assert np.array([near_dup.to_signed(h)], dtype=np.int64).view(np.uint64)[0] == h
+
+
+def test_face_hash_is_returned_with_match(rows):
+    index = MultiIndexHash()
+    ids, hashes, labels, scores = zip(*rows[:10])
+    faces = [None if i % 2 else h ^ 1 for i, h in enumerate(hashes)]
+    index.build(np.array(ids), np.array(hashes, dtype=np.uint64), np.array(labels), np.array(scores), faces)
+    assert index.query(hashes[0], max_distance=0)["face_hash"] == hashes[0] ^ 1
+    assert index.query(hashes[1], max_distance=0)["face_hash"] is None
+    index.add_many([(99, 123, LABEL_CODES["Real"], 0.8, 456), (100, 789, LABEL_CODES["Real"], 0.8)])
+    assert index.query(123, max_distance=0)["face_hash"] == 456
+    assert index.query(789, max_distance=0)["face_hash"] is None
+
+
+@pytest.mark.parametrize("label,face,has_face,stored_face,expected", [
+    ("Fake", None, True, None, True),
+    ("NoFace", None, False, None, True),
+    ("NoFace", 7, True, None, False),         # 얼굴을 붙여 넣은 사본
+    ("Real", 0b1011, True, 0b1011, True),
+    ("Real", 0b1011, True, 0b0100, False),    # 얼굴 영역이 바뀐 사본
+    ("Real", None, True, 0b1011, False),      # 얼굴이 여러 개 → 얼굴 해시 없음
+    ("Uncertain", 5, True, None, False),
+])
+def test_reusable(label, face, has_face, stored_face, expected):
+    match = {"label": label, "face_hash": stored_face}
+    assert near_dup.reusable(match, face, has_face, max_distance=2) is expected
+
+
+# ---- ai 연동: 일부만 고친 사본이 원본의 Real 판정을 받지 않아야 함 ----
+SAMPLE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                      "myapp", "static", "images", "extension-guide", "extension2.png")
+
+
+@pytest.fixture
+def near_dup_ai(monkeypatch):
+    pytest.importorskip("torch")
+    pytest.importorskip("torchvision")
+    import cv2
+    from myapp import ai
+
+    img = cv2.imread(SAMPLE)
+    H, W = img.shape[:2]
+    side = int(min(H, W) * 0.3)
+    face = ((W - side) // 2, (H - side) // 2, side, side)
+    monkeypatch.setattr(ai, "_detect_faces", lambda im, src_scale=1.0: [face])
+    monkeypatch.setattr(ai, "NEAR_DUP_ENABLED", True)
+    monkeypatch.setattr(ai, "RESULT_CACHE_ENABLED", False)
+    monkeypatch.setattr(ai, "TENSOR_CACHE_SIZE", 0)
+    monkeypatch.setattr(near_dup, "index", MultiIndexHash())
+    monkeypatch.setattr(near_dup, "_ready", True)
+
+    def store(label):
+        h, face_h = near_dup.HASHES[ai.NEAR_DUP_HASH](img), ai._face_hash(img, [face])
+        near_dup.index.build(np.array([1]), np.array([h], dtype=np.uint64),
+                             np.array([LABEL_CODES[label]]), np.array([0.95]), [face_h])
+    return ai, img, face, store
+
+
+def _edit_inside(img, face):
+    """얼굴 박스 안쪽, 짧은 변의 20% 크기 영역만 상하 반전 (부분 합성 흉내)"""
+    x, y, side, _ = face
+    e = int(min(img.shape[:2]) * 0.2)
+    ex, ey = x + (side - e) // 2, y + (side - e) // 2
+    out = img.copy()
+    out[ey:ey + e, ex:ex + e] = img[ey:ey + e, ex:ex + e][::-1]
+    return out
+
+
+def test_locally_edited_copy_does_not_reuse_real(near_dup_ai):
+    ai, img, face, store = near_dup_ai
+    store("Real")
+    edited = _edit_inside(img, face)
+    # 전체 프레임 해시만 보면 근사 중복으로 잡히는 편집
+    whole = bin(near_dup.phash(img) ^ near_dup.phash(edited)).count("1")
+    assert whole <= ai.NEAR_DUP_MAX_DISTANCE
+
+    result, tensor, key = ai._load_and_prepare(edited)
+    assert result is None and tensor is not None   # 저장된 판정 대신 모델로 판정
+    assert key.phash is not None and key.face_hash is not None
+
+
+def test_reencoded_copy_reuses_real(near_dup_ai):
+    import cv2
+    ai, img, face, store = near_dup_ai
+    store("Real")
+    ok, jpg = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    copy = cv2.imdecode(jpg, cv2.IMREAD_COLOR)
+    result, tensor, _ = ai._load_and_prepare(copy)
+    assert tensor is None
+    assert result[0] == "Real" and "near_duplicate" in result[2]
+
+
+def test_edited_copy_of_fake_still_reuses_fake(near_dup_ai):
+    ai, img, face, store = near_dup_ai
+    store("Fake")
+    result, tensor, _ = ai._load_and_prepare(_edit_inside(img, face))
+    assert tensor is None and result[0] == "Fake"
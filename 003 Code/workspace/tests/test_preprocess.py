@@ -0,0 +1,123 @@
+# preprocess.py — 축별 보간 리사이즈, 정규화/배치가 기존 torchvision 전처리와 같은 값인지
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+torch = pytest.importorskip("torch")
+pytest.importorskip("flask")  # myapp 패키지 import에 필요
+
+from myapp import preprocess  # noqa: E402
+
+SIZE = 300
+SAMPLE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                      "myapp", "static", "images", "extension-guide", "extension2.png")
+
+
+def _legacy():
+    transforms = pytest.importorskip("torchvision.transforms")
+    return transforms.Compose([
+        transforms.Resize((SIZE, SIZE), antialias=True),
+        transforms.ToTensor(),
+        transforms.Normalize(mean=list(preprocess.MEAN), std=list(preprocess.STD)),
+    ])
+
+
+def _legacy_tensor(img_bgr):
+    from PIL import Image
+    return _legacy()(Image.fromarray(cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB)))
+
+
+def test_resize_same_size_is_noop():
+    img = np.zeros((SIZE, SIZE, 3), dtype=np.uint8)
+    assert preprocess.resize_bgr(img, SIZE) is img
+
+
+@pytest.mark.parametrize("shape,interp", [((600, 800), cv2.INTER_AREA), ((120, 200), cv2.INTER_LINEAR)])
+def test_resize_uniform_direction(shape, interp):
+    img = np.random.default_rng(0).integers(0, 256, (*shape, 3), dtype=np.uint8)
+    expected = cv2.resize(img, (SIZE, SIZE), interpolation=interp)
+    assert np.array_equal(preprocess.resize_bgr(img, SIZE), expected)
+
+
+@pytest.mark.parametrize("shape", [(1210, 150), (150, 1210)])
+def test_resize_mixed_axes_averages_shrinking_axis(shape):
+    # 줄어드는 축 방향으로 1픽셀 줄무늬: INTER_AREA면 평균(≈127), 한 번에 INTER_LINEAR면 픽셀을 건너뛰어 0/255가 남음
+    h, w = shape
+    img = np.zeros((h, w, 3), dtype=np.uint8)
+    if h > w:
+        img[::2] = 255
+    else:
+        img[:, ::2] = 255
+    out = preprocess.resize_bgr(img, SIZE)
+    assert out.shape == (SIZE, SIZE, 3)
+    assert np.abs(out.astype(np.int16) - 127).max() <= 8
+    single = cv2.resize(img, (SIZE, SIZE), interpolation=cv2.INTER_LINEAR)
+    assert np.abs(single.astype(np.int16) - 127).max() > 100
+
+
+def test_normalize_matches_torchvision():
+    img = np.random.default_rng(1).integers(0, 256, (SIZE, SIZE, 3), dtype=np.uint8)
+    out = preprocess.normalize_into(img, torch.empty(3, SIZE, SIZE))
+    # 같은 크기면 Resize는 그대로 통과 → ToTensor + Normalize와 float 오차 수준으로 같아야 함
+    assert torch.allclose(out, _legacy_tensor(img), atol=1e-5)
+
+
+def test_to_batch_matches_per_image_tensors():
+    rng = np.random.default_rng(2)
+    images = [rng.integers(0, 256, shape, dtype=np.uint8) for shape in [(400, 500, 3), (200, 260, 3), (900, 120, 3)]]
+    batch = preprocess.to_batch(images, SIZE)
+    assert batch.shape == (3, 3, SIZE, SIZE)
+    for i, img in enumerate(images):
+        assert torch.equal(batch[i], preprocess.to_tensor(img, SIZE))
+
+
+def test_pipeline_close_to_legacy_transform():
+    img = cv2.imread(SAMPLE)
+    assert img is not None
+    for crop in (img, img[:, :250], img[:250]):
+        diff = (preprocess.to_tensor(crop, SIZE) - _legacy_tensor(crop)).abs().mean().item()
+        assert diff < 0.02
+    # 길쭉한 이미지: 축별 보간이 한 번에 INTER_LINEAR보다 기존 결과에 가까움
+    tall = img[:, :250]
+    linear = preprocess.normalize_into(cv2.resize(tall, (SIZE, SIZE), interpolation=cv2.INTER_LINEAR),
+                                       torch.empty(3, SIZE, SIZE))
+    legacy = _legacy_tensor(tall)
+    assert (preprocess.to_tensor(tall, SIZE) - legacy).abs().mean() < (linear - legacy).abs().mean()
+
+
+# ---- 축소 디코딩 (배율 선택 / 헤더만 읽기) ----
+def _encode(ext, shape=(542, 1280)):
+    img = np.random.default_rng(3).integers(0, 256, (*shape, 3), dtype=np.uint8)
+    return cv2.imencode(ext, img)[1].tobytes()
+
+
+def test_header_size_reads_format_and_dimensions():
+    assert preprocess.header_size(_encode(".jpg")) == ("JPEG", 1280, 542)
+    assert preprocess.header_size(_encode(".png", (40, 30))) == ("PNG", 30, 40)
+    assert preprocess.header_size(b"not an image") == (None, 0, 0)
+
+
+@pytest.mark.parametrize("w,h,min_short,min_long,expected", [
+    (4032, 3024, 300, 0, 8),      # 504 x 378
+    (4032, 3024, 400, 0, 4),      # 1/8이면 짧은 변 378 < 400
+    (1280, 542, 300, 0, 1),       # 1/2이면 271
+    (1280, 720, 300, 0, 2),
+    (4032, 3024, 300, 900, 4),    # 긴 변 하한: 1/8=504, 1/4=1008
+    (601, 601, 300, 0, 2),        # 올림: ceil(601/2)=301
+    (597, 597, 300, 0, 1),        # ceil(597/2)=299
+])
+def test_pick_reduction(w, h, min_short, min_long, expected):
+    factor = preprocess.pick_reduction(w, h, min_short, min_long)
+    assert factor == expected
+    if factor > 1:
+        assert -(-min(w, h) // factor) >= min_short and -(-max(w, h) // factor) >= min_long
+
+
+def test_decode_reduced_only_for_jpeg():
+    img, scale = preprocess.decode_reduced(_encode(".jpg"), 60)
+    assert img.shape[:2] == (68, 160) and scale == pytest.approx(0.125)
+    img, scale = preprocess.decode_reduced(_encode(".png"), 60)
+    assert img.shape[:2] == (542, 1280) and scale == 1.0
+    assert preprocess.decode_reduced(b"", 60) == (None, 1.0)
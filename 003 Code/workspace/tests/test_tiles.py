@@ -0,0 +1,81 @@
+# ai.py 타일 모드 — 타일 시작 좌표 / 축소 배율 / 전체 프레임 판단 / 격자 박스
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("torch")
+pytest.importorskip("torchvision")
+pytest.importorskip("cv2")
+pytest.importorskip("flask")  # myapp 패키지 import에 필요
+
+from myapp import ai  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def grid_settings(monkeypatch):
+    monkeypatch.setattr(ai, "TILE_REGIONS", "grid")
+    monkeypatch.setattr(ai, "TILE_MIN_SIDE", 900)
+    monkeypatch.setattr(ai, "TILE_OVERLAP", 0.25)
+    monkeypatch.setattr(ai, "TILE_MAX_TILES", 64)
+
+
+@pytest.mark.parametrize("length", [300, 301, 599, 1000, 4032])
+def test_tile_starts_cover_the_axis(length):
+    size, stride = ai.INPUT_SIZE, ai._tile_stride()
+    starts = ai._tile_starts(length, size, stride)
+    assert starts[0] == 0 and starts[-1] == length - size
+    assert all(0 < b - a <= stride for a, b in zip(starts, starts[1:]))
+
+
+def test_tile_starts_short_axis():
+    assert ai._tile_starts(200, ai.INPUT_SIZE, ai._tile_stride()) == [0]
+
+
+@pytest.mark.parametrize("w,h", [(4032, 3024), (8000, 6000), (1200, 900)])
+def test_tile_scale_respects_max_tiles(w, h):
+    s = ai._tile_scale(w, h)
+    assert 0 < s <= 1.0
+    assert ai._tile_count(w * s, h * s) <= ai.TILE_MAX_TILES
+    assert min(w, h) * s >= ai.INPUT_SIZE - 1
+
+
+def test_tile_scale_keeps_short_side_at_input_size():
+    # 아주 길쭉한 이미지: 타일 수를 맞추려고 짧은 변을 INPUT_SIZE 아래로 줄이지 않음
+    w, h = 30000, 1000
+    s = ai._tile_scale(w, h)
+    assert h * s == pytest.approx(ai.INPUT_SIZE)
+
+
+def test_tile_whole_uses_upload_size(monkeypatch):
+    monkeypatch.setattr(ai, "TILE_MAX_TILES", 16)
+    assert ai._tile_whole(800, 600)
+    assert not ai._tile_whole(4032, 3024)
+    # 타일 수에 맞춰 줄인 크기(짧은 변 < TILE_MIN_SIDE)로 판단하면 안 됨
+    s = ai._tile_scale(8000, 6000)
+    assert 6000 * s < ai.TILE_MIN_SIDE
+    assert not ai._tile_whole(8000, 6000)
+
+
+def test_tile_whole_only_in_grid_mode(monkeypatch):
+    monkeypatch.setattr(ai, "TILE_REGIONS", "faces")
+    assert not ai._tile_whole(800, 600)
+    assert ai._tile_scale(8000, 6000) == 1.0
+
+
+def test_downscaled_image_is_still_gridded(monkeypatch):
+    # 타일 수 상한 때문에 짧은 변이 TILE_MIN_SIDE 아래로 줄어든 경우에도 격자로 나눔
+    monkeypatch.setattr(ai, "TILE_MAX_TILES", 16)
+    w, h = 8000, 6000
+    s = ai._tile_scale(w, h)
+    img = np.zeros((int(h * s), int(w * s), 3), dtype=np.uint8)
+    boxes, grid = ai._tile_boxes(img, [], whole=ai._tile_whole(w, h))
+    assert grid[0] * grid[1] == len(boxes) > 1
+    assert len(boxes) <= ai.TILE_MAX_TILES
+    H, W = img.shape[:2]
+    for x, y, bw, bh in boxes:
+        assert (bw, bh) == (ai.INPUT_SIZE, ai.INPUT_SIZE)
+        assert 0 <= x <= W - bw and 0 <= y <= H - bh
+
+
+def test_whole_frame_box():
+    img = np.zeros((600, 800, 3), dtype=np.uint8)
+    assert ai._tile_boxes(img, [], whole=True) == ([(0, 0, 800, 600)], (1, 1))